@@ -0,0 +1,143 @@
+"""
+WebSocket bağlantı kabulü için giriş kontrolü (admission control).
+
+Bir ağ kesintisinden sonra binlerce istemci aynı anda yeniden bağlandığında her el
+sıkışma kullanıcı sorgusu ve kayıt işlemi yapar. Aynı anda en fazla
+ADMISSION_MAX_CONCURRENT bağlantı doğrulanır; diğerleri en fazla
+ADMISSION_QUEUE_SIZE uzunluğundaki kuyrukta ADMISSION_QUEUE_TIMEOUT_SECONDS kadar
+bekler. Kuyruk doluysa el sıkışma HTTP 503 ve Retry-After ile, kuyrukta süresi dolan
+bağlantı ise retry_after_ms içeren bir hata ve 1013 (try again later) koduyla reddedilir.
+
+Reddedilen istemcilere önerilen bekleme süreleri ölçülen doğrulama hızına göre sıralanır:
+aynı anda reddedilen binlerce istemci aynı anda geri dönerse yeni bir fırtına oluşur ve
+sunucu zamanını el sıkışıp reddetmekle geçirir.
+"""
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", 100))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 1000))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 5))
+# Reddedilen istemcilere önerilen en kısa bekleme süresi; öneriye bu kadar rastgele sapma eklenir
+ADMISSION_RETRY_AFTER_SECONDS = float(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", 2))
+ADMISSION_RETRY_AFTER_MAX_SECONDS = float(os.getenv("ADMISSION_RETRY_AFTER_MAX_SECONDS", 120))
+
+ADMISSION_REJECTED_TOTAL = metrics.counter(
+    "ws_admission_rejected_total",
+    "Giriş kontrolünde reddedilen bağlantı sayısı.",
+    ("reason",)
+)
+ADMISSION_WAIT_SECONDS = metrics.histogram(
+    "ws_admission_wait_seconds",
+    "Bağlantıların doğrulama sırası için kuyrukta bekleme süresi."
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT, queue_size: int = ADMISSION_QUEUE_SIZE,
+                 timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.in_progress = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        # Tamamlanan doğrulama hızı ölçümü ve son önerilen yeniden deneme zamanı (monotonic)
+        self._rate = None
+        self._finished = 0
+        self._window_start = time.monotonic()
+        self._next_retry = 0.0
+
+        metrics.gauge("ws_admission_queue_depth", "Doğrulama sırası bekleyen bağlantı sayısı.").set_function(lambda: self.waiting)
+        metrics.gauge("ws_admission_in_progress", "Şu anda doğrulanan bağlantı sayısı.").set_function(lambda: self.in_progress)
+
+    def rate(self) -> float:
+        """
+        Saniyede tamamlanan doğrulama sayısı. Kuyruk zaman aşımı dolmadan boşalabilmelidir;
+        ölçüm yoksa veya daha düşükse queue_size / timeout kullanılır.
+        """
+        return max(self._rate or 0.0, self.queue_size / self.timeout)
+
+    def _record_finished(self):
+        self._finished += 1
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < 1:
+            return
+        # İki saniyeden uzun süren pencere boşta geçmiştir; kapasiteyi göstermez
+        if elapsed < 2:
+            rate = self._finished / elapsed
+            self._rate = rate if self._rate is None else (self._rate + rate) / 2
+        self._finished = 0
+        self._window_start = now
+
+    def retry_after(self) -> float:
+        """
+        Reddedilen her istemciye bir öncekinden 1 / rate() saniye sonraki zamanı önerir;
+        geri dönen istemciler doğrulama hızını aşmaz.
+        """
+        now = time.monotonic()
+        self._next_retry = min(
+            max(self._next_retry + 1 / self.rate(), now + ADMISSION_RETRY_AFTER_SECONDS),
+            now + ADMISSION_RETRY_AFTER_MAX_SECONDS
+        )
+        return self._next_retry - now + random.uniform(0, ADMISSION_RETRY_AFTER_SECONDS)
+
+    def has_capacity(self) -> bool:
+        """
+        El sıkışma öncesi ucuz kontrol: kuyruk doluysa bağlantı hiç yükseltilmez.
+        """
+        return self.waiting < self.queue_size
+
+    def reject_full(self) -> AdmissionRejected:
+        ADMISSION_REJECTED_TOTAL.inc("queue_full")
+        return AdmissionRejected("queue_full", self.retry_after())
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Doğrulama için yer açılana kadar bekler. Kuyruk doluysa veya bekleme süresi
+        dolarsa AdmissionRejected fırlatır.
+        """
+        if not self._semaphore.locked():
+            # Boş yer var, beklemeden al
+            await self._semaphore.acquire()
+            ADMISSION_WAIT_SECONDS.observe(0)
+        else:
+            if not self.has_capacity():
+                raise self.reject_full()
+
+            self.waiting += 1
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                ADMISSION_REJECTED_TOTAL.inc("timeout")
+                raise AdmissionRejected("timeout", self.retry_after())
+            finally:
+                self.waiting -= 1
+                ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+        self.in_progress += 1
+        try:
+            yield
+        finally:
+            self._record_finished()
+            self.in_progress -= 1
+            self._semaphore.release()
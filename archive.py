@@ -0,0 +1,208 @@
+"""
+Eski mesajların sıkıştırılmış dosyalara (soğuk depo) taşınması ve okunması.
+
+ARCHIVE_AFTER_DAYS günden eski, tamamı kesim tarihinden önce kalan aylık messages
+partition'ları sohbet başına bir JSONL.zst segmentine yazılır, segmentler
+message_archive_segments tablosunda dizinlenir ve partition silinir.
+Geçmiş endpoint'i sıcak veride bulamadığı sayfaları read_archived_messages ile okur.
+
+Kullanım:
+    python archive.py run
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import zstandard
+from dotenv import load_dotenv
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from models import MessageArchiveSegment
+from partitions import add_months, month_start
+
+load_dotenv()
+
+ARCHIVE_ROOT = os.getenv("ARCHIVE_ROOT", "archive")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 365))
+ARCHIVE_COMPRESSION_LEVEL = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", 9))
+
+MESSAGE_COLUMNS = ("id", "sender_id", "receiver_id", "content", "sent_date", "is_read", "attachment_id")
+
+logger = logging.getLogger(__name__)
+
+
+def segment_path(user1_id: int, user2_id: int, month: datetime) -> str:
+    return os.path.join(ARCHIVE_ROOT, f"{user1_id}_{user2_id}", f"{month.year:04d}_{month.month:02d}.jsonl.zst")
+
+
+def write_segment(path: str, rows: List[dict]):
+    """
+    Satırları sıkıştırılmış JSONL olarak yazar. Dosya önce geçici isimle yazılıp
+    diske senkronlanır, sonra yerine taşınır.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    compressor = zstandard.ZstdCompressor(level=ARCHIVE_COMPRESSION_LEVEL)
+    with open(temp_path, "wb") as file:
+        with compressor.stream_writer(file, closefd=False) as writer:
+            for row in rows:
+                writer.write(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+                writer.write(b"\n")
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def read_segment(path: str) -> List[dict]:
+    """
+    Segmentteki mesajları ID sırasıyla (eskiden yeniye) döndürür.
+    """
+    decompressor = zstandard.ZstdDecompressor()
+    with open(path, "rb") as file:
+        with decompressor.stream_reader(file) as reader:
+            return [json.loads(line) for line in io.TextIOWrapper(reader, encoding="utf-8") if line.strip()]
+
+
+def _row_to_dict(row) -> dict:
+    message = dict(zip(MESSAGE_COLUMNS, row))
+    message["sent_date"] = message["sent_date"].isoformat()
+    return message
+
+
+async def archivable_partitions(conn, cutoff: datetime):
+    """
+    Bitiş tarihi cutoff'tan önce olan messages partition'larını (isim, ay başı) olarak döndürür.
+    """
+    result = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'messages' ORDER BY c.relname"
+    ))
+    partitions = []
+    for name in result.scalars().all():
+        _, year, month = name.split("_")
+        start = datetime(int(year), int(month), 1, tzinfo=timezone.utc)
+        if add_months(start, 1) <= cutoff:
+            partitions.append((name, start))
+    return partitions
+
+
+async def archive_partition(db, name: str, month: datetime) -> int:
+    """
+    Bir partition'ı sohbet başına segmentlere yazar, dizine ekler ve partition'ı siler.
+    Dosyalar transaction commit edilmeden önce yazılır; hata olursa aynı yollara tekrar yazılır.
+    """
+    segments = []
+    archived = 0
+    async with db.engine.begin() as conn:
+        result = await conn.stream(text(
+            f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM {name} "
+            "ORDER BY least(sender_id, coalesce(receiver_id, 0)), greatest(sender_id, coalesce(receiver_id, 0)), id"
+        ))
+
+        current_key = None
+        rows = []
+
+        async def flush_segment():
+            path = segment_path(current_key[0], current_key[1], month)
+            await asyncio.to_thread(write_segment, path, rows)
+            segments.append({
+                "user1_id": current_key[0],
+                "user2_id": current_key[1],
+                "min_id": rows[0]["id"],
+                "max_id": rows[-1]["id"],
+                "min_sent_date": min(datetime.fromisoformat(row["sent_date"]) for row in rows),
+                "max_sent_date": max(datetime.fromisoformat(row["sent_date"]) for row in rows),
+                "message_count": len(rows),
+                "path": path,
+            })
+
+        async for row in result:
+            # Grup mesajlarının alıcısı yoktur; göndereni ile (0, sender_id) segmentine yazılır
+            receiver_id = row.receiver_id or 0
+            key = (min(row.sender_id, receiver_id), max(row.sender_id, receiver_id))
+            if key != current_key and rows:
+                await flush_segment()
+                rows = []
+            current_key = key
+            rows.append(_row_to_dict(row))
+            archived += 1
+        if rows:
+            await flush_segment()
+
+        if segments:
+            await conn.execute(insert(MessageArchiveSegment), segments)
+        await conn.execute(text(f"DROP TABLE {name}"))
+
+    logger.info("Partition arşivlendi.", extra={"partition": name, "messages": archived, "segments": len(segments)})
+    return archived
+
+
+async def archive_old_messages(db, archive_after_days: int = ARCHIVE_AFTER_DAYS) -> int:
+    """
+    Tamamı archive_after_days günden eski olan partition'ları soğuk depoya taşır.
+    """
+    cutoff = month_start(datetime.now(timezone.utc) - timedelta(days=archive_after_days))
+    async with db.engine.connect() as conn:
+        partitions = await archivable_partitions(conn, cutoff)
+
+    archived = 0
+    for name, month in partitions:
+        archived += await archive_partition(db, name, month)
+    return archived
+
+
+async def read_archived_messages(session: AsyncSession, user1_id: int, user2_id: int,
+                                 before_id: Optional[int] = None, limit: Optional[int] = None) -> List[dict]:
+    """
+    İki kullanıcı arasındaki arşivlenmiş mesajları yeniden eskiye döndürür.
+    before_id verilirse sadece daha eski mesajlar, limit verilirse en fazla limit mesaj okunur.
+    """
+    low, high = min(user1_id, user2_id), max(user1_id, user2_id)
+    stmt = select(MessageArchiveSegment.path).where(
+        MessageArchiveSegment.user1_id == low,
+        MessageArchiveSegment.user2_id == high
+    ).order_by(MessageArchiveSegment.max_id.desc())
+    if before_id is not None:
+        stmt = stmt.where(MessageArchiveSegment.min_id < before_id)
+
+    result = await session.execute(stmt)
+    messages = []
+    for path in result.scalars().all():
+        rows = await asyncio.to_thread(read_segment, path)
+        for row in reversed(rows):
+            if before_id is not None and row["id"] >= before_id:
+                continue
+            messages.append(row)
+            if limit is not None and len(messages) >= limit:
+                return messages
+    return messages
+
+
+async def async_main(command: str):
+    from database import Database
+
+    db = Database()
+    try:
+        if command == "run":
+            archived = await archive_old_messages(db)
+            print(f"{archived} mesaj arşivlendi.")
+        else:
+            print(__doc__)
+    finally:
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    from log_handler import setup_logging
+
+    setup_logging()
+    asyncio.run(async_main(sys.argv[1] if len(sys.argv) > 1 else ""))
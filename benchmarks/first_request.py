@@ -0,0 +1,123 @@
+"""
+Dağıtımdan hemen sonraki ilk isteklerin gecikmesi: ısınma ve /ready beklenmeden ile
+ısınma bitip /ready 200 döndükten sonra.
+
+Her mod için main.py yeni bir süreç olarak başlatılır ve --concurrency eşzamanlı
+GET /chat/chat-users/{user_id} isteği (Postgres + Redis) gönderilir:
+    cold   Isınma kapalı (WARMUP_*_CONNECTIONS=0), istekler port açılır açılmaz gönderilir;
+           ısınma öncesi dağıtımların davranışı
+    warm   Varsayılan ısınma, istekler /ready 200 döndükten sonra gönderilir
+Ardından aynı sayıda istek bir kez daha gönderilir (kararlı durum, karşılaştırma için).
+
+Postgres ve Redis çalışıyor, kullanıcılar deneme.py ile üretilmiş olmalıdır
+(--first-user-id'den başlayan --concurrency kullanıcı).
+
+Kullanım:
+    python -m benchmarks.first_request --concurrency 50 --first-user-id 1
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+import security
+
+load_dotenv()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_PORT = 8000
+
+
+def port_open(port: int) -> bool:
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+            return True
+    except OSError:
+        return False
+
+
+def is_ready(port: int) -> bool:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1) as response:
+            return response.status == 200
+    except (OSError, urllib.error.HTTPError):
+        return False
+
+
+def wait_until(check, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return
+        time.sleep(0.01)
+    raise TimeoutError("Sunucu zamanında hazır olmadı.")
+
+
+def get_chats(port: int, user_id: int) -> float:
+    token = security.create_access_token({"user_id": user_id})
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/chat/chat-users/{user_id}", headers={"Authorization": f"Bearer {token}"}
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=60) as response:
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f"Beklenmeyen durum kodu: {response.status}")
+    return time.perf_counter() - start
+
+
+def wave(pool, args) -> list:
+    user_ids = range(args.first_user_id, args.first_user_id + args.concurrency)
+    return sorted(pool.map(lambda user_id: get_chats(API_PORT, user_id), user_ids))
+
+
+def run_mode(mode: str, args) -> tuple:
+    env = {**os.environ, "API_PORT": str(API_PORT)}
+    if mode == "cold":
+        env.update({"WARMUP_DB_CONNECTIONS": "0", "WARMUP_REDIS_CONNECTIONS": "0"})
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env)
+    try:
+        if mode == "cold":
+            wait_until(lambda: port_open(API_PORT))
+        else:
+            wait_until(lambda: is_ready(API_PORT))
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            first = wave(pool, args)
+            steady = wave(pool, args)
+        return first, steady
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Isınma öncesi ve sonrası ilk istek gecikmesi.")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--first-user-id", type=int, default=1)
+    parser.add_argument("--modes", nargs="+", default=["cold", "warm"], choices=["cold", "warm"])
+    args = parser.parse_args()
+
+    results = [(mode, *run_mode(mode, args)) for mode in args.modes]
+    print(f"{args.concurrency} eşzamanlı GET /chat/chat-users, ms")
+    print(f"  {'mod':<6}{'ilk p50':>10}{'ilk max':>10}{'sonra p50':>12}{'sonra max':>12}")
+    for mode, first, steady in results:
+        print(
+            f"  {mode:<6}{statistics.median(first) * 1000:>10.1f}{first[-1] * 1000:>10.1f}"
+            f"{statistics.median(steady) * 1000:>12.1f}{steady[-1] * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Olay birleştirmenin (FrameBatcher) sunucu CPU'su başına gönderilen mesaj sayısına etkisi.
+
+Sunucu bu süreçte, istemciler ayrı bir alt süreçte çalışır; böylece ölçülen CPU süresi
+yalnızca sunucu tarafıdır. --clients istemci tek bir room'daymış gibi her mesajı alır;
+sunucu --messages mesajı saniyede --rate mesaj hızla room'a dağıtır (0: olabildiğince hızlı):
+    single   Olay başına bir frame (websocket.send)
+    batch    FrameBatcher ile birleştirilmiş frame'ler
+İstemci beklediği sayıda olayı alınca "done" gönderir. Süre, ilk gönderimden son
+istemcinin "done" mesajına kadardır; "mesaj/sn/çekirdek" = teslim edilen olay / sunucu CPU sn.
+
+Birleştirme yalnızca bir bağlantıya BATCH_FLUSH_MS içinde birden fazla olay düştüğünde
+kazanç sağlar; "olay/frame" sütunu ortalama birleştirme oranını gösterir.
+
+Kullanım:
+    python -m benchmarks.frame_coalescing [--clients 50] [--messages 5000] [--rate 1000] [--modes single batch]
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import serve
+
+from frame_batcher import BATCH_FRAME_EVENTS, FrameBatcher
+
+
+def event(index: int) -> str:
+    return json.dumps({
+        "type": "new_message", "room_id": "group_1", "message_id": 1000000 + index,
+        "sender_id": 1, "content": f"bench mesajı {index}", "timestamp": "2026-01-01T00:00:00",
+    })
+
+
+async def run_clients(port: int, clients: int, messages: int, modes: int):
+    async def client():
+        async with connect(f"ws://127.0.0.1:{port}/", max_size=None) as websocket:
+            for _ in range(modes):
+                received = 0
+                while received < messages:
+                    data = json.loads(await websocket.recv())
+                    received += len(data) if isinstance(data, list) else 1
+                await websocket.send("done")
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+
+
+async def fan_out(mode: str, connections: list, messages: int, rate: float):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    batchers = [FrameBatcher(websocket, max_pending_bytes=2 ** 31) for websocket in connections] if mode == "batch" else None
+    for index in range(messages):
+        message_json = event(index)
+        if batchers:
+            for batcher in batchers:
+                batcher.add(message_json)
+        else:
+            for websocket in connections:
+                await websocket.send(message_json)
+        # Gerçek sunucuda mesajlar ayrı action'lardan gelir
+        delay = start + (index + 1) / rate - loop.time() if rate else 0
+        await asyncio.sleep(max(delay, 0))
+    if batchers:
+        await asyncio.gather(*(batcher.close() for batcher in batchers))
+
+
+async def async_main(args):
+    connections = []
+    done = asyncio.Queue()
+    all_connected = asyncio.Event()
+
+    async def handler(websocket):
+        connections.append(websocket)
+        if len(connections) == args.clients:
+            all_connected.set()
+        async for _ in websocket:
+            done.put_nowait(None)
+
+    async with serve(handler, "127.0.0.1", 0, max_size=None) as server:
+        port = server.sockets[0].getsockname()[1]
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.frame_coalescing", "--client", str(port),
+            "--clients", str(args.clients), "--messages", str(args.messages), "--mode-count", str(len(args.modes))
+        )
+        await all_connected.wait()
+
+        results = []
+        for mode in args.modes:
+            cpu = time.process_time()
+            start = time.perf_counter()
+            frames = BATCH_FRAME_EVENTS.count()
+            await fan_out(mode, connections, args.messages, args.rate)
+            for _ in range(args.clients):
+                await done.get()
+            frames = BATCH_FRAME_EVENTS.count() - frames if mode == "batch" else args.clients * args.messages
+            results.append((mode, time.perf_counter() - start, time.process_time() - cpu, frames))
+        await process.wait()
+
+    delivered = args.clients * args.messages
+    rate = f"saniyede {args.rate:g} mesaj" if args.rate else "sınırsız hız"
+    print(f"{args.clients} istemci x {args.messages} mesaj = {delivered} teslim, {rate}")
+    print(f"  {'mod':<8}{'süre':>9}{'CPU':>9}{'olay/frame':>12}{'mesaj/sn':>12}{'mesaj/sn/çekirdek':>20}")
+    for mode, elapsed, cpu, frames in results:
+        print(
+            f"  {mode:<8}{elapsed:>8.2f}s{cpu:>8.2f}s{delivered / frames:>12.1f}"
+            f"{delivered / elapsed:>12.0f}{delivered / cpu:>20.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Olay birleştirmenin mesaj/sn/çekirdek etkisini ölçer.")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=1000, help="Saniyede room'a gönderilen mesaj; 0 sınırsız")
+    parser.add_argument("--modes", nargs="+", default=["single", "batch"], choices=["single", "batch"])
+    parser.add_argument("--client", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--mode-count", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client:
+        asyncio.run(run_clients(args.client, args.clients, args.messages, args.mode_count))
+    else:
+        asyncio.run(async_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Geçmiş ve sohbet listesi yanıtlarının satır + serileştirme CPU süresi: ORM nesneleri,
+jsonable_encoder ve JSONResponse ile kolon seçimi, sözlükler ve ORJSONResponse.
+
+    history     --messages mesajlık sohbetin tamamı (get_messages_between_users)
+                  önce:  select(Message) -> ORM nesneleri -> jsonable_encoder -> JSONResponse
+                  sonra: statements.conversation_history -> .mappings() sözlükleri -> ORJSONResponse
+    chat_list   --chats sohbetlik liste (get_chats), sorgu sonucu satırlardan
+                  önce:  satır başına ChatItem -> jsonable_encoder -> JSONResponse
+                  sonra: satır başına sözlük -> ORJSONResponse
+
+Sorgular bellekteki bir SQLite veritabanında çalıştırılır; sürücünün satır okuma süresi iki
+durumda da aynıdır. Süreler time.process_time ile ölçülen CPU süresidir, --rounds turun en iyisi.
+
+Kullanım:
+    python -m benchmarks.history_serialization [--messages 10000] [--chats 500] [--rounds 5]
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy import and_, or_
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+import statements
+from benchmarks.statement_cache import create_database
+from models import Message
+from schemas.s_chat import ChatItem
+from utils import get_current_utc_time
+
+
+def history_before(session: Session) -> bytes:
+    """
+    Önceki get_messages_between_users: tam Message nesneleri ve jsonable_encoder.
+    """
+    result = session.execute(select(Message).where(
+        or_(
+            and_(Message.sender_id == 1, Message.receiver_id == 2),
+            and_(Message.sender_id == 2, Message.receiver_id == 1),
+        )
+    ).order_by(Message.sent_date))
+    messages = jsonable_encoder(result.scalars().all())
+    return JSONResponse(content={"messages": messages, "next_cursor": None}).body
+
+
+def history_after(session: Session) -> bytes:
+    result = session.execute(statements.conversation_history(1, 2))
+    messages = [dict(row) for row in result.mappings()]
+    return ORJSONResponse(content={"messages": messages, "next_cursor": None}).body
+
+
+def chat_rows(chats: int) -> list:
+    """
+    get_chats sorgusunun döndürdüğü (content, sent_date, user_id, username) satırları.
+    """
+    now = get_current_utc_time()
+    return [(f"son mesaj {index}", now, index + 2, f"user{index + 2}") for index in range(chats)]
+
+
+def chat_list_before(rows: list) -> bytes:
+    chats = [
+        ChatItem(
+            name=username,
+            receiver_id=user_id,
+            message=content,
+            time=sent_date.strftime('%H:%M'),
+            unread=index % 3,
+            avatar=f'https://randomuser.me/api/portraits/men/{user_id % 10}.jpg',
+            current_user_id=user_id
+        )
+        for index, (content, sent_date, user_id, username) in enumerate(rows)
+    ]
+    # FastAPI, route'un döndürdüğü modelleri bu şekilde yazar
+    return JSONResponse(content=jsonable_encoder(chats)).body
+
+
+def chat_list_after(rows: list) -> bytes:
+    chats = [
+        {
+            "name": username,
+            "receiver_id": user_id,
+            "message": content,
+            "time": sent_date.strftime('%H:%M'),
+            "unread": index % 3,
+            "avatar": f'https://randomuser.me/api/portraits/men/{user_id % 10}.jpg',
+            "current_user_id": user_id
+        }
+        for index, (content, sent_date, user_id, username) in enumerate(rows)
+    ]
+    return ORJSONResponse(content=chats).body
+
+
+def measure(call, rounds: int) -> float:
+    # Isınma: derlenmiş ifade önbelleği ve pydantic doğrulayıcıları
+    call()
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.process_time()
+        call()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geçmiş ve sohbet listesi yanıtlarının serileştirme CPU süresini ölçer.")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_database(messages=args.messages)
+    rows = chat_rows(args.chats)
+    with Session(engine) as session:
+        def run_history_before():
+            history_before(session)
+            # Her istek yeni bir oturumda çalışır; identity map taşınmaz
+            session.expunge_all()
+
+        results = [
+            (f"history ({args.messages} mesaj)", measure(run_history_before, args.rounds),
+             measure(lambda: history_after(session), args.rounds)),
+            (f"chat_list ({args.chats} sohbet)", measure(lambda: chat_list_before(rows), args.rounds),
+             measure(lambda: chat_list_after(rows), args.rounds)),
+        ]
+        # İki yol aynı JSON'u üretmelidir
+        same_history = json.loads(history_before(session)) == json.loads(history_after(session))
+        session.expunge_all()
+        same_chat_list = json.loads(chat_list_before(rows)) == json.loads(chat_list_after(rows))
+
+    print(f"CPU süresi, {args.rounds} turun en iyisi")
+    print(f"  {'yanıt':<26}{'önce':>10}{'sonra':>10}{'hızlanma':>10}")
+    for name, before, after in results:
+        print(f"  {name:<26}{before * 1000:>8.1f}ms{after * 1000:>8.1f}ms{before / after:>9.1f}x")
+    if not (same_history and same_chat_list):
+        print("  Uyarı: önceki ve yeni yanıtların içeriği farklı")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Boşta bekleyen çok sayıda istemciyle uzun süreli (soak) test.
+
+    policy  Sunucu gerektirmez. ConnectionPolicy'ye --clients sahte bağlantı verilir:
+            bir kısmı yalnızca olay alır (dinleyici), bir kısmı arada mesaj gönderir,
+            geri kalanı tamamen boştadır. Boşta kalma taraması --rounds kez çalıştırılır;
+            dinleyicilerin ve mesaj gönderenlerin hiçbirinin kapatılmadığı doğrulanır,
+            tarama süresi ve last_seen'in bellek kullanımı raporlanır.
+    server  Çalışan bir sohbet sunucusuna --clients istemci bağlanır, doğrulanır ve
+            --duration saniye hiç mesaj göndermeden bekler. Kapatılan bağlantılar kapanış
+            koduna göre sayılır; sunucunun /metrics çıktısından bellek kullanımı okunur.
+            Kullanıcılar deneme.py ile üretilmiş olmalıdır. İstemci sayısı kadar dosya
+            tanımlayıcısı gerekir: ulimit -n.
+
+Kullanım:
+    python -m benchmarks.idle_soak policy --clients 50000
+    python -m benchmarks.idle_soak server --clients 50000 --duration 1800 --url ws://127.0.0.1:8001/
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+import urllib.request
+from collections import Counter
+
+from connection_policy import ConnectionPolicy
+
+
+class IdleWebSocket:
+    __slots__ = ("closed",)
+
+    def __init__(self):
+        self.closed = False
+
+    async def close(self, code=1000, reason=""):
+        self.closed = True
+
+
+async def soak_policy(args):
+    rng = random.Random(42)
+    connections = {user_id: IdleWebSocket() for user_id in range(args.clients)}
+    # 0: tamamen boşta, 1: yalnızca olay alan, 2: arada mesaj gönderen
+    kinds = {user_id: rng.choice((0, 1, 1, 2)) for user_id in connections}
+    policy = ConnectionPolicy(connections, idle_timeout=args.idle_timeout)
+
+    tracemalloc.start()
+    for user_id in connections:
+        policy.touch(user_id)
+    last_seen_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    scan_seconds = []
+    for _ in range(args.rounds):
+        # Dinleyicilere olay iletilir (send_to_user), gönderenler mesaj gönderir; ikisi de touch çağırır
+        deadline = time.monotonic() + args.idle_timeout * 1.5
+        while time.monotonic() < deadline:
+            for user_id, kind in kinds.items():
+                if kind and user_id in connections:
+                    policy.touch(user_id)
+            await asyncio.sleep(args.idle_timeout / 4)
+        start = time.perf_counter()
+        await policy.close_idle()
+        scan_seconds.append(time.perf_counter() - start)
+        # Kapatılan bağlantılar sunucuda unregister ile düşer
+        for user_id in [user_id for user_id, websocket in connections.items() if websocket.closed]:
+            del connections[user_id]
+            policy.forget(user_id)
+
+    closed = Counter(kind for user_id, kind in kinds.items() if user_id not in connections)
+    total = Counter(kinds.values())
+    print(f"{args.clients} bağlantı, boşta kalma süresi {args.idle_timeout} sn, {args.rounds} tarama")
+    for kind, name in ((0, "tamamen boşta"), (1, "yalnızca olay alan"), (2, "mesaj gönderen")):
+        print(f"  {name:<20} {total[kind]:>7} bağlantı, {closed[kind]:>7} kapatıldı")
+    print(f"  last_seen belleği       {last_seen_bytes / 1024 / 1024:.1f} MB ({last_seen_bytes / args.clients:.0f} B/bağlantı)")
+    print(f"  tarama süresi           en fazla {max(scan_seconds) * 1000:.1f} ms")
+    assert not closed[1] and not closed[2], "Etkin bağlantılar boşta sayılıp kapatıldı"
+
+
+def read_metrics(url: str) -> dict:
+    values = {}
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            for line in response.read().decode().splitlines():
+                if line and not line.startswith("#"):
+                    name, _, value = line.rpartition(" ")
+                    values[name] = float(value)
+    except OSError:
+        pass
+    return values
+
+
+async def idle_client(url: str, user_id: int, connected: asyncio.Event, closes: Counter):
+    from websockets.asyncio.client import connect
+    from websockets.exceptions import ConnectionClosed
+
+    try:
+        async with connect(url, max_size=None, open_timeout=60) as websocket:
+            await websocket.send(json.dumps({"user_id": user_id}))
+            connected.set()
+            try:
+                # Yalnızca gelen olayları oku; hiç mesaj gönderme
+                async for _ in websocket:
+                    pass
+            except ConnectionClosed:
+                pass
+            closes[websocket.close_code] += 1
+    except Exception as e:
+        connected.set()
+        closes[type(e).__name__] += 1
+
+
+async def soak_server(args):
+    closes = Counter()
+    events = [asyncio.Event() for _ in range(args.clients)]
+    tasks = []
+    for index in range(args.clients):
+        tasks.append(asyncio.create_task(idle_client(args.url, args.first_user_id + index, events[index], closes)))
+        # Bağlantıları kabul sınırını zorlamadan yay
+        if index % args.connect_batch == args.connect_batch - 1:
+            await asyncio.sleep(0.1)
+    await asyncio.gather(*(event.wait() for event in events))
+
+    print(f"{args.clients} istemci bağlandı; {args.duration} sn bekleniyor")
+    started = time.monotonic()
+    while time.monotonic() - started < args.duration:
+        await asyncio.sleep(min(args.report_interval, args.duration))
+        values = read_metrics(args.metrics_url)
+        open_clients = sum(1 for task in tasks if not task.done())
+        print(
+            f"  {time.monotonic() - started:7.0f} sn  açık {open_clients:>7}  "
+            f"RSS {values.get('process_resident_memory_bytes', 0) / 1024 / 1024:8.1f} MB  "
+            f"bağlantı başına {values.get('ws_memory_per_connection_bytes', 0) / 1024:6.1f} KB  "
+            f"kapanışlar {dict(closes)}"
+        )
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Boşta bekleyen istemcilerle soak testi.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    policy = commands.add_parser("policy", help="Sunucusuz, ConnectionPolicy üzerinde")
+    policy.add_argument("--clients", type=int, default=50000)
+    policy.add_argument("--idle-timeout", type=float, default=2)
+    policy.add_argument("--rounds", type=int, default=5)
+
+    server = commands.add_parser("server", help="Çalışan sunucuya gerçek bağlantılarla")
+    server.add_argument("--clients", type=int, default=50000)
+    server.add_argument("--duration", type=float, default=1800)
+    server.add_argument("--url", default="ws://127.0.0.1:8001/")
+    server.add_argument("--metrics-url", default="http://127.0.0.1:8001/metrics")
+    server.add_argument("--first-user-id", type=int, default=1)
+    server.add_argument("--connect-batch", type=int, default=500)
+    server.add_argument("--report-interval", type=float, default=60)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(soak_policy(args) if args.command == "policy" else soak_server(args))
@@ -0,0 +1,133 @@
+"""
+Yüksek fan-out altında log yazımının olay döngüsünü bloklayıp bloklamadığı.
+
+Her mod ayrı bir alt süreçte çalışır. Alt sürecin stdout'u, konteyner log sürücüsü gibi
+yavaş okunan bir pipe'a bağlanır (--drain-kbps). Alt süreç --messages mesajı
+--recipients alıcıya dağıtır ve her alıcı için bir log satırı üretir. Bu sırada 1 ms'lik
+bir ölçüm görevi olay döngüsü gecikmesini kaydeder.
+
+Modlar:
+    print     Önceki davranış: alıcı başına print()
+    queue     log_handler: alıcı başına logger.info, kuyruk + yazıcı thread
+    sampled   log_handler: alıcı başına debug_sampled (LOG_LEVEL=INFO iken kayıt oluşmaz)
+
+queue modunda kuyruk dolunca düşürülen kayıtlar "düşen" sütununda görülür.
+
+Kullanım:
+    python -m benchmarks.log_stall [--messages 2000] [--recipients 200] [--drain-kbps 512]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+
+async def lag_probe(lags: list, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + 0.001
+        await asyncio.sleep(0.001)
+        lags.append(loop.time() - expected)
+
+
+async def fan_out(mode: str, messages: int, recipients: int):
+    import logging
+    from log_handler import LOG_RECORDS_DROPPED, debug_sampled, setup_logging
+
+    logger = logging.getLogger("chat_server")
+    if mode != "print":
+        setup_logging()
+
+    lags = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(lag_probe(lags, stop))
+    start = time.perf_counter()
+    for message_id in range(messages):
+        for user_id in range(recipients):
+            if mode == "print":
+                print(f"Mesaj gönderildi: room=group_1 user={user_id} message={message_id}")
+            elif mode == "queue":
+                logger.info("Mesaj gönderildi.", extra={"room_id": "group_1", "user_id": user_id, "message_id": message_id})
+            else:
+                debug_sampled(logger, "Mesaj gönderildi.", room_id="group_1", user_id=user_id, message_id=message_id)
+        # Her mesajdan sonra döngüye dön; gerçek sunucuda send() await'leri bunu yapar
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "seconds": elapsed,
+        "lines_per_second": messages * recipients / elapsed,
+        "lag_p99_ms": lags[int(len(lags) * 0.99)] * 1000 if lags else 0,
+        "lag_max_ms": lags[-1] * 1000 if lags else 0,
+        "dropped": LOG_RECORDS_DROPPED.value(),
+    }
+
+
+def run_child(args):
+    result = asyncio.run(fan_out(args.child, args.messages, args.recipients))
+    sys.stdout.flush()
+    sys.stderr.write(json.dumps(result) + "\n")
+
+
+def slow_reader(pipe, kbps: int):
+    """
+    Pipe'ı saniyede kbps kilobayt hızla okur.
+    """
+    chunk = 4096
+    interval = chunk / (kbps * 1024)
+    while pipe.read(chunk):
+        time.sleep(interval)
+
+
+def run_mode(mode: str, args) -> dict:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.log_stall", "--child", mode,
+         "--messages", str(args.messages), "--recipients", str(args.recipients)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        env={**os.environ, "LOG_LEVEL": "INFO"}
+    )
+    reader = threading.Thread(target=slow_reader, args=(process.stdout, args.drain_kbps), daemon=True)
+    reader.start()
+    # stdout yalnızca yavaş okuyucu tarafından okunur; sonuç stderr'dedir
+    stderr = process.stderr.read()
+    process.wait()
+    reader.join()
+    lines = stderr.decode().strip().splitlines()
+    if process.returncode or not lines or not lines[-1].startswith("{"):
+        raise RuntimeError(f"{mode} modu başarısız oldu:\n{stderr.decode()}")
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fan-out sırasında log yazımının olay döngüsüne etkisi.")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--recipients", type=int, default=200)
+    parser.add_argument("--drain-kbps", type=int, default=512, help="stdout pipe'ının okunma hızı")
+    parser.add_argument("--modes", nargs="+", default=["print", "queue", "sampled"])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    print(f"{args.messages} mesaj x {args.recipients} alıcı, stdout {args.drain_kbps} KB/sn okunuyor")
+    print(f"  {'mod':<10}{'süre':>10}{'satır/sn':>14}{'gecikme p99':>14}{'gecikme max':>14}{'düşen':>10}")
+    for mode in args.modes:
+        result = run_mode(mode, args)
+        print(
+            f"  {mode:<10}{result['seconds']:>9.2f}s{result['lines_per_second']:>14.0f}"
+            f"{result['lag_p99_ms']:>12.1f}ms{result['lag_max_ms']:>12.1f}ms{result['dropped']:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Aylık bölümlenmiş messages tablosu ile bölümlenmemiş tablonun sorgu gecikmesi karşılaştırması.
+
+Her düzen kendi şemasında (bench_<düzen>) users ve messages tablolarıyla kurulur ve aynı
+veriyle doldurulur: --users kullanıcı, her kullanıcının --partners sohbet ortağı ve
+--years yıla eşit yayılmış --messages mesaj. Sorgular uygulamanın kullandığı
+statements.py ifadeleriyle çalıştırılır; şema search_path ile seçilir.
+
+Düzenler:
+    heap          Bölümlenmemiş, yalnızca birincil anahtar (önceki durum)
+    heap_indexed  Bölümlenmemiş, models.Message'taki indekslerle
+    partitioned   Aylık partition'lar ve aynı indeksler (şu anki durum)
+
+Sorgular:
+    history_recent  Bir sohbetin son 30 gündeki son 50 mesajı (geçmişin ilk sayfası)
+    history_old     İki yıl önceki 30 günlük penceredeki 50 mesaj (derin sayfa)
+    chat_latest     Sohbet listesi, son CHAT_LIST_WINDOW_DAYS içindeki son mesajlar
+    chat_unread     Sohbet listesi, okunmamış sayıları (zaman sınırı yok)
+    chat_older      Sohbet listesi, pencere dışındaki sohbetler (zaman sınırı yok)
+
+Postgres çalışıyor ve DATABASE_URL tanımlı olmalıdır. Şemalar her çalıştırmada yeniden
+oluşturulur; --keep verilirse mevcut veri kullanılır.
+
+Kullanım:
+    python -m benchmarks.message_partitions --messages 10000000 --years 3 --samples 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import statements
+from partitions import CHAT_LIST_WINDOW_DAYS, ensure_message_partitions
+from utils import get_current_utc_time
+
+load_dotenv()
+
+LAYOUTS = ("heap", "heap_indexed", "partitioned")
+QUERIES = ("history_recent", "history_old", "chat_latest", "chat_unread", "chat_older")
+
+MESSAGE_COLUMNS = (
+    "id bigint NOT NULL, sender_id integer NOT NULL, receiver_id integer NOT NULL, content varchar NOT NULL, "
+    "sent_date timestamptz NOT NULL, is_read boolean DEFAULT false, attachment_id integer, "
+    "PRIMARY KEY (id, sent_date)"
+)
+MESSAGE_INDEXES = (
+    "CREATE INDEX ON messages (sender_id, receiver_id, sent_date)",
+    "CREATE INDEX ON messages (receiver_id, sender_id, sent_date)",
+    "CREATE INDEX ON messages (receiver_id, sender_id) WHERE is_read = false",
+)
+
+
+def schema_name(layout: str) -> str:
+    return f"bench_{layout}"
+
+
+async def create_layout(conn, layout: str, start, args):
+    schema = schema_name(layout)
+    await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+    await conn.execute(text(f"CREATE SCHEMA {schema}"))
+    await conn.execute(text(f"SET search_path TO {schema}"))
+    await conn.execute(text("CREATE TABLE users (id integer PRIMARY KEY, username varchar NOT NULL)"))
+    await conn.execute(text(
+        "INSERT INTO users SELECT g, 'user' || g FROM generate_series(1, :users) g"
+    ), {"users": args.users})
+
+    if layout == "partitioned":
+        await conn.execute(text(f"CREATE TABLE messages ({MESSAGE_COLUMNS}) PARTITION BY RANGE (sent_date)"))
+        # Partition adları şemaya göre çözülür (search_path)
+        await ensure_message_partitions(conn, since=start)
+    else:
+        await conn.execute(text(f"CREATE TABLE messages ({MESSAGE_COLUMNS})"))
+
+
+async def seed_messages(conn, layout: str, source: str, start, end, args):
+    await conn.execute(text(f"SET search_path TO {schema_name(layout)}"))
+    if source is not None:
+        await conn.execute(text(f"INSERT INTO messages SELECT * FROM {schema_name(source)}.messages"))
+    else:
+        # ID'ler zamanla artar (snowflake gibi); her kullanıcı --partners ortakla mesajlaşır
+        await conn.execute(text("SELECT setseed(0.42)"))
+        await conn.execute(text(
+            "INSERT INTO messages (id, sender_id, receiver_id, content, sent_date, is_read) "
+            "SELECT g, sender, 1 + (sender + partner) % :users, 'mesaj ' || g, "
+            "       CAST(:start AS timestamptz) + CAST(:span AS interval) * (g::float8 / :messages), random() < 0.9 "
+            "FROM (SELECT g, 1 + floor(random() * :users)::int AS sender, floor(random() * :partners)::int AS partner "
+            "      FROM generate_series(1, :messages) g) s"
+        ), {"users": args.users, "partners": args.partners, "messages": args.messages, "start": start, "span": end - start})
+    if layout != "heap":
+        for statement in MESSAGE_INDEXES:
+            await conn.execute(text(statement))
+    await conn.execute(text("ANALYZE messages"))
+    await conn.execute(text("ANALYZE users"))
+
+
+def build_query(name: str, user_id: int, partner_ids: list, now):
+    window_start = now - timedelta(days=CHAT_LIST_WINDOW_DAYS)
+    if name == "history_recent":
+        return statements.conversation_page(user_id, partner_ids[0], now, now - timedelta(days=30), limit=50)
+    if name == "history_old":
+        upper = now - timedelta(days=730)
+        return statements.conversation_page(user_id, partner_ids[0], upper, upper - timedelta(days=30), limit=50)
+    if name == "chat_latest":
+        return statements.chat_list_latest(user_id, window_start)
+    if name == "chat_unread":
+        return statements.chat_list_unread(user_id, partner_ids)
+    return statements.chat_list_older(user_id, partner_ids)
+
+
+def partners_of(user_id: int, args) -> list:
+    return [1 + (user_id + partner) % args.users for partner in range(args.partners)]
+
+
+async def measure(conn, layout: str, now, args) -> dict:
+    await conn.execute(text(f"SET search_path TO {schema_name(layout)}"))
+    rng = random.Random(7)
+    samples = [rng.randint(1, args.users) for _ in range(args.samples)]
+    results = {}
+    for name in QUERIES:
+        # Isınma: önbellekler ve plan önbelleği
+        for user_id in samples[:10]:
+            (await conn.execute(build_query(name, user_id, partners_of(user_id, args), now))).all()
+        latencies = []
+        for user_id in samples:
+            stmt = build_query(name, user_id, partners_of(user_id, args), now)
+            started = time.perf_counter()
+            (await conn.execute(stmt)).all()
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        results[name] = (statistics.median(latencies), latencies[int(len(latencies) * 0.95)])
+    return results
+
+
+async def async_main(args):
+    engine = create_async_engine(os.getenv("DATABASE_URL"))
+    end = get_current_utc_time()
+    start = end - timedelta(days=365 * args.years)
+    try:
+        if not args.keep:
+            source = None
+            for layout in args.layouts:
+                began = time.perf_counter()
+                async with engine.begin() as conn:
+                    await create_layout(conn, layout, start, args)
+                    await seed_messages(conn, layout, source, start, end, args)
+                source = source or layout
+                print(f"{layout}: {args.messages} mesaj yüklendi ({time.perf_counter() - began:.0f} sn)")
+
+        results = {}
+        for layout in args.layouts:
+            async with engine.connect() as conn:
+                results[layout] = await measure(conn, layout, end, args)
+    finally:
+        await engine.dispose()
+
+    print(f"{args.messages} mesaj, {args.years} yıl, {args.users} kullanıcı; {args.samples} örnek, p50 / p95 ms")
+    print(f"  {'sorgu':<16}" + "".join(f"{layout:>22}" for layout in args.layouts))
+    for name in QUERIES:
+        cells = "".join(
+            f"{results[layout][name][0] * 1000:>12.2f} /{results[layout][name][1] * 1000:>8.2f}" for layout in args.layouts
+        )
+        print(f"  {name:<16}{cells}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bölümlenmiş ve bölümlenmemiş messages tablosunun sorgu gecikmesi.")
+    parser.add_argument("--messages", type=int, default=10000000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--partners", type=int, default=20, help="Kullanıcı başına sohbet ortağı")
+    parser.add_argument("--samples", type=int, default=100, help="Sorgu başına ölçüm")
+    parser.add_argument("--layouts", nargs="+", default=list(LAYOUTS), choices=LAYOUTS)
+    parser.add_argument("--keep", action="store_true", help="Mevcut bench_* şemalarını yeniden yüklemeden kullan")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(async_main(parse_args()))
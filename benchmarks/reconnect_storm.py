@@ -0,0 +1,237 @@
+"""
+Yeniden bağlanma fırtınasında giriş kontrolünün (AdmissionController) etkisi.
+
+Sunucu bu süreçte, istemciler ayrı bir alt süreçte çalışır. --clients istemcinin tamamı
+aynı anda bağlanır (ağ kesintisinden sonraki toplu yeniden bağlanma). Doğrulama sorgusu
+Postgres yerine --pool bağlantılık bir havuz ve --query-ms süren bir bekleme ile
+taklit edilir; havuzdan --pool-timeout saniyede bağlantı alınamazsa doğrulama başarısız
+olur (SQLAlchemy havuzunun varsayılanları: 5 + 10 bağlantı, 30 sn).
+    none        Sınır yok; her bağlantı hemen doğrulanır ve havuzu bekler
+    admission   chat_server ile aynı akış: kuyruk doluysa el sıkışma 503 + Retry-After ile,
+                kuyrukta süresi dolan bağlantı 1013 + retry_after_ms ile reddedilir
+İstemciler reddedilince önerilen süre kadar, öneri yoksa --retry saniye bekleyip yeniden
+dener. Tüm istemciler bağlanınca ölçülenler:
+    - Bağlanma süresi (fırtınanın başından istemcinin doğrulanmasına kadar) p50/p99/en fazla
+    - Toplam deneme ve ret sayıları (503, 1013, el sıkışma/bağlantı hatası, havuz zaman aşımı)
+    - Aynı anda açık el sıkışma ve havuz bekleyen bağlantı sayısının en yükseği
+    - Olay döngüsü gecikmesinin en yükseği (bağlı kullanıcıların gördüğü gecikme)
+    - Sunucu CPU süresi
+
+İstemci sayısının iki katı kadar dosya tanımlayıcısı gerekir: ulimit -n.
+
+Kullanım:
+    python -m benchmarks.reconnect_storm [--clients 10000] [--pool 15] [--query-ms 50] [--modes none admission]
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from http import HTTPStatus
+
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed, InvalidHandshake, InvalidStatus
+
+from admission import AdmissionController, AdmissionRejected
+from connection_policy import serve_options
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)] if ordered else 0.0
+
+
+async def run_clients(port: int, clients: int, retry: float):
+    start = time.perf_counter()
+    connected = []
+    counts = {"attempts": 0, "http_503": 0, "closed_1013": 0, "failed": 0}
+
+    async def client(user_id: int):
+        while True:
+            counts["attempts"] += 1
+            delay = retry
+            try:
+                async with connect(f"ws://127.0.0.1:{port}/", open_timeout=None) as websocket:
+                    await websocket.send(json.dumps({"user_id": user_id}))
+                    reply = json.loads(await websocket.recv())
+                    if reply.get("status") == "connected":
+                        connected.append(time.perf_counter() - start)
+                        # Sunucu tüm istemciler bağlanınca bağlantıları kapatır
+                        await websocket.wait_closed()
+                        return
+                    if "retry_after_ms" in reply:
+                        counts["closed_1013"] += 1
+                        delay = reply["retry_after_ms"] / 1000
+                    else:
+                        counts["failed"] += 1
+            except InvalidStatus as e:
+                counts["http_503"] += 1
+                delay = float(e.response.headers.get("Retry-After", retry))
+            except (OSError, InvalidHandshake, ConnectionClosed, asyncio.TimeoutError):
+                # El sıkışma sunucunun open_timeout süresinde tamamlanmadı veya bağlantı koptu
+                counts["failed"] += 1
+            await asyncio.sleep(delay)
+
+    await asyncio.gather(*(client(user_id) for user_id in range(1, clients + 1)))
+    print(json.dumps({"connected": connected, **counts}))
+
+
+class StormServer:
+    def __init__(self, args, controller):
+        self.args = args
+        self.controller = controller
+        self.pool = asyncio.Semaphore(args.pool)
+        self.connected = 0
+        self.all_connected = asyncio.Event()
+        self.handshaking = 0
+        self.peak_handshaking = 0
+        self.pool_waiting = 0
+        self.peak_pool_waiting = 0
+        self.pool_timeouts = 0
+        self.max_lag = 0.0
+
+    def process_request(self, connection, request):
+        if self.controller is None or self.controller.has_capacity():
+            return None
+        rejection = self.controller.reject_full()
+        response = connection.respond(HTTPStatus.SERVICE_UNAVAILABLE, "too many connections\n")
+        response.headers["Retry-After"] = str(int(rejection.retry_after) + 1)
+        return response
+
+    async def authenticate(self, websocket):
+        json.loads(await websocket.recv())
+        self.pool_waiting += 1
+        self.peak_pool_waiting = max(self.peak_pool_waiting, self.pool_waiting)
+        try:
+            await asyncio.wait_for(self.pool.acquire(), timeout=self.args.pool_timeout)
+        except asyncio.TimeoutError:
+            self.pool_timeouts += 1
+            raise PoolTimeout()
+        finally:
+            self.pool_waiting -= 1
+        try:
+            # Kullanıcı sorgusu ve kayıt
+            await asyncio.sleep(self.args.query_ms / 1000)
+        finally:
+            self.pool.release()
+
+    async def handler(self, websocket):
+        self.handshaking += 1
+        self.peak_handshaking = max(self.peak_handshaking, self.handshaking)
+        try:
+            if self.controller is None:
+                await self.authenticate(websocket)
+            else:
+                async with self.controller.admit():
+                    await self.authenticate(websocket)
+        except AdmissionRejected as e:
+            await websocket.send(json.dumps({"status": "error", "retry_after_ms": int(e.retry_after * 1000)}))
+            await websocket.close(1013, "try again later")
+            return
+        except PoolTimeout:
+            await websocket.send(json.dumps({"status": "error", "message": "Veritabanı meşgul."}))
+            await websocket.close(1011, "pool timeout")
+            return
+        finally:
+            self.handshaking -= 1
+
+        await websocket.send(json.dumps({"status": "connected"}))
+        self.connected += 1
+        if self.connected == self.args.clients:
+            self.all_connected.set()
+        await websocket.wait_closed()
+
+    async def probe_lag(self, interval: float = 0.01):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.max_lag = max(self.max_lag, loop.time() - expected)
+
+
+async def run_mode(mode: str, args) -> dict:
+    controller = AdmissionController() if mode == "admission" else None
+    server = StormServer(args, controller)
+
+    options = serve_options()
+    async with serve(server.handler, "127.0.0.1", 0, process_request=server.process_request, **options) as ws_server:
+        port = ws_server.sockets[0].getsockname()[1]
+        probe = asyncio.create_task(server.probe_lag())
+        cpu = time.process_time()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.reconnect_storm", "--client", str(port),
+            "--clients", str(args.clients), "--retry", str(args.retry),
+            stdout=subprocess.PIPE
+        )
+        waiter = asyncio.create_task(server.all_connected.wait())
+        await asyncio.wait([waiter, asyncio.create_task(process.wait())], return_when=asyncio.FIRST_COMPLETED)
+        if not waiter.done():
+            raise RuntimeError(f"İstemci süreci erken sonlandı: {process.returncode}")
+        cpu = time.process_time() - cpu
+        probe.cancel()
+        ws_server.close()
+        stdout, _ = await process.communicate()
+
+    result = json.loads(stdout)
+    return {
+        "mode": mode,
+        "connected": result["connected"],
+        "attempts": result["attempts"],
+        "http_503": result["http_503"],
+        "closed_1013": result["closed_1013"],
+        "failed": result["failed"],
+        "pool_timeouts": server.pool_timeouts,
+        "peak_handshaking": server.peak_handshaking,
+        "peak_pool_waiting": server.peak_pool_waiting,
+        "max_lag": server.max_lag,
+        "cpu": cpu,
+    }
+
+
+async def async_main(args):
+    results = [await run_mode(mode, args) for mode in args.modes]
+
+    capacity = args.pool * 1000 / args.query_ms
+    print(
+        f"{args.clients} istemci aynı anda; havuz {args.pool} bağlantı x {args.query_ms:g} ms "
+        f"(en fazla {capacity:.0f} doğrulama/sn), havuz zaman aşımı {args.pool_timeout:g} sn"
+    )
+    print(
+        f"  {'mod':<11}{'p50':>8}{'p99':>8}{'en fazla':>10}{'deneme':>9}{'503':>7}{'1013':>7}{'hata':>7}{'havuz z.a.':>12}"
+        f"{'el sıkışma':>12}{'havuz bekl.':>13}{'döngü gecikme':>15}{'CPU':>8}"
+    )
+    for result in results:
+        connected = result["connected"]
+        print(
+            f"  {result['mode']:<11}{percentile(connected, 0.5):>7.2f}s{percentile(connected, 0.99):>7.2f}s"
+            f"{max(connected):>9.2f}s{result['attempts']:>9}{result['http_503']:>7}{result['closed_1013']:>7}{result['failed']:>7}"
+            f"{result['pool_timeouts']:>12}{result['peak_handshaking']:>12}{result['peak_pool_waiting']:>13}"
+            f"{result['max_lag'] * 1000:>13.0f}ms{result['cpu']:>7.2f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Toplu yeniden bağlanmada giriş kontrolünün etkisini ölçer.")
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--pool", type=int, default=15, help="Taklit edilen veritabanı havuzunun boyutu")
+    parser.add_argument("--query-ms", type=float, default=50, help="Bir doğrulamanın havuz bağlantısını tuttuğu süre")
+    parser.add_argument("--pool-timeout", type=float, default=30, help="Havuzdan bağlantı bekleme süresi")
+    parser.add_argument("--retry", type=float, default=1, help="Sunucu bekleme önermediğinde yeniden deneme aralığı")
+    parser.add_argument("--modes", nargs="+", default=["none", "admission"], choices=["none", "admission"])
+    parser.add_argument("--client", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client:
+        asyncio.run(run_clients(args.client, args.clients, args.retry))
+    else:
+        asyncio.run(async_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Mesaj ID üretiminin maliyeti.
+
+SnowflakeGenerator.next_id'nin tek thread ve birden çok thread altındaki hızı, karşılaştırma
+için uuid4 ile birlikte ölçülür. Üretilen ID'lerin tekil ve artan olduğu da doğrulanır.
+Veritabanı sekansı (nextval) her ID için bir gidiş-dönüş gerektirdiğinden burada ölçülmez.
+
+Kullanım:
+    python -m benchmarks.snowflake_ids [--count 1000000] [--threads 4]
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from id_generator import SnowflakeGenerator
+
+
+def per_second(count: int, elapsed: float) -> str:
+    return f"{count / elapsed / 1e6:6.2f} M/sn  {elapsed / count * 1e9:7.0f} ns/ID"
+
+
+def single_thread(count: int):
+    generator = SnowflakeGenerator(0, 0)
+    next_id = generator.next_id
+    start = time.perf_counter()
+    ids = [next_id() for _ in range(count)]
+    elapsed = time.perf_counter() - start
+    assert ids == sorted(ids) and len(set(ids)) == count, "ID'ler tekil ve artan değil"
+    return elapsed
+
+
+def uuid_baseline(count: int):
+    start = time.perf_counter()
+    for _ in range(count):
+        uuid.uuid4()
+    return time.perf_counter() - start
+
+
+def multi_thread(count: int, threads: int):
+    generator = SnowflakeGenerator(0, 0)
+    per_thread = count // threads
+    results = [[] for _ in range(threads)]
+
+    def produce(out):
+        next_id = generator.next_id
+        for _ in range(per_thread):
+            out.append(next_id())
+
+    workers = [threading.Thread(target=produce, args=(out,)) for out in results]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    ids = [snowflake_id for out in results for snowflake_id in out]
+    assert len(set(ids)) == len(ids), "Thread'ler arasında tekrar eden ID var"
+    return per_thread * threads, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snowflake ID üretim hızını ölçer.")
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.count} ID")
+    print(f"  {'next_id, tek thread':<28} {per_second(args.count, single_thread(args.count))}")
+    count, elapsed = multi_thread(args.count, args.threads)
+    print(f"  {f'next_id, {args.threads} thread':<28} {per_second(count, elapsed)}")
+    print(f"  {'uuid4':<28} {per_second(args.count, uuid_baseline(args.count))}")
+
+
+if __name__ == "__main__":
+    main()
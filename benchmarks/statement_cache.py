@@ -0,0 +1,158 @@
+"""
+Sık sorguların istemci tarafı (SQLAlchemy) maliyeti: her çağrıda yeniden kurulan select()
+ile statements.py'deki lambda_stmt ifadeleri.
+
+Sorgular bellekteki bir SQLite veritabanında çalıştırılır; sürücü ve veritabanı süresi iki
+durumda da aynı olduğu için fark ifade kurma, cache key üretme ve derlenmiş ifade önbelleği
+aramasından gelir. "sürücü" sütunu aynı SQL'in doğrudan sürücüyle çalıştırılma süresidir
+(alt sınır). asyncpg prepared statement önbelleğinin etkisi Postgres gerektirdiği için
+burada ölçülmez.
+
+Kullanım:
+    python -m benchmarks.statement_cache [--iterations 20000]
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from sqlalchemy import and_, create_engine, event, insert, or_
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+import statements
+from database import Base
+from models import Message, User
+from utils import get_current_utc_time
+
+USERS = 1000
+MESSAGES = 1000
+
+
+def create_database(users: int = USERS, messages: int = MESSAGES):
+    """
+    1 ve 2 numaralı kullanıcılar arasında messages mesajlık bir sohbet içeren bellek veritabanı.
+    """
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def add_collation(dbapi_connection, _):
+        # users.username önek indeksi Postgres'in "C" collation'ını kullanır
+        dbapi_connection.create_collation("C", lambda a, b: (a > b) - (a < b))
+
+    Base.metadata.create_all(engine, tables=[User.__table__, Message.__table__])
+    now = get_current_utc_time()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": user_id, "username": f"user{user_id}", "user_tag": f"{user_id:04d}",
+             "email": f"user{user_id}@example.com", "password": "x"}
+            for user_id in range(1, users + 1)
+        ])
+        conn.execute(insert(Message), [
+            {"id": message_id, "sender_id": 1 + message_id % 2, "receiver_id": 2 - message_id % 2,
+             "content": f"mesaj {message_id}", "sent_date": now - timedelta(seconds=messages - message_id), "is_read": False}
+            for message_id in range(1, messages + 1)
+        ])
+    return engine
+
+
+def page_columns():
+    return (Message.id, Message.sender_id, Message.receiver_id, Message.content,
+            Message.sent_date, Message.is_read, Message.attachment_id)
+
+
+def inline_page(user1_id, user2_id, upper, lower, before_id, limit):
+    """
+    Önceki get_messages_between_users: ifade her çağrıda baştan kurulur. Kolonlar
+    statements.conversation_page ile aynıdır; yalnızca ifadenin kuruluşu farklıdır.
+    """
+    stmt = select(*page_columns()).where(
+        or_(
+            and_(Message.sender_id == user1_id, Message.receiver_id == user2_id),
+            and_(Message.sender_id == user2_id, Message.receiver_id == user1_id),
+        )
+    )
+    stmt = stmt.where(Message.id < before_id).order_by(Message.id.desc())
+    return stmt.where(Message.sent_date <= upper, Message.sent_date > lower).limit(limit)
+
+
+def cases(now):
+    upper, lower = now, now - timedelta(days=30)
+    return {
+        "user_by_id": (
+            lambda i: select(User).where(User.id == 1 + i % USERS),
+            lambda i: statements.user_by_id(1 + i % USERS),
+        ),
+        "user_by_email": (
+            lambda i: select(User).where(User.email == f"user{1 + i % USERS}@example.com"),
+            lambda i: statements.user_by_email(f"user{1 + i % USERS}@example.com"),
+        ),
+        "user_by_handle": (
+            lambda i: select(User).where(User.username == f"user{1 + i % USERS}", User.user_tag == f"{1 + i % USERS:04d}"),
+            lambda i: statements.user_by_handle(f"user{1 + i % USERS}", f"{1 + i % USERS:04d}"),
+        ),
+        "history_page": (
+            lambda i: inline_page(1, 2, upper, lower, MESSAGES - i % 100, 50),
+            lambda i: statements.conversation_page(1, 2, upper, lower, before_id=MESSAGES - i % 100, limit=50),
+        ),
+    }
+
+
+def run(session, build, iterations: int, rounds: int = 3) -> float:
+    """
+    rounds turun en iyisi; tek turluk ölçüm GC ve zamanlayıcı gürültüsüne açık.
+    """
+    # Isınma: ilk çağrı derlenmiş ifadeyi önbelleğe koyar
+    for index in range(100):
+        session.execute(build(index)).all()
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for index in range(iterations):
+            session.execute(build(index)).all()
+        best = min(best, (time.perf_counter() - start) / iterations)
+        session.expunge_all()
+    return best
+
+
+def run_driver(engine, build, iterations: int) -> float:
+    """
+    Aynı SQL'in SQLAlchemy'siz, doğrudan sqlite3 ile çalıştırılma süresi.
+    """
+    with engine.connect() as conn:
+        compiled = build(0).compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+        # Tarih gibi parametreler SQLite'ın beklediği biçime çevrilir
+        processors = compiled._bind_processors
+        params = tuple(
+            processors[name](compiled.params[name]) if name in processors else compiled.params[name]
+            for name in compiled.positiontup
+        )
+        cursor = conn.connection.dbapi_connection.cursor()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            cursor.execute(compiled.string, params).fetchall()
+        return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sorgu başına SQLAlchemy maliyetini ölçer: select() ile lambda_stmt.")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = create_database()
+    now = get_current_utc_time()
+    print(f"{args.iterations} çağrı, sorgu başına µs")
+    print(f"  {'sorgu':<16}{'select()':>10}{'lambda_stmt':>13}{'sürücü':>9}{'ek yük azalması':>18}")
+    with Session(engine) as session:
+        for name, (before, after) in cases(now).items():
+            before_time = run(session, before, args.iterations)
+            after_time = run(session, after, args.iterations)
+            driver_time = run_driver(engine, after, args.iterations)
+            reduction = 1 - (after_time - driver_time) / (before_time - driver_time)
+            print(
+                f"  {name:<16}{before_time * 1e6:>10.1f}{after_time * 1e6:>13.1f}{driver_time * 1e6:>9.1f}"
+                f"{reduction:>17.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
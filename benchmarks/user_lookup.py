@@ -0,0 +1,109 @@
+"""
+Kullanıcı arama gecikmesi: username#tag tam eşleşmesi, indeksli önek araması, Redis
+önbelleği ve indeks kullanamayan ILIKE taraması (önceki yöntem).
+
+Örnek kullanıcı adları veritabanından rastgele seçilir ve 1..--max-prefix karakterlik
+öneklere bölünür. Her satır --samples sorgunun p50 / p95 değeridir:
+    handle        user_search.resolve_handle, (username, user_tag) indeksi
+    prefix_N      statements.users_by_prefix, N karakterlik önek, önbelleksiz
+    cached_N      user_search.search_users, önbellek dolduktan sonra (N <= USER_SEARCH_CACHE_MAX_PREFIX)
+    ilike_N       username ILIKE 'önek%' (yalnızca --ilike-samples kadar; büyük tabloda yavaştır)
+
+Postgres ve Redis çalışıyor, kullanıcılar deneme.py ile üretilmiş olmalıdır:
+    python deneme.py --users 5000000 --seed 42 --truncate
+
+Kullanım:
+    python -m benchmarks.user_lookup --samples 200 --max-prefix 5
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import func, text
+from sqlalchemy.future import select
+
+import statements
+from database import Database
+from models import User
+from redis_handler import RedisHandler
+from user_search import USER_SEARCH_CACHE_MAX_PREFIX, USER_SEARCH_DEFAULT_LIMIT, prefix_bounds, resolve_handle, search_users
+
+load_dotenv()
+
+
+async def timed(samples, call) -> tuple:
+    latencies = []
+    for sample in samples:
+        start = time.perf_counter()
+        await call(sample)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+async def async_main(args):
+    db = Database()
+    redis_handler = RedisHandler()
+    rng = random.Random(42)
+    results = []
+    try:
+        async with db.async_session() as session:
+            total = (await session.execute(select(func.count()).select_from(User))).scalar()
+            handles = (await session.execute(text(
+                "SELECT username, user_tag FROM users TABLESAMPLE SYSTEM (1) LIMIT :limit"
+            ), {"limit": args.samples})).all()
+            if not handles:
+                raise RuntimeError("Kullanıcı bulunamadı; önce deneme.py ile veritabanını doldurun.")
+            handles = [handles[rng.randrange(len(handles))] for _ in range(args.samples)]
+
+            async def handle(sample):
+                await resolve_handle(session, *sample)
+
+            results.append(("handle", await timed(handles, handle)))
+
+            for length in range(1, args.max_prefix + 1):
+                prefixes = [username[:length].lower() for username, _ in handles]
+
+                async def prefix(sample):
+                    (await session.execute(statements.users_by_prefix(*prefix_bounds(sample), USER_SEARCH_DEFAULT_LIMIT))).all()
+
+                results.append((f"prefix_{length}", await timed(prefixes, prefix)))
+
+                if length <= USER_SEARCH_CACHE_MAX_PREFIX:
+                    async def cached(sample):
+                        await search_users(session, redis_handler, sample)
+
+                    # İlk tur önbelleği doldurur
+                    await timed(set(prefixes), cached)
+                    results.append((f"cached_{length}", await timed(prefixes, cached)))
+
+                async def ilike(sample):
+                    (await session.execute(
+                        select(User.id, User.username, User.user_tag)
+                        .where(User.username.ilike(sample + "%")).limit(USER_SEARCH_DEFAULT_LIMIT)
+                    )).all()
+
+                # Kısa önekler erken eşleştiği için ILIKE'ın en kötü durumu uzun öneklerdedir
+                results.append((f"ilike_{length}", await timed(prefixes[:args.ilike_samples], ilike)))
+    finally:
+        await redis_handler.close()
+        await db.engine.dispose()
+
+    print(f"{total} kullanıcı, p50 / p95 ms")
+    for name, (p50, p95) in results:
+        print(f"  {name:<12}{p50 * 1000:>10.2f} /{p95 * 1000:>9.2f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Kullanıcı arama gecikmesini ölçer.")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--max-prefix", type=int, default=5)
+    parser.add_argument("--ilike-samples", type=int, default=20)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(async_main(parse_args()))
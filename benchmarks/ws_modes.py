@@ -0,0 +1,182 @@
+"""
+Bağımsız mod (main.py + chat_server.py) ile FastAPI modunun (CHAT_WS=fastapi) kaynak
+kullanımı karşılaştırması.
+
+Her mod için sunucu süreçleri başlatılır, /ready beklenir, --clients istemci bağlanıp
+doğrulanır ve her istemci --messages direct mesaj gönderir. Trafik bittikten sonra
+ölçülenler:
+    - Sunucu süreçlerinin toplam RSS'i (/proc/<pid>/status, VmRSS)
+    - Postgres'teki açık bağlantı sayısı (pg_stat_activity, ölçüm bağlantısı hariç)
+    - Redis'teki açık bağlantı sayısı (CLIENT LIST, ölçüm bağlantısı hariç)
+
+Postgres ve Redis çalışıyor, kullanıcılar deneme.py ile üretilmiş olmalıdır
+(--first-user-id'den başlayan --clients + 1 kullanıcı). İstemci sayısı kadar dosya
+tanımlayıcısı gerekir: ulimit -n.
+
+Kullanım:
+    python -m benchmarks.ws_modes --clients 2000 --messages 5 --first-user-id 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+import asyncpg
+import redis.asyncio as redis
+from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+from websockets.asyncio.client import connect
+
+load_dotenv()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_PORT = 8000
+CHAT_PORT = 8001
+
+
+def rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as file:
+        for line in file:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def start(script: str, env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, script], cwd=ROOT, env={**os.environ, **env})
+
+
+def is_ready(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+async def wait_ready(urls, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all([await asyncio.to_thread(is_ready, url) for url in urls]):
+            return
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f"Sunucular hazır olmadı: {urls}")
+
+
+async def client(url: str, user_id: int, receiver_id: int, messages: int, connected: asyncio.Event, done: asyncio.Event):
+    async with connect(url, max_size=None) as websocket:
+        await websocket.send(json.dumps({"user_id": user_id}))
+        while json.loads(await websocket.recv()).get("status") != "connected":
+            pass
+        connected.set()
+        for index in range(messages):
+            await websocket.send(json.dumps({
+                "action": "send_direct_message", "receiver_id": receiver_id, "content": f"bench {index}"
+            }))
+            # Gelen olaylar arasından yanıtı bekle
+            while "status" not in json.loads(await websocket.recv()):
+                pass
+        await done.wait()
+
+
+async def count_postgres(conn) -> int:
+    return await conn.fetchval(
+        "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() AND pid <> pg_backend_pid()"
+    )
+
+
+async def count_redis(client_redis) -> int:
+    return len(await client_redis.client_list()) - 1
+
+
+async def run_mode(mode: str, args, pg_conn, redis_client) -> dict:
+    env = {"CHAT_WS": mode, "API_PORT": str(API_PORT), "DRAIN_WINDOW_SECONDS": "1", "DRAIN_WAVES": "1"}
+    baseline_pg = await count_postgres(pg_conn)
+    baseline_redis = await count_redis(redis_client)
+
+    processes = [start("main.py", env)]
+    ready_urls = [f"http://127.0.0.1:{API_PORT}/ready"]
+    if mode == "standalone":
+        processes.append(start("chat_server.py", env))
+        ready_urls.append(f"http://127.0.0.1:{CHAT_PORT}/ready")
+        ws_url = f"ws://127.0.0.1:{CHAT_PORT}/"
+    else:
+        ws_url = f"ws://127.0.0.1:{API_PORT}/ws"
+
+    try:
+        await wait_ready(ready_urls)
+        idle_rss = sum(rss_bytes(process.pid) for process in processes)
+
+        done = asyncio.Event()
+        events = [asyncio.Event() for _ in range(args.clients)]
+        started = time.perf_counter()
+        tasks = [
+            asyncio.create_task(client(
+                ws_url, args.first_user_id + index, args.first_user_id + (index + 1) % args.clients,
+                args.messages, events[index], done
+            ))
+            for index in range(args.clients)
+        ]
+        await asyncio.gather(*(event.wait() for event in events))
+        # Mesajların gönderilmesini bekle; istemciler açık kalır
+        await asyncio.sleep(args.settle)
+        elapsed = time.perf_counter() - started
+
+        result = {
+            "mode": mode,
+            "processes": len(processes),
+            "rss_idle_mb": idle_rss / 1024 / 1024,
+            "rss_loaded_mb": sum(rss_bytes(process.pid) for process in processes) / 1024 / 1024,
+            "postgres_connections": await count_postgres(pg_conn) - baseline_pg,
+            "redis_connections": await count_redis(redis_client) - baseline_redis,
+            "seconds": elapsed,
+        }
+        done.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return result
+    finally:
+        for process in processes:
+            process.send_signal(signal.SIGTERM)
+        for process in processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def async_main(args):
+    url = make_url(os.getenv("DATABASE_URL")).set(drivername="postgresql")
+    pg_conn = await asyncpg.connect(url.render_as_string(hide_password=False))
+    redis_client = redis.from_url(os.getenv("REDIS_URL"))
+    try:
+        results = [await run_mode(mode, args, pg_conn, redis_client) for mode in args.modes]
+    finally:
+        await pg_conn.close()
+        await redis_client.close()
+
+    print(f"{args.clients} istemci, istemci başına {args.messages} mesaj")
+    print(f"  {'mod':<12}{'süreç':>7}{'RSS boşta':>12}{'RSS yükte':>12}{'PG bağl.':>10}{'Redis bağl.':>13}")
+    for result in results:
+        print(
+            f"  {result['mode']:<12}{result['processes']:>7}{result['rss_idle_mb']:>10.1f}MB"
+            f"{result['rss_loaded_mb']:>10.1f}MB{result['postgres_connections']:>10}{result['redis_connections']:>13}"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bağımsız ve FastAPI WebSocket modlarının kaynak kullanımını karşılaştırır.")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=5, help="İstemci başına gönderilen mesaj")
+    parser.add_argument("--first-user-id", type=int, default=1)
+    parser.add_argument("--settle", type=float, default=5, help="Ölçümden önce trafiğin bitmesi için beklenecek süre")
+    parser.add_argument("--modes", nargs="+", default=["standalone", "fastapi"], choices=["standalone", "fastapi"])
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(async_main(parse_args()))
@@ -1,26 +1,104 @@
 import asyncio
 import pathlib
+import os
+import signal
+import time
+from http import HTTPStatus
 
 from websockets.asyncio.server import serve
 # import ssl
 
-from database import Database
-from models import User, Message
+from database import Database, DATABASE_REPLICA_URLS, READ_YOUR_WRITES_SECONDS, primary_sticky_key
+from partitions import run_partition_maintenance
+from redis_handler import RedisHandler
+from models import User, Message, MessageDedup, Attachment
 from utils import is_there_this_user
 from datetime import datetime
 import json
+import logging
 import pytz
+import metrics
+from log_handler import setup_logging, debug_sampled
+from frame_batcher import FrameBatcher
+from id_generator import next_id, id_to_datetime, acquire_worker_id
+from warmup import Readiness
+from friend_graph import FriendGraph
+from drain import DrainController, DRAIN_FLUSH_TIMEOUT_SECONDS
+from admission import AdmissionController, AdmissionRejected
+from connection_policy import ConnectionPolicy, serve_options
+from outbox import Outbox
+from dedup import MessageDeduplicator, is_valid_client_msg_id, run_dedup_pruning, DUPLICATE_SENDS_TOTAL
+from room_actors import RoomActors, RoomBusy
+from room_registry import RoomRegistry
+from profiling import profiler
+from tracing import DeliveryTracer
+from storage import attachment_access_key
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+logger = logging.getLogger("chat_server")
 
 istanbul_tz = pytz.timezone('Europe/Istanbul')
 
 # Aktif bağlantıları saklar: {user_id: websocket}
 active_connections = {}
 
-# Room'ları saklar: {room_id: {user_ids: set, type: 'direct'/'group'}}
-active_rooms = {}
+# main() içinde oluşturulur
+db = None
+redis_handler = None
+friend_graph = None
+outbox = None
+deduplicator = None
+
+readiness = Readiness()
+
+drain_controller = DrainController()
+
+admission_controller = AdmissionController()
+
+connection_policy = ConnectionPolicy(active_connections)
+
+# Room bazlı kayıt ve dağıtım sırası; farklı room'lar paralel işlenir
+room_actors = RoomActors()
+
+# Gönderen -> alıcı teslimat süreleri
+delivery_tracer = DeliveryTracer()
+
+# Bağlanan istemcinin kimlik mesajını göndermesi için süre; yavaş istemciler doğrulama sırasını tutmasın
+AUTH_TIMEOUT_SECONDS = float(os.getenv("AUTH_TIMEOUT_SECONDS", 10))
 
-# Kullanıcının hangi room'larda olduğunu takip eder: {user_id: set(room_ids)}
-user_rooms = {}
+# Olay birleştirmeyi seçen bağlantılar: {user_id: FrameBatcher}
+connection_batchers = {}
+
+# Çevrimdışı kutusu teslim edilirken gelen canlı olaylar: {user_id: [olay]}; kutudan sonra gönderilir
+deferred_events = {}
+
+# Room'lar ve kullanıcının hangi room'larda olduğu; boşta kalan room'lar silinir
+room_registry = RoomRegistry(active_connections)
+
+KNOWN_ACTIONS = {"send_direct_message", "send_group_message", "create_group", "join_room", "leave_room", "get_rooms", "ack"}
+
+WS_ACTIONS_TOTAL = metrics.counter(
+    "ws_actions_total",
+    "Action ve sonuç durumuna göre WebSocket action sayısı.",
+    ("action", "status")
+)
+WS_ACTION_SECONDS = metrics.histogram(
+    "ws_action_duration_seconds",
+    "Action bazında WebSocket işlem süresi.",
+    ("action",)
+)
+WS_ACTIVE_CONNECTIONS = metrics.gauge("ws_active_connections", "Aktif WebSocket bağlantı sayısı.")
+WS_ACTIVE_CONNECTIONS.set_function(lambda: len(active_connections))
+WS_ACTIVE_ROOMS = metrics.gauge("ws_active_rooms", "Bellekteki room sayısı.")
+WS_ACTIVE_ROOMS.set_function(lambda: len(room_registry))
+ROOM_SIZE = metrics.histogram(
+    "ws_fanout_room_size",
+    "Mesaj gönderilen room'ların üye sayısı dağılımı.",
+    buckets=(1, 2, 3, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+FANOUT_SECONDS = metrics.histogram("ws_fanout_duration_seconds", "Bir olayın room üyelerine gönderilme süresi.")
+MESSAGE_COMMIT_SECONDS = metrics.histogram("message_commit_seconds", "save_message_to_db commit süresi.")
 
 def generate_room_id(user1_id, user2_id=None, room_type="direct"):
     """
@@ -47,119 +125,313 @@ def get_or_create_room(user_ids, room_type="direct"):
         # Grup için yeni room oluştur
         room_id = generate_room_id(user_ids[0], room_type="group")
     
-    if room_id not in active_rooms:
-        active_rooms[room_id] = {
-            'user_ids': set(user_ids),
-            'type': room_type
-        }
-    
-    return room_id
+    return room_registry.create(room_id, user_ids, room_type)
 
 def add_user_to_room(user_id, room_id):
     """
-    Kullanıcıyı room'a ekler.
+    Kullanıcıyı room'a ekler. Room yoksa veya kullanıcı bu direct room'un tarafı değilse False döner.
     """
-    if room_id in active_rooms:
-        active_rooms[room_id]['user_ids'].add(user_id)
-    
-    if user_id not in user_rooms:
-        user_rooms[user_id] = set()
-    user_rooms[user_id].add(room_id)
+    return room_registry.add_member(user_id, room_id)
 
 def remove_user_from_room(user_id, room_id):
     """
     Kullanıcıyı room'dan çıkarır.
     """
-    if room_id in active_rooms:
-        active_rooms[room_id]['user_ids'].discard(user_id)
-        # Room boşsa sil
-        if not active_rooms[room_id]['user_ids']:
-            del active_rooms[room_id]
-    
-    if user_id in user_rooms:
-        user_rooms[user_id].discard(room_id)
-        if not user_rooms[user_id]:
-            del user_rooms[user_id]
+    room_registry.remove_member(user_id, room_id)
 
 def get_user_accessible_rooms(user_id):
     """
     Kullanıcının erişebileceği room'ları döndürür.
     """
-    return user_rooms.get(user_id, set())
+    return room_registry.rooms_of(user_id)
 
-async def register_connection(user_id, websocket):
+async def register_connection(user_id, websocket, batch=False):
     """
     Kullanıcının bağlantısını kaydet.
+    batch True ise kullanıcıya giden olaylar birleştirilerek gönderilir.
     """
     active_connections[user_id] = websocket
-    print(f"Kullanıcı {user_id} bağlandı ve kaydedildi.")
-    print(f"Aktif bağlantı sayısı: {len(active_connections)}")
+    connection_policy.touch(user_id)
+    # Kutudaki eski olaylar gönderilene kadar canlı olaylar bekletilir (bkz. deliver_outbox)
+    deferred_events[user_id] = []
+    if batch:
+        connection_batchers[user_id] = FrameBatcher(websocket)
+    else:
+        connection_batchers.pop(user_id, None)
+    logger.info("Kullanıcı bağlandı.", extra={"user_id": user_id, "active_connections": len(active_connections)})
 
 async def unregister_connection(user_id, websocket):
     """
     Kullanıcı bağlantısını kaldır ve tüm room'lardan çıkar.
     """
+    batcher = connection_batchers.pop(user_id, None)
+    if batcher:
+        await batcher.close()
+
+    deferred_events.pop(user_id, None)
+    connection_policy.forget(user_id)
     if user_id in active_connections:
         del active_connections[user_id]
-        print(f"Kullanıcı {user_id} bağlantısı kesildi.")
-        print(f"Aktif bağlantı sayısı: {len(active_connections)}")
+        logger.info("Kullanıcı bağlantısı kesildi.", extra={"user_id": user_id, "active_connections": len(active_connections)})
     
     # Kullanıcıyı tüm room'lardan çıkar
-    if user_id in user_rooms:
-        rooms_to_leave = user_rooms[user_id].copy()
-        for room_id in rooms_to_leave:
-            remove_user_from_room(user_id, room_id)
+    for room_id in list(get_user_accessible_rooms(user_id)):
+        remove_user_from_room(user_id, room_id)
 
 async def send_to_room(room_id, message_data, sender_id=None):
     """
-    Room'daki tüm kullanıcılara mesaj gönder (gönderici hariç).
+    Room'daki tüm kullanıcılara mesaj gönder (gönderici hariç). Olayın gönderildiği anki
+    room üyelerini (gönderici dahil) döndürür.
     """
-    if room_id not in active_rooms:
-        return
+    # Silinmiş direct room'lar ID'lerinden yeniden kurulur
+    room = room_registry.get(room_id)
+    if room is None:
+        return ()
     
-    room = active_rooms[room_id]
     message_json = json.dumps(message_data)
+    members = list(room.members)
+    ROOM_SIZE.observe(len(members))
+    start = time.perf_counter()
     
-    for user_id in room['user_ids']:
+    for user_id in members:
         # Gönderici kendine mesaj göndermesin
         if sender_id and user_id == sender_id:
             continue
-            
         if user_id in active_connections:
+            if await send_to_user(user_id, message_json):
+                debug_sampled(logger, "Mesaj gönderildi.", room_id=room_id, user_id=user_id)
+        elif outbox is not None:
+            # Alıcı çevrimdışı; bağlandığında kutusundan teslim edilir
             try:
-                await active_connections[user_id].send(message_json)
-                print(f"Mesaj room {room_id}'dan {user_id} kullanıcısına gönderildi.")
+                await outbox.append(user_id, message_json)
             except Exception as e:
-                print(f"Kullanıcı {user_id}'ye mesaj gönderilemedi: {e}")
+                logger.warning("Olay çevrimdışı kutusuna yazılamadı.", extra={"room_id": room_id, "user_id": user_id, "error": str(e)})
+            # Yazma sürerken bağlandıysa kutu teslimatı bu olayı kaçırmış olabilir; canlı da gönderilir
+            # (istemciler olayları message_id ile tekilleştirir)
+            if user_id in active_connections:
+                await send_to_user(user_id, message_json)
+
+    FANOUT_SECONDS.observe(time.perf_counter() - start)
+    return members
 
-async def save_message_to_db(sender_id, receiver_id, content, session):
+async def send_to_user(user_id, message_json):
     """
-    Mesajı veritabanına kaydet.
-    Grup mesajları için receiver_id 0 olarak kaydedilir.
+    JSON olayı kullanıcının bağlantısına (varsa birleştirici üzerinden) gönderir.
+    Kullanıcı bağlı değilse veya gönderim başarısızsa False döner.
     """
+    websocket = active_connections.get(user_id)
+    if websocket is None:
+        return False
+    deferred = deferred_events.get(user_id)
+    if deferred is not None:
+        deferred.append(message_json)
+        return True
+    try:
+        batcher = connection_batchers.get(user_id)
+        if batcher:
+            if not batcher.add(message_json):
+                # Bekleyen olaylar sınırı aştı, bağlantı kapatılıyor
+                return False
+        else:
+            await websocket.send(message_json)
+        # Yalnızca dinleyen istemciler boşta sayılmasın
+        connection_policy.touch(user_id)
+        return True
+    except Exception as e:
+        logger.warning("Kullanıcıya mesaj gönderilemedi.", extra={"user_id": user_id, "error": str(e)})
+        return False
+
+async def deliver_outbox(user_id, websocket, batch):
+    """
+    Çevrimdışıyken biriken olayları, bağlantı kaydedildiği andaki son olaya kadar gönderir;
+    ardından bu sırada bekletilen canlı olayları gönderir. Kutudan yalnızca bağlantıya
+    yazılmış olaylar silinir: birleştirme seçen istemcilere her parti tek frame olarak
+    FrameBatcher'ı beklemeden yazılır.
+    """
+    deferred = deferred_events.get(user_id)
+
+    async def write(events):
+        written = 0
+        try:
+            if batch:
+                await websocket.send("[" + ",".join(events) + "]")
+                return len(events)
+            for event in events:
+                await websocket.send(event)
+                written += 1
+        except Exception as e:
+            logger.warning("Çevrimdışı olaylar gönderilemedi.", extra={"user_id": user_id, "error": str(e)})
+        return written
+
     try:
+        return await outbox.drain(user_id, write)
+    finally:
+        # Gönderim sırasında yeni olay eklenebilir; liste boşalana kadar erteleme sürer
+        while deferred:
+            events, deferred[:] = list(deferred), []
+            if batch and connection_batchers.get(user_id):
+                for event in events:
+                    connection_batchers[user_id].add(event)
+            elif await write(events) < len(events):
+                break
+        if deferred_events.get(user_id) is deferred:
+            del deferred_events[user_id]
+
+async def flush_batchers():
+    await asyncio.gather(*(batcher.close() for batcher in list(connection_batchers.values())), return_exceptions=True)
+
+# Kısıt adlarında geçen kolon -> istemciye dönecek hata mesajı
+REFERENCE_ERRORS = {
+    "attachment_id": "Ek bulunamadı.",
+    "receiver_id": "Alıcı bulunamadı.",
+    "sender_id": "Gönderen bulunamadı.",
+}
+
+class InvalidReference(Exception):
+    """
+    Mesajın göndereni, alıcısı veya eki veritabanında yok (foreign key ihlali); tekrar denemek
+    sonucu değiştirmez. constraint ihlal edilen kısıtın adıdır (ör. messages_attachment_id_fkey).
+    """
+    def __init__(self, constraint=None):
+        super().__init__(constraint)
+        self.constraint = constraint
+
+    def client_message(self):
+        """
+        İstemciye dönecek hata mesajı; kısıt adı hangi kolonun geçersiz olduğunu belirler.
+        """
+        for column, message in REFERENCE_ERRORS.items():
+            if self.constraint and column in self.constraint:
+                return message
+        return "Mesajın referans verdiği kayıt bulunamadı."
+
+async def check_attachment(user_id, attachment_id, session):
+    """
+    Ek yalnızca yükleyenin kendi mesajına eklenebilir. Ek geçersizse istemciye dönecek
+    hata yanıtını, geçerliyse None döndürür.
+    """
+    if attachment_id is None:
+        return None
+    if not isinstance(attachment_id, int) or isinstance(attachment_id, bool):
+        return {"status": "error", "message": "Geçersiz ek ID."}
+    result = await session.execute(select(Attachment.uploader_id).where(Attachment.id == attachment_id))
+    uploader_id = result.scalar()
+    # Sorgunun açtığı transaction bağlantı boyunca açık kalmasın
+    await session.rollback()
+    if uploader_id != user_id:
+        return {"status": "error", "message": "Ek bulunamadı."}
+    return None
+
+async def grant_attachment_access(attachment_id, room_id):
+    """
+    Grup üyelikleri veritabanında tutulmadığı için ekli grup mesajının dağıtıldığı üyeler,
+    eki REST API'den indirebilmeleri için Redis'e yazılır.
+    """
+    room = room_registry.get(room_id)
+    if room is None or not room.members:
+        return
+    try:
+        await redis_handler.redis.sadd(attachment_access_key(attachment_id), *room.members)
+    except Exception as e:
+        logger.warning("Ek erişimi kaydedilemedi.", extra={"attachment_id": attachment_id, "room_id": room_id, "error": str(e)})
+
+async def save_message_to_db(sender_id, receiver_id, content, session, attachment_id=None, message_id=None, client_msg_id=None):
+    """
+    Mesajı veritabanına kaydet ve ID'sini döndür.
+    Grup mesajları için receiver_id None olarak kaydedilir.
+    message_id verilmezse yeni bir snowflake ID üretilir.
+    client_msg_id daha önce kaydedilmişse yeni mesaj yazılmaz, ilk mesajın ID'si döner.
+    Gönderen, alıcı veya ek yoksa InvalidReference fırlatır; diğer kayıt hatalarında None döner.
+    """
+    try:
+        if message_id is None:
+            message_id = next_id()
         message = Message(
+            id=message_id,
+            # sent_date ID'deki zamanla aynı tutulur; böylece ID imleci partition budamada kullanılabilir
+            sent_date=id_to_datetime(message_id),
             sender_id=sender_id,
-            receiver_id=receiver_id if receiver_id else 0,  # Grup için 0
-            content=content
+            receiver_id=receiver_id,  # Grup için None
+            content=content,
+            attachment_id=attachment_id
         )
         session.add(message)
-        await session.commit()
-        print(f"Mesaj veritabanına kaydedildi: {sender_id} -> {receiver_id}")
+        if client_msg_id:
+            # Aynı transaction'da yazılır; birincil anahtar tekrarları engeller
+            session.add(MessageDedup(sender_id=sender_id, client_msg_id=client_msg_id, message_id=message_id))
+        with MESSAGE_COMMIT_SECONDS.time():
+            await session.commit()
+        if DATABASE_REPLICA_URLS and redis_handler is not None:
+            # Gönderen, geçmişi okurken kendi mesajını görebilsin diye bir süre primary'den okur
+            await redis_handler.set(key=primary_sticky_key(sender_id), value="1", expire_seconds=READ_YOUR_WRITES_SECONDS)
+        debug_sampled(logger, "Mesaj veritabanına kaydedildi.", sender_id=sender_id, receiver_id=receiver_id)
+        return message_id
+    except IntegrityError as e:
+        await session.rollback()
+        if client_msg_id:
+            result = await session.execute(select(MessageDedup.message_id).where(
+                MessageDedup.sender_id == sender_id,
+                MessageDedup.client_msg_id == client_msg_id
+            ))
+            existing_id = result.scalar()
+            if existing_id is not None:
+                DUPLICATE_SENDS_TOTAL.inc("database")
+                return existing_id
+        if getattr(e.orig, "sqlstate", None) == "23503":
+            # asyncpg'nin özgün hatası kısıt adını taşır
+            raise InvalidReference(getattr(e.orig.__cause__, "constraint_name", None)) from e
+        logger.error("Mesaj veritabanına kaydedilemedi.", extra={"sender_id": sender_id, "receiver_id": receiver_id, "error": str(e)})
+        return None
     except Exception as e:
-        print(f"Mesaj veritabanına kaydedilemedi: {e}")
+        logger.error("Mesaj veritabanına kaydedilemedi.", extra={"sender_id": sender_id, "receiver_id": receiver_id, "error": str(e)})
         await session.rollback()
+        return None
+
+async def send_idempotent(user_id, message_data, process):
+    """
+    client_msg_id verilen gönderimleri tekilleştirir: tekrarlar kaydetme ve dağıtım
+    yapılmadan ilk gönderimin yanıtını alır. process(client_msg_id) yanıtı döndürür.
+    """
+    client_msg_id = message_data.get('client_msg_id')
+    if client_msg_id is None:
+        return await process(None)
+    if not is_valid_client_msg_id(client_msg_id):
+        return {"status": "error", "message": "Geçersiz client_msg_id."}
+
+    previous = await deduplicator.claim(user_id, client_msg_id)
+    if previous is not None:
+        return previous
+
+    completed = False
+    try:
+        response = await process(client_msg_id)
+        if response.get("status") == "success":
+            await deduplicator.complete(user_id, client_msg_id, response)
+            completed = True
+    finally:
+        if not completed:
+            # İptal (CancelledError) dahil her durumda ayırma kaldırılır; aksi halde tekrarlar
+            # DEDUP_PENDING_TTL_SECONDS boyunca "işleniyor" yanıtı alır
+            await asyncio.shield(deduplicator.release(user_id, client_msg_id))
+    return response
 
 async def handle_direct_message(user_id, message_data, session):
     """
     Direct mesaj işle.
     """
     receiver_id = message_data.get('receiver_id')
-    content = message_data.get('content')
+    content = message_data.get('content') or ""
+    attachment_id = message_data.get('attachment_id')
     
-    if not receiver_id or not content:
+    if not receiver_id or not (content or attachment_id):
         return {"status": "error", "message": "Alıcı ID veya içerik eksik."}
     
+    attachment_error = await check_attachment(user_id, attachment_id, session)
+    if attachment_error:
+        return attachment_error
+    
+    trace = delivery_tracer.start(user_id)
+    
     # Direct room oluştur/getir
     room_id = get_or_create_room([user_id, receiver_id], "direct")
     
@@ -167,54 +439,109 @@ async def handle_direct_message(user_id, message_data, session):
     add_user_to_room(user_id, room_id)
     add_user_to_room(receiver_id, room_id)
     
-    # Mesajı room'a gönder
-    message_to_send = {
-        "type": "direct_message",
-        "room_id": room_id,
-        "sender_id": user_id,
-        "receiver_id": receiver_id,
-        "content": content,
-        "timestamp": istanbul_tz.localize(datetime.now()).isoformat()
-    }
-    
-    # Veritabanına kaydet
-    await save_message_to_db(user_id, receiver_id, content, session)
-    
-    # Room'daki diğer kullanıcılara gönder
-    await send_to_room(room_id, message_to_send, sender_id=user_id)
-    
-    return {"status": "success", "message": "Mesaj gönderildi.", "room_id": room_id}
+    async def process(client_msg_id):
+        # ID commit'ten önce üretilir; olay ve yanıt aynı ID'yi taşır
+        message_id = next_id()
+        
+        # Mesajı room'a gönder
+        message_to_send = {
+            "type": "direct_message",
+            "message_id": message_id,
+            "client_msg_id": client_msg_id,
+            "room_id": room_id,
+            "sender_id": user_id,
+            "receiver_id": receiver_id,
+            "content": content,
+            "attachment_id": attachment_id,
+            "timestamp": istanbul_tz.localize(datetime.now()).isoformat()
+        }
+        
+        # Veritabanına kaydet
+        try:
+            # Actor işi bağlantının oturumunu değil kendi kısa ömürlü oturumunu kullanır
+            async with db.async_session() as job_session:
+                saved_id = await save_message_to_db(user_id, receiver_id, content, job_session, attachment_id=attachment_id,
+                                                    message_id=message_id, client_msg_id=client_msg_id)
+        except InvalidReference as e:
+            return {"status": "error", "message": e.client_message(), "client_msg_id": client_msg_id}
+        if saved_id is None:
+            return {"status": "error", "message": "Mesaj kaydedilemedi.", "client_msg_id": client_msg_id, "retry": True}
+        
+        # Aynı client_msg_id daha önce kaydedilmişse mesaj zaten dağıtılmıştır
+        if saved_id == message_id:
+            trace.mark_persisted(message_id)
+            message_to_send["trace_id"] = trace.trace_id
+            message_to_send["server_timing"] = trace.server_timing()
+            # Room'daki diğer kullanıcılara gönder
+            members = await send_to_room(room_id, message_to_send, sender_id=user_id)
+            delivery_tracer.mark_fanned_out(trace, room_id, members)
+        
+        return {"status": "success", "message": "Mesaj gönderildi.", "room_id": room_id, "message_id": saved_id,
+                "client_msg_id": client_msg_id, "trace_id": trace.trace_id}
+    
+    # Kayıt ve dağıtım room'un actor'ünde sırayla çalışır; alıcılar mesajları kayıt sırasıyla görür
+    return await send_idempotent(user_id, message_data, lambda client_msg_id: room_actors.submit(room_id, process, client_msg_id))
 
 async def handle_group_message(user_id, message_data, session):
     """
     Grup mesajı işle.
     """
     room_id = message_data.get('room_id')
-    content = message_data.get('content')
+    content = message_data.get('content') or ""
+    attachment_id = message_data.get('attachment_id')
     
-    if not room_id or not content:
+    if not room_id or not (content or attachment_id):
         return {"status": "error", "message": "Room ID veya içerik eksik."}
     
     # Kullanıcının bu room'a erişimi var mı kontrol et
     if room_id not in get_user_accessible_rooms(user_id):
         return {"status": "error", "message": "Bu room'a erişim yetkiniz yok."}
     
-    # Mesajı room'a gönder
-    message_to_send = {
-        "type": "group_message",
-        "room_id": room_id,
-        "sender_id": user_id,
-        "content": content,
-        "timestamp": istanbul_tz.localize(datetime.now()).isoformat()
-    }
-    
-    # Grup mesajları için receiver_id = 0 olarak kaydet
-    await save_message_to_db(user_id, 0, f"[{room_id}] {content}", session)
-    
-    # Room'daki diğer kullanıcılara gönder
-    await send_to_room(room_id, message_to_send, sender_id=user_id)
-    
-    return {"status": "success", "message": "Grup mesajı gönderildi.", "room_id": room_id}
+    attachment_error = await check_attachment(user_id, attachment_id, session)
+    if attachment_error:
+        return attachment_error
+    
+    trace = delivery_tracer.start(user_id)
+    
+    async def process(client_msg_id):
+        message_id = next_id()
+        
+        # Mesajı room'a gönder
+        message_to_send = {
+            "type": "group_message",
+            "message_id": message_id,
+            "client_msg_id": client_msg_id,
+            "room_id": room_id,
+            "sender_id": user_id,
+            "content": content,
+            "attachment_id": attachment_id,
+            "timestamp": istanbul_tz.localize(datetime.now()).isoformat()
+        }
+        
+        # Grup mesajlarının alıcısı yoktur, receiver_id = None olarak kaydet
+        try:
+            async with db.async_session() as job_session:
+                saved_id = await save_message_to_db(user_id, None, f"[{room_id}] {content}", job_session, attachment_id=attachment_id,
+                                                    message_id=message_id, client_msg_id=client_msg_id)
+        except InvalidReference as e:
+            return {"status": "error", "message": e.client_message(), "client_msg_id": client_msg_id}
+        if saved_id is None:
+            return {"status": "error", "message": "Mesaj kaydedilemedi.", "client_msg_id": client_msg_id, "retry": True}
+        
+        if saved_id == message_id:
+            trace.mark_persisted(message_id)
+            message_to_send["trace_id"] = trace.trace_id
+            message_to_send["server_timing"] = trace.server_timing()
+            if attachment_id is not None:
+                await grant_attachment_access(attachment_id, room_id)
+            # Room'daki diğer kullanıcılara gönder
+            members = await send_to_room(room_id, message_to_send, sender_id=user_id)
+            delivery_tracer.mark_fanned_out(trace, room_id, members)
+        
+        return {"status": "success", "message": "Grup mesajı gönderildi.", "room_id": room_id, "message_id": saved_id,
+                "client_msg_id": client_msg_id, "trace_id": trace.trace_id}
+    
+    return await send_idempotent(user_id, message_data, lambda client_msg_id: room_actors.submit(room_id, process, client_msg_id))
 
 async def handle_create_group(user_id, message_data, session):
     """
@@ -247,7 +574,7 @@ async def handle_create_group(user_id, message_data, session):
     }
     
     # Tüm katılımcılara bildir
-    await send_to_room(room_id, create_message)
+    await room_actors.submit(room_id, send_to_room, room_id, create_message)
     
     return {"status": "success", "message": "Grup oluşturuldu.", "room_id": room_id}
 
@@ -257,12 +584,10 @@ async def handle_join_room(user_id, message_data, session):
     """
     room_id = message_data.get('room_id')
     
-    if not room_id or room_id not in active_rooms:
+    # Kullanıcıyı room'a ekle; başkalarının direct room'larına katılınamaz
+    if not room_id or room_registry.get(room_id) is None or not add_user_to_room(user_id, room_id):
         return {"status": "error", "message": "Geçersiz room ID."}
     
-    # Kullanıcıyı room'a ekle
-    add_user_to_room(user_id, room_id)
-    
     # Katılım mesajı gönder
     join_message = {
         "type": "user_joined",
@@ -271,7 +596,8 @@ async def handle_join_room(user_id, message_data, session):
         "timestamp": istanbul_tz.localize(datetime.now()).isoformat()
     }
     
-    await send_to_room(room_id, join_message, sender_id=user_id)
+    # Katılım olayı room'daki mesajlarla aynı sırada dağıtılır
+    await room_actors.submit(room_id, send_to_room, room_id, join_message, user_id)
     
     return {"status": "success", "message": "Room'a katıldınız.", "room_id": room_id}
 
@@ -284,6 +610,10 @@ async def handle_leave_room(user_id, message_data, session):
     if not room_id:
         return {"status": "error", "message": "Room ID gerekli."}
     
+    # Üyesi olunmayan room için actor oluşturulmaz
+    if room_id not in get_user_accessible_rooms(user_id) or room_registry.get(room_id) is None:
+        return {"status": "error", "message": "Bu room'a erişim yetkiniz yok."}
+    
     # Ayrılma mesajı gönder
     leave_message = {
         "type": "user_left",
@@ -292,13 +622,25 @@ async def handle_leave_room(user_id, message_data, session):
         "timestamp": istanbul_tz.localize(datetime.now()).isoformat()
     }
     
-    await send_to_room(room_id, leave_message, sender_id=user_id)
+    async def leave():
+        await send_to_room(room_id, leave_message, sender_id=user_id)
+        # Kullanıcıyı room'dan çıkar; önceden kuyruğa alınmış mesajlar ona hâlâ ulaşır
+        remove_user_from_room(user_id, room_id)
     
-    # Kullanıcıyı room'dan çıkar
-    remove_user_from_room(user_id, room_id)
+    await room_actors.submit(room_id, leave)
     
     return {"status": "success", "message": "Room'dan ayrıldınız.", "room_id": room_id}
 
+def handle_ack(user_id, message_data):
+    """
+    Alıcının mesajı aldığını bildirmesi; teslimat süresi ölçülür. Geçerli onaylar yanıtlanmaz.
+    """
+    trace_id = message_data.get('trace_id')
+    if not trace_id:
+        return {"status": "error", "message": "trace_id gerekli."}
+    delivery_tracer.ack(user_id, trace_id)
+    return None
+
 async def get_user_rooms_list(user_id):
     """
     Kullanıcının room listesini döndür.
@@ -307,48 +649,78 @@ async def get_user_rooms_list(user_id):
     rooms_info = []
     
     for room_id in user_room_ids:
-        if room_id in active_rooms:
-            room = active_rooms[room_id]
+        room = room_registry.rooms.get(room_id)
+        if room is not None:
             rooms_info.append({
                 "room_id": room_id,
-                "type": room['type'],
-                "participant_count": len(room['user_ids']),
-                "participants": list(room['user_ids'])
+                "type": room.type,
+                "participant_count": len(room.members),
+                "participants": list(room.members)
             })
     
     return {"status": "success", "rooms": rooms_info}
 
+async def authenticate(websocket, session):
+    """
+    İlk mesajdaki kullanıcıyı doğrular ve bağlantıyı kaydeder. Başarısızsa None döner.
+    """
+    message = await asyncio.wait_for(websocket.recv(), timeout=AUTH_TIMEOUT_SECONDS)
+    message_data = json.loads(message)
+    
+    if not isinstance(message_data, dict) or 'user_id' not in message_data:
+        await websocket.send(json.dumps({"status": "error", "message": "Kullanıcı kimliği gerekli."}))
+        return None
+    
+    user_id = message_data['user_id']
+    current_user = await is_there_this_user(user_id, session)
+    
+    if not current_user:
+        await websocket.send(json.dumps({"status": "error", "message": "Kullanıcı bulunamadı."}))
+        return None
+    
+    # İstemci "batch": true gönderirse olaylar dizi frame'lerinde birleştirilir
+    batch = message_data.get('batch') is True
+    await register_connection(user_id, websocket, batch=batch)
+    
+    # Başarılı bağlantı mesajı
+    await websocket.send(json.dumps({
+        "status": "connected", 
+        "user_id": user_id,
+        "batch": batch,
+        "message": "WebSocket bağlantısı kuruldu."
+    }))
+    return user_id
+
 async def handler(websocket, db_instance):    
     async for session in db_instance.get_session():
         user_id = None
         try:
-            # İlk mesajı al (kullanıcı kimlik doğrulama)
-            message = await websocket.recv()
-            message_data = json.loads(message)
-            
-            if not isinstance(message_data, dict) or 'user_id' not in message_data:
-                await websocket.send(json.dumps({"status": "error", "message": "Kullanıcı kimliği gerekli."}))
+            # İlk mesajı al (kullanıcı kimlik doğrulama); aynı anda doğrulanan bağlantı sayısı sınırlıdır
+            try:
+                async with admission_controller.admit():
+                    user_id = await authenticate(websocket, session)
+            except AdmissionRejected as e:
+                await websocket.send(json.dumps({
+                    "status": "error",
+                    "message": "Sunucu yoğun, daha sonra tekrar deneyin.",
+                    "retry_after_ms": int(e.retry_after * 1000)
+                }))
+                await websocket.close(1013, "try again later")
                 return
-            
-            user_id = message_data['user_id']
-            current_user = await is_there_this_user(user_id, session)
-            
-            if not current_user:
-                await websocket.send(json.dumps({"status": "error", "message": "Kullanıcı bulunamadı."}))
+            if user_id is None:
                 return
+            # Doğrulama sorgusunun açtığı transaction'ı kapat; bağlantı boyunca havuzdan bir bağlantı tutulmasın
+            await session.rollback()
             
-            await register_connection(user_id, websocket)
-            
-            # Başarılı bağlantı mesajı
-            await websocket.send(json.dumps({
-                "status": "connected", 
-                "user_id": user_id,
-                "message": "WebSocket bağlantısı kuruldu."
-            }))
+            # Çevrimdışıyken biriken olayları gönder; bağlantı zaten kayıtlı, yeni olaylar bekletiliyor
+            drained = await deliver_outbox(user_id, websocket, user_id in connection_batchers)
+            if drained:
+                logger.info("Çevrimdışı olaylar teslim edildi.", extra={"user_id": user_id, "events": drained})
             
             # Mesaj döngüsü
             while True:
                 message = await websocket.recv()
+                connection_policy.touch(user_id)
                 
                 try:
                     message_data = json.loads(message)
@@ -362,38 +734,61 @@ async def handler(websocket, db_instance):
                 
                 action = message_data['action']
                 response = {"status": "error", "message": "Bilinmeyen action."}
+                action_label = action if action in KNOWN_ACTIONS else "unknown"
+                action_start = time.perf_counter()
                 
-                try:
-                    if action == "send_direct_message":
-                        response = await handle_direct_message(user_id, message_data, session)
+                if drain_controller.draining:
+                    # Onaylanmayan action'ı istemci yeni sunucuya tekrar gönderir
+                    await websocket.send(json.dumps({"status": "error", "message": "Sunucu yeniden başlatılıyor.", "retry": True}))
+                    continue
+                
+                with drain_controller.track():
+                    # Profil açıksa action örneklenir; kapalıyken maliyeti tek bir bayrak kontrolüdür
+                    async with profiler.profile("ws", action_label):
+                        try:
+                            if action == "send_direct_message":
+                                response = await handle_direct_message(user_id, message_data, session)
+                    
+                            elif action == "send_group_message":
+                                response = await handle_group_message(user_id, message_data, session)
                     
-                    elif action == "send_group_message":
-                        response = await handle_group_message(user_id, message_data, session)
+                            elif action == "create_group":
+                                response = await handle_create_group(user_id, message_data, session)
                     
-                    elif action == "create_group":
-                        response = await handle_create_group(user_id, message_data, session)
+                            elif action == "join_room":
+                                response = await handle_join_room(user_id, message_data, session)
                     
-                    elif action == "join_room":
-                        response = await handle_join_room(user_id, message_data, session)
+                            elif action == "leave_room":
+                                response = await handle_leave_room(user_id, message_data, session)
                     
-                    elif action == "leave_room":
-                        response = await handle_leave_room(user_id, message_data, session)
+                            elif action == "get_rooms":
+                                response = await get_user_rooms_list(user_id)
                     
-                    elif action == "get_rooms":
-                        response = await get_user_rooms_list(user_id)
+                            elif action == "ack":
+                                response = handle_ack(user_id, message_data)
                     
-                    else:
-                        response = {"status": "error", "message": f"Desteklenmeyen action: {action}"}
+                            else:
+                                response = {"status": "error", "message": f"Desteklenmeyen action: {action}"}
+                    
+                        except RoomBusy:
+                            response = {"status": "error", "message": "Room yoğun, daha sonra tekrar deneyin.", "retry": True}
+                        except Exception as e:
+                            logger.exception("Action işlemi sırasında hata.", extra={"user_id": user_id, "action": action_label})
+                            response = {"status": "error", "message": "İşlem sırasında hata oluştu."}
+                
+                    WS_ACTION_SECONDS.observe(time.perf_counter() - action_start, action_label)
+                    WS_ACTIONS_TOTAL.inc(action_label, response.get("status", "unknown") if response is not None else "success")
                     
-                except Exception as e:
-                    print(f"Action işlemi sırasında hata: {e}")
-                    response = {"status": "error", "message": "İşlem sırasında hata oluştu."}
+                    # Yanıtı gönder; drain, onay gönderilene kadar bağlantıyı kapatmaz
+                    if response is not None:
+                        await websocket.send(json.dumps(response))
                 
-                # Yanıtı gönder
-                await websocket.send(json.dumps(response))
+                # Sadece okuma yapan action'ların açık bıraktığı transaction'ı kapat
+                if session.in_transaction():
+                    await session.rollback()
       
         except Exception as e:
-            print("[WEBSOCKET ERROR]", e)
+            logger.warning("WebSocket hatası.", extra={"user_id": user_id, "error": str(e)})
         finally:
             # Bağlantı temizliği
             if user_id:
@@ -404,29 +799,124 @@ async def handler(websocket, db_instance):
                 pass
 
 async def disconnect(websocket):
-    print("Bağlantı kesiliyor...")
+    logger.info("Bağlantı kesiliyor...")
     try:
         await websocket.close()
     except:
         pass
-    print("Bağlantı kesildi.")
+    logger.info("Bağlantı kesildi.")
+
+def handshake_rejection():
+    """
+    Yeni bağlantı kabul edilemiyorsa (sebep, önerilen bekleme saniyesi) döndürür, edilebiliyorsa None.
+    Bağımsız sunucu ve FastAPI modu aynı kontrolleri kullanır.
+    """
+    if not readiness.ready:
+        return "warming up", None
+    if drain_controller.draining:
+        return "draining", None
+    if connection_policy.over_memory_budget():
+        return "memory budget exceeded", None
+    if not admission_controller.has_capacity():
+        return "too many connections", admission_controller.reject_full().retry_after
+    return None
+
+def process_request(connection, request):
+    """
+    WebSocket el sıkışmasından önce çalışır; /metrics ve /ready isteklerini düz HTTP olarak
+    yanıtlar. Kabul edilemeyen yeni WebSocket bağlantıları 503 ile reddedilir.
+    """
+    if request.path == "/metrics":
+        response = connection.respond(HTTPStatus.OK, metrics.render())
+        del response.headers["Content-Type"]
+        response.headers["Content-Type"] = metrics.CONTENT_TYPE
+        return response
+    if request.path == "/ready":
+        if readiness.ready and not drain_controller.draining:
+            return connection.respond(HTTPStatus.OK, "ready\n")
+        return connection.respond(HTTPStatus.SERVICE_UNAVAILABLE, "warming up\n")
+    rejection = handshake_rejection()
+    if rejection is not None:
+        reason, retry_after = rejection
+        response = connection.respond(HTTPStatus.SERVICE_UNAVAILABLE, reason + "\n")
+        if retry_after is not None:
+            response.headers["Retry-After"] = str(int(retry_after) + 1)
+        return response
+    return None
+
+def init_services(db_instance, redis, ready=None):
+    """
+    Paylaşılan servisleri bağlar. FastAPI modunda REST API'nin Redis istemcisi ve
+    ısınma durumu verilir; böylece iki taraf aynı havuzları ve önbellekleri kullanır.
+    """
+    global db, redis_handler, friend_graph, outbox, deduplicator, readiness
+    db = db_instance
+    redis_handler = redis
+    friend_graph = FriendGraph(redis)
+    outbox = Outbox(redis)
+    deduplicator = MessageDeduplicator(redis)
+    if ready is not None:
+        readiness = ready
+
+def start_background_tasks(db_instance):
+    return [
+        asyncio.create_task(connection_policy.run_idle_reaper()),
+        asyncio.create_task(run_dedup_pruning(db_instance)),
+        asyncio.create_task(room_registry.run_eviction()),
+    ]
+
+async def drain():
+    await drain_controller.run(active_connections, send_to_user, flush_batchers)
+    await room_actors.close(DRAIN_FLUSH_TIMEOUT_SECONDS)
 
 # ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
 # localhost_pem = pathlib.Path(__file__).with_name("localhost.pem")
 # ssl_context.load_cert_chain(localhost_pem)
 
 async def main():
+    """
+    Bağımsız mod: sohbet protokolünü kendi süreç ve portunda (8001) çalıştırır.
+    REST API ile aynı süreçte çalıştırmak için main.py'de CHAT_WS=fastapi kullanılır.
+    """
+    setup_logging()
     db = Database()
-    async with serve(lambda ws: handler(ws, db), "0.0.0.0", 8001) as server:
-        print("WebSocket sunucusu başlatıldı: ws://0.0.0.0:8001")
-        print("Desteklenen aksiyonlar:")
-        print("- send_direct_message: Direct mesaj gönder")
-        print("- send_group_message: Grup mesajı gönder")
-        print("- create_group: Yeni grup oluştur")
-        print("- join_room: Room'a katıl")
-        print("- leave_room: Room'dan ayrıl")
-        print("- get_rooms: Kullanıcının room listesini al")
-        await server.serve_forever()
+    init_services(db, RedisHandler())
+    # Mesaj ID'leri için bu sürece ait worker ID; alınamazsa süreç başlamaz
+    id_lease = await acquire_worker_id(redis_handler.redis)
+    warmup_task = asyncio.create_task(readiness.run(db, redis_handler))
+    background_tasks = start_background_tasks(db)
+    # FastAPI modunda main.py çalıştırır; bağımsız modda mesajları bu süreç yazdığı için burada da gerekli
+    background_tasks.append(asyncio.create_task(run_partition_maintenance(db)))
+    if id_lease is not None:
+        background_tasks.append(asyncio.create_task(id_lease.run_renewal()))
+
+    # SIGTERM: bağlantıları hepsini birden düşürmek yerine drain modunda kapat
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    # SIGUSR1: profil toplamayı aç/kapat
+    profiler.install_signal_handler()
+    background_tasks.append(asyncio.create_task(profiler.run_loop_lag_monitor()))
+
+    try:
+        async with serve(lambda ws: handler(ws, db), "0.0.0.0", 8001, process_request=process_request, **serve_options()) as server:
+            logger.info(
+                "WebSocket sunucusu başlatıldı.",
+                extra={"url": "ws://0.0.0.0:8001", "metrics": "http://0.0.0.0:8001/metrics", "actions": sorted(KNOWN_ACTIONS)}
+            )
+            await stop.wait()
+
+            # Dinlemeyi bırak, mevcut bağlantılar drain tarafından kapatılır
+            server.close(close_connections=False)
+            await drain()
+            await server.wait_closed()
+    finally:
+        warmup_task.cancel()
+        for task in background_tasks:
+            task.cancel()
+        if id_lease is not None:
+            await id_lease.release()
+        await redis_handler.close()
+        await db.engine.dispose()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+WebSocket bağlantılarının kaynak politikası.
+
+    - Frame ve kuyruk sınırları: serve() parametreleri ortam değişkenlerinden okunur.
+      Bir bağlantının alma tarafında tutabileceği en fazla veri yaklaşık
+      WS_MAX_SIZE * WS_MAX_QUEUE, gönderme tarafında WS_WRITE_LIMIT kadardır.
+    - Keepalive: WS_PING_INTERVAL saniyede bir ping gönderilir, WS_PING_TIMEOUT içinde
+      pong gelmezse bağlantı kapatılır; ölü mobil bağlantılar TCP'nin fark etmesini beklemez.
+    - Boşta kalma: WS_IDLE_TIMEOUT_SECONDS tanımlıysa, bu süre boyunca ne mesaj gönderen ne de
+      kendisine olay iletilen bağlantılar kapatılır. Varsayılan olarak kapalıdır; ölü
+      bağlantıları ping/pong yakalar, yalnızca dinleyen istemciler açık kalır.
+    - Bellek bütçesi: süreç belleği MEMORY_BUDGET_MB'nin MEMORY_REFUSE_RATIO oranını
+      aşınca yeni bağlantılar 503 ile reddedilir.
+"""
+import asyncio
+import logging
+import os
+import resource
+import time
+from typing import Dict
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+# websockets'in varsayılanı (1 MiB); daha küçük değer büyük mesajları 1009 ile reddeder
+WS_MAX_SIZE = int(os.getenv("WS_MAX_SIZE", 2 ** 20))
+WS_MAX_QUEUE = int(os.getenv("WS_MAX_QUEUE", 16))
+WS_WRITE_LIMIT = int(os.getenv("WS_WRITE_LIMIT", 32 * 1024))
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", 20))
+WS_PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", 20))
+# 0 ise boşta kalan bağlantılar kapatılmaz
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", 0))
+WS_IDLE_CHECK_INTERVAL_SECONDS = float(os.getenv("WS_IDLE_CHECK_INTERVAL_SECONDS", 30))
+# 0 ise bellek bütçesi uygulanmaz
+MEMORY_BUDGET_MB = int(os.getenv("MEMORY_BUDGET_MB", 0))
+MEMORY_REFUSE_RATIO = float(os.getenv("MEMORY_REFUSE_RATIO", 0.9))
+
+WS_IDLE_CLOSED_TOTAL = metrics.counter("ws_idle_closed_connections_total", "Boşta kaldığı için kapatılan bağlantı sayısı.")
+WS_MEMORY_REFUSED_TOTAL = metrics.counter("ws_memory_refused_connections_total", "Bellek bütçesi nedeniyle reddedilen bağlantı sayısı.")
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def serve_options() -> dict:
+    """
+    websockets serve() için bağlantı sınırları.
+    """
+    return {
+        "max_size": WS_MAX_SIZE,
+        "max_queue": WS_MAX_QUEUE,
+        "write_limit": WS_WRITE_LIMIT,
+        "ping_interval": WS_PING_INTERVAL or None,
+        "ping_timeout": WS_PING_TIMEOUT or None,
+    }
+
+
+def uvicorn_ws_options() -> dict:
+    """
+    FastAPI modunda (/ws) aynı sınırlar için uvicorn.run/Config parametreleri. ASGI'de
+    yazma tamponu sınırı ve ping ayarı uygulama tarafından verilemez; bunları sunucu uygular.
+    """
+    return {
+        "ws_max_size": WS_MAX_SIZE,
+        "ws_max_queue": WS_MAX_QUEUE,
+        "ws_ping_interval": WS_PING_INTERVAL or None,
+        "ws_ping_timeout": WS_PING_TIMEOUT or None,
+    }
+
+
+def rss_bytes() -> int:
+    """
+    Sürecin o anki bellek kullanımı. Linux'ta /proc'tan okunur; diğer sistemlerde
+    en yüksek kullanım (ru_maxrss) döner.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS bayt, Linux kilobayt döndürür
+        return maxrss if os.uname().sysname == "Darwin" else maxrss * 1024
+
+
+class ConnectionPolicy:
+    def __init__(self, connections: Dict[int, object], idle_timeout: float = WS_IDLE_TIMEOUT_SECONDS):
+        """
+        connections: {user_id: websocket}, chat_server'ın aktif bağlantı sözlüğü
+        """
+        self.connections = connections
+        self.idle_timeout = idle_timeout
+        self.last_seen: Dict[int, float] = {}
+        # Bağlantılar gelmeden önceki bellek; bağlantı başına bellek bu taban üzerinden hesaplanır
+        self.baseline_rss = rss_bytes()
+
+        metrics.gauge("process_resident_memory_bytes", "Sürecin kullandığı bellek.").set_function(rss_bytes)
+        metrics.gauge(
+            "ws_memory_per_connection_bytes",
+            "Başlangıçtan bu yana artan belleğin aktif bağlantı sayısına bölümü."
+        ).set_function(self.memory_per_connection)
+        metrics.gauge(
+            "ws_connection_buffer_limit_bytes",
+            "Bir bağlantının alma kuyruğu ve yazma tamponunda tutabileceği en fazla veri."
+        ).set(WS_MAX_SIZE * WS_MAX_QUEUE + WS_WRITE_LIMIT)
+
+    def memory_per_connection(self) -> float:
+        if not self.connections:
+            return 0
+        return max(rss_bytes() - self.baseline_rss, 0) / len(self.connections)
+
+    def over_memory_budget(self) -> bool:
+        if not MEMORY_BUDGET_MB:
+            return False
+        if rss_bytes() < MEMORY_BUDGET_MB * 1024 * 1024 * MEMORY_REFUSE_RATIO:
+            return False
+        WS_MEMORY_REFUSED_TOTAL.inc()
+        return True
+
+    def touch(self, user_id: int):
+        """
+        Bağlantıdan mesaj geldiğinde veya bağlantıya olay iletildiğinde çağrılır.
+        """
+        self.last_seen[user_id] = time.monotonic()
+
+    def forget(self, user_id: int):
+        self.last_seen.pop(user_id, None)
+
+    async def close_idle(self) -> int:
+        """
+        idle_timeout boyunca etkinliği olmayan bağlantıları kapatır ve sayısını döndürür.
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [
+            self.connections[user_id]
+            for user_id, seen in list(self.last_seen.items())
+            if seen < cutoff and user_id in self.connections
+        ]
+        await asyncio.gather(
+            *(websocket.close(1001, "idle timeout") for websocket in idle),
+            return_exceptions=True
+        )
+        if idle:
+            WS_IDLE_CLOSED_TOTAL.inc(amount=len(idle))
+            logger.info("Boştaki bağlantılar kapatıldı.", extra={"connections": len(idle)})
+        return len(idle)
+
+    async def run_idle_reaper(self, interval: float = WS_IDLE_CHECK_INTERVAL_SECONDS):
+        if not self.idle_timeout:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            await self.close_idle()
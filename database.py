@@ -1,26 +1,151 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from typing import AsyncGenerator
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from typing import AsyncGenerator, Optional
+import asyncio
+import logging
+import time
 import os
 from dotenv import load_dotenv
 
+import metrics
+from metrics import DB_POOL_CHECKOUT_SECONDS
+from partitions import ensure_message_partitions
+
 load_dotenv()
 
 Base = declarative_base()
 
+# Virgülle ayrılmış okuma replikası adresleri
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Bu değerden fazla geride kalan replika okuma trafiği almaz
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 2))
+REPLICA_LAG_CHECK_INTERVAL_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL_SECONDS", 1))
+# Yazma yapan kullanıcının okumaları bu süre boyunca primary'ye gider
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+
+# asyncpg'nin bağlantı başına sakladığı prepared statement sayısı (asyncpg varsayılanı 100)
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", 500))
+# SQLAlchemy'nin derlenmiş ifade önbelleği boyutu (varsayılan 500)
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", 1200))
+
+REPLICA_LAG_SECONDS = metrics.gauge("db_replica_lag_seconds", "Replikanın primary'nin gerisinde kaldığı süre.", ("replica",))
+DB_READ_ROUTE_TOTAL = metrics.counter("db_read_route_total", "Okuma oturumlarının yönlendirildiği hedef.", ("target",))
+
+logger = logging.getLogger(__name__)
+
+
+def primary_sticky_key(user_id) -> str:
+    """
+    Kullanıcının yakın zamanda yazma yaptığını işaretleyen Redis anahtarı.
+    """
+    return f"primary_sticky:{user_id}"
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Havuzdan bağlantı alırken geçen süreyi (bekleme dahil) ölçen havuz.
+    """
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
+
+def create_engine_for(database_url: str) -> AsyncEngine:
+    """
+    Ölçümlü havuz ve büyütülmüş ifade önbellekleriyle engine oluşturur.
+    asyncpg prepared statement'ları bağlantı başına önbellekte tutulur; böylece aynı sorgu
+    her çalıştırıldığında sunucuda tekrar hazırlanmaz.
+    """
+    url = make_url(database_url)
+    if url.get_dialect().driver == "asyncpg":
+        url = url.update_query_dict({"prepared_statement_cache_size": str(DB_PREPARED_STATEMENT_CACHE_SIZE)})
+    return create_async_engine(url, poolclass=TimedQueuePool, query_cache_size=DB_QUERY_CACHE_SIZE)
+
 class Database:
     def __init__(self):
         self.database_url = os.getenv("DATABASE_URL")
-        self.engine: AsyncEngine = create_async_engine(self.database_url)
+        self.engine: AsyncEngine = create_engine_for(self.database_url)
         self.async_session = sessionmaker(
             self.engine, expire_on_commit=False, class_=AsyncSession
         )
 
+        # Okuma replikaları; tanımlı değilse tüm okumalar primary'ye gider
+        self.replica_engines = [create_engine_for(url) for url in DATABASE_REPLICA_URLS]
+        self.replica_sessions = [
+            sessionmaker(engine, expire_on_commit=False, class_=AsyncSession) for engine in self.replica_engines
+        ]
+        # Ölçüm yapılana kadar replikalar sağlıklı kabul edilir
+        self.replica_lags = [0.0] * len(self.replica_engines)
+        self._next_replica = 0
+
+    @property
+    def has_replicas(self) -> bool:
+        return bool(self.replica_engines)
+
+    def pick_replica(self) -> Optional[int]:
+        """
+        Gecikmesi REPLICA_MAX_LAG_SECONDS altında olan replikalar arasında sırayla seçim yapar.
+        Uygun replika yoksa None döner.
+        """
+        count = len(self.replica_engines)
+        for offset in range(count):
+            index = (self._next_replica + offset) % count
+            if self.replica_lags[index] <= REPLICA_MAX_LAG_SECONDS:
+                self._next_replica = index + 1
+                return index
+        return None
+
+    async def measure_replica_lag(self):
+        """
+        Her replikanın ne kadar geride olduğunu ölçer. Ulaşılamayan replika sonsuz gecikmeli sayılır.
+        """
+        for index, engine in enumerate(self.replica_engines):
+            try:
+                async with engine.connect() as conn:
+                    result = await conn.execute(text(
+                        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                    ))
+                    lag = float(result.scalar() or 0)
+            except Exception as e:
+                logger.warning("Replika gecikmesi ölçülemedi.", extra={"replica": index, "error": str(e)})
+                lag = float("inf")
+            self.replica_lags[index] = lag
+            REPLICA_LAG_SECONDS.set(lag, index)
+
+    async def run_replica_lag_monitor(self):
+        while True:
+            await self.measure_replica_lag()
+            await asyncio.sleep(REPLICA_LAG_CHECK_INTERVAL_SECONDS)
+
     async def init_db(self):
+        from migrations import run_migrations
+
+        # Tabloları ve indeksleri sürümlü migration'larla oluştur/güncelle
+        await run_migrations(self.engine)
         async with self.engine.begin() as conn:
-            # Tabloları oluştur
-            await conn.run_sync(Base.metadata.create_all)
+            # messages bölümlenmiş tablo, mesaj eklenebilmesi için partition'lar gerekli
+            await ensure_message_partitions(conn)
 
     async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
         async with self.async_session() as session:
             yield session
+
+    async def get_read_session(self, prefer_primary: bool = False) -> AsyncGenerator[AsyncSession, None]:
+        """
+        Sadece okuma yapan işler için oturum. Uygun bir replika varsa ona,
+        yoksa veya prefer_primary verilmişse primary'ye bağlanır.
+        """
+        index = None if prefer_primary or not self.has_replicas else self.pick_replica()
+        if index is None:
+            DB_READ_ROUTE_TOTAL.inc("primary")
+            session_factory = self.async_session
+        else:
+            DB_READ_ROUTE_TOTAL.inc("replica")
+            session_factory = self.replica_sessions[index]
+        async with session_factory() as session:
+            yield session
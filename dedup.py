@@ -0,0 +1,101 @@
+"""
+client_msg_id ile idempotent mesaj gönderimi.
+
+İstemci zaman aşımından sonra aynı mesajı aynı client_msg_id ile tekrar gönderebilir.
+İlk gönderim Redis'te msg_dedup:{sender_id}:{client_msg_id} anahtarını SET NX ile
+"işleniyor" olarak ayırır; mesaj kaydedilip dağıtıldıktan sonra anahtara ilk yanıt
+(ack) yazılır. Tekrarlar kaydetme ve dağıtım yapılmadan aynı yanıtı alır. Anahtarlar
+DEDUP_TTL_SECONDS sonra silinir; Redis'te bulunamayan tekrarları message_dedup
+tablosunun birincil anahtarı yakalar.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import timedelta
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete
+
+import metrics
+from metrics import REDIS_ROUNDTRIP_SECONDS
+from models import MessageDedup
+from utils import get_current_utc_time
+
+load_dotenv()
+
+DEDUP_TTL_SECONDS = int(os.getenv("DEDUP_TTL_SECONDS", 60 * 60 * 24))
+# İşlenmekte olan gönderimin ayırma süresi; süreç çökerse tekrar denemeler bu süreden sonra işlenir
+DEDUP_PENDING_TTL_SECONDS = int(os.getenv("DEDUP_PENDING_TTL_SECONDS", 30))
+DEDUP_RETENTION_DAYS = int(os.getenv("DEDUP_RETENTION_DAYS", 7))
+DEDUP_PRUNE_INTERVAL_SECONDS = int(os.getenv("DEDUP_PRUNE_INTERVAL_SECONDS", 60 * 60))
+CLIENT_MSG_ID_MAX_LENGTH = 64
+
+PENDING = "pending"
+
+DUPLICATE_SENDS_TOTAL = metrics.counter(
+    "ws_duplicate_sends_total",
+    "client_msg_id ile yakalanan tekrar gönderimler.",
+    ("source",)
+)
+
+logger = logging.getLogger(__name__)
+
+
+def dedup_key(sender_id: int, client_msg_id: str) -> str:
+    return f"msg_dedup:{sender_id}:{client_msg_id}"
+
+
+def is_valid_client_msg_id(client_msg_id) -> bool:
+    return isinstance(client_msg_id, str) and 0 < len(client_msg_id) <= CLIENT_MSG_ID_MAX_LENGTH
+
+
+class MessageDeduplicator:
+    def __init__(self, redis_handler):
+        self.redis = redis_handler.redis
+
+    async def claim(self, sender_id: int, client_msg_id: str) -> Optional[dict]:
+        """
+        Gönderimi ayırır. İlk gönderimse None, tekrarsa ilk gönderimin yanıtını döndürür.
+        İlk gönderim hâlâ işleniyorsa tekrar denenmesini isteyen bir hata döner.
+        """
+        key = dedup_key(sender_id, client_msg_id)
+        with REDIS_ROUNDTRIP_SECONDS.time("dedup_claim"):
+            claimed = await self.redis.set(key, PENDING, nx=True, ex=DEDUP_PENDING_TTL_SECONDS)
+            if claimed:
+                return None
+            previous = await self.redis.get(key)
+
+        if previous is None:
+            # Ayırma bu arada süresi dolup silindi, tekrar dene
+            return await self.claim(sender_id, client_msg_id)
+        DUPLICATE_SENDS_TOTAL.inc("redis")
+        if previous.decode("utf-8") == PENDING:
+            return {"status": "error", "message": "Mesaj işleniyor.", "client_msg_id": client_msg_id, "retry": True}
+        return json.loads(previous)
+
+    async def complete(self, sender_id: int, client_msg_id: str, response: dict):
+        with REDIS_ROUNDTRIP_SECONDS.time("dedup_complete"):
+            await self.redis.set(dedup_key(sender_id, client_msg_id), json.dumps(response), ex=DEDUP_TTL_SECONDS)
+
+    async def release(self, sender_id: int, client_msg_id: str):
+        """
+        Başarısız gönderimin ayırmasını kaldırır; istemci aynı ID ile tekrar deneyebilir.
+        """
+        with REDIS_ROUNDTRIP_SECONDS.time("dedup_release"):
+            await self.redis.delete(dedup_key(sender_id, client_msg_id))
+
+
+async def run_dedup_pruning(db):
+    """
+    DEDUP_RETENTION_DAYS günden eski message_dedup kayıtlarını periyodik olarak siler.
+    """
+    while True:
+        try:
+            cutoff = get_current_utc_time() - timedelta(days=DEDUP_RETENTION_DAYS)
+            async with db.engine.begin() as conn:
+                await conn.execute(delete(MessageDedup).where(MessageDedup.created_date < cutoff))
+        except Exception as e:
+            logger.warning("message_dedup temizliği başarısız.", extra={"error": str(e)})
+        await asyncio.sleep(DEDUP_PRUNE_INTERVAL_SECONDS)
@@ -1,84 +1,247 @@
+"""
+Benchmark ve plan kontrolleri için büyük hacimli sentetik veri üretici.
+
+Kullanıcılar, arkadaşlıklar ve mesajlar Postgres COPY ile toplu yüklenir. Aynı --seed ile
+her çalıştırma aynı veri setini üretir; böylece benchmark sonuçları karşılaştırılabilir.
+
+Dağılımlar:
+    - Popülerlik: düşük sıralı kullanıcılar "merkez" kullanıcılardır; arkadaşlık hedefleri ve
+      sohbet katılımcıları u ** SKEW ile bu kullanıcılara yığılır.
+    - Arkadaş sayısı ve sohbet uzunluğu Pareto (kuvvet yasası) dağılımlıdır: çoğu sohbet
+      birkaç mesajdan oluşur, azı binlerce mesaj içerir.
+    - Zaman damgaları patlamalıdır: mesajlar saniyeler arayla gelen oturumlar halinde
+      gönderilir, oturumlar arasında saatler veya günler geçer.
+
+Şifreler her kullanıcı için ayrı hesaplanmaz; --password için seed'den türetilen tuzla bir
+kez hesaplanan bcrypt özeti tüm kullanıcılara yazılır.
+
+Kullanım:
+    python deneme.py --users 1000000 --conversations 2000000 --messages 50000000 --seed 42 --truncate
+"""
+import argparse
 import asyncio
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select
-from datetime import datetime
-import pytz
-from models import Base, User, Message # Modellerinizi import ettiğinizden emin olun
-import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+import bcrypt
 from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+
+from database import Database
+from id_generator import ID_EPOCH_MS, TIMESTAMP_SHIFT, id_to_datetime
+from partitions import ensure_message_partitions
 
 load_dotenv()
 
-# Veritabanı bağlantı bilgilerini buraya girin
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Popülerlik çarpıklığı; büyüdükçe etkileşimler az sayıda kullanıcıda toplanır
+SKEW = 3
+# Pareto şekil parametreleri (küçük değer = daha ağır kuyruk)
+FRIENDS_ALPHA = 1.5
+CONVERSATION_ALPHA = 1.2
+MAX_FRIENDS_PER_USER = 5000
+MAX_MESSAGES_PER_CONVERSATION = 100000
+
+# Patlamalı zaman damgaları: oturum içindeki ortalama aralık ve oturumlar arası ortalama ara
+BURST_GAP_SECONDS = 20
+SESSION_GAP_SECONDS = 60 * 60 * 18
+# Bir mesajın yeni bir oturum başlatma olasılığı
+NEW_SESSION_PROBABILITY = 0.08
+
+WORDS = (
+    "mavi", "deniz", "kartal", "yildiz", "gece", "ruzgar", "orman", "nehir", "gunes", "bulut",
+    "atlas", "kuzey", "poyraz", "toprak", "umut", "ay", "kaya", "yagmur", "ates", "ada",
+)
+PHRASES = (
+    "Merhaba!", "Nasılsın?", "İyiyim, sen?", "Akşam görüşelim mi?", "Tamamdır 👍", "Yoldayım.",
+    "Toplantı kaçta?", "Dosyayı gönderdim.", "Teşekkürler!", "Sonra konuşuruz.", "Haha 😂",
+    "Bugün çok yoğundu.", "Yarın müsait misin?", "Geliyorum.", "Tamam, anlaştık.",
+)
+TAG_FIRST = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+TAG_REST = "0123456789" + TAG_FIRST
+BCRYPT_ALPHABET = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+
+def user_tag(user_id: int) -> str:
+    """
+    Kullanıcı ID'sinden tekil 4 karakterlik etiket. İlk karakter harf olduğu için
+    uygulamanın ürettiği sayısal etiketlerle çakışmaz (52 * 62^3 ≈ 12.4M kullanıcı).
+    """
+    index = user_id
+    rest = ""
+    for _ in range(3):
+        index, digit = divmod(index, len(TAG_REST))
+        rest = TAG_REST[digit] + rest
+    if index >= len(TAG_FIRST):
+        raise ValueError("Etiket alanı doldu; kullanıcı ID'leri en fazla 12.4M olabilir.")
+    return TAG_FIRST[index] + rest
+
+
+def password_hash(password: str, seed: int) -> str:
+    rng = random.Random(f"{seed}:salt")
+    salt = "$2b$12$" + "".join(rng.choice(BCRYPT_ALPHABET) for _ in range(21)) + "."
+    return bcrypt.hashpw(password.encode("utf-8"), salt.encode("ascii")).decode("utf-8")
+
+
+def popular_user(rng: random.Random, first_id: int, users: int) -> int:
+    return first_id + int(users * rng.random() ** SKEW)
+
+
+def pareto_count(rng: random.Random, alpha: float, mean: float, cap: int) -> int:
+    """
+    Ortalaması yaklaşık mean olan, cap ile sınırlanmış Pareto dağılımlı tam sayı.
+    """
+    scale = mean * (alpha - 1) / alpha
+    return max(1, min(int(rng.paretovariate(alpha) * scale), cap))
+
 
-# Asenkron bir engine oluştur
-engine = create_async_engine(DATABASE_URL, echo=True)
+def user_rows(args, first_id: int, hashed_password: str, start: datetime):
+    rng = random.Random(f"{args.seed}:users")
+    window_seconds = (args.now - start).total_seconds()
+    for index in range(args.users):
+        user_id = first_id + index
+        created = start + timedelta(seconds=window_seconds * rng.random() ** 2)
+        # ID'den türetilir; --truncate olmadan tekrar çalıştırmada mevcut kullanıcılarla çakışmaz
+        username = f"{rng.choice(WORDS)}_{user_id}"
+        yield (user_id, username, user_tag(user_id), f"{username}@example.test", hashed_password, True, 1, created, created)
 
-async def async_main():
+
+def friend_rows(args, first_id: int):
     """
-    Veritabanı tablolarına örnek veriler ekler.
+    Her kullanıcı yalnızca kendisinden sonraki kullanıcılarla çift oluşturur; böylece
+    (a, b) çiftleri global bir küme tutmadan tekil kalır.
     """
-    # Oturum sınıfını oluştur
-    async_session = sessionmaker(
-        engine, expire_on_commit=False, class_=AsyncSession
-    )
-
-    async with engine.begin() as conn:
-        # Tabloları oluştur (eğer yoksa)
-        await conn.run_sync(Base.metadata.create_all)
-
-    # Veri ekleme işlemi
-    async with async_session() as session:
-        try:
-            # Örnek kullanıcıları ekle
-            user1 = User(
-                username='alice',
-                email='alice@example.com',
-                password='hashed_password_alice'
-            )
-            user2 = User(
-                username='bob',
-                email='bob@example.com',
-                password='hashed_password_bob'
-            )
-            user3 = User(
-                username='charlie',
-                email='charlie@example.com',
-                password='hashed_password_charlie'
-            )
-            session.add_all([user1, user2, user3])
-            await session.commit()
-            
-            # Commit işleminden sonra, nesnelerin ID'leri oluşur.
-            # Nesneleri tekrar çekerek ID'lerini al
-            alice = (await session.execute(select(User).filter_by(username='alice'))).scalar_one()
-            bob = (await session.execute(select(User).filter_by(username='bob'))).scalar_one()
-            charlie = (await session.execute(select(User).filter_by(username='charlie'))).scalar_one()
-
-            # Örnek mesajları ekle
-            messages = [
-                # Alice ve Bob arasındaki sohbet
-                Message(sender_id=alice.id, receiver_id=bob.id, content='Merhaba Bob! Nasılsın?'),
-                Message(sender_id=bob.id, receiver_id=alice.id, content='İyiyim Alice, teşekkürler. Sen nasılsın?'),
-                Message(sender_id=alice.id, receiver_id=bob.id, content='Ben de iyiyim, çok sağ ol.'),
-
-                # Bob ve Charlie arasındaki sohbet (Okunmamış mesajlar)
-                Message(sender_id=charlie.id, receiver_id=bob.id, content='Selam Bob, müsait misin?'),
-                Message(sender_id=charlie.id, receiver_id=bob.id, content='Sana bir şey danışmak istiyorum.'),
-                Message(sender_id=charlie.id, receiver_id=bob.id, content='Görünüşe göre meşgulsün, sonra konuşuruz.'),
-            ]
-            session.add_all(messages)
-            await session.commit()
-            
-            print("Veritabanına örnek veriler başarıyla eklendi.")
-            
-        except Exception as e:
-            await session.rollback() # Hata durumunda işlemi geri al
-            print(f"Bir hata oluştu: {e}")
-            
-    await engine.dispose() # Engine'i kapat
+    rng = random.Random(f"{args.seed}:friends")
+    last_id = first_id + args.users - 1
+    for user_id in range(first_id, last_id):
+        remaining = last_id - user_id
+        count = min(pareto_count(rng, FRIENDS_ALPHA, args.friends_per_user / 2, MAX_FRIENDS_PER_USER), remaining)
+        friends = set()
+        for _ in range(count):
+            friends.add(user_id + 1 + int(remaining * rng.random() ** SKEW))
+        for friend_id in sorted(friends):
+            yield (user_id, friend_id)
+
+
+def message_rows(args, first_id: int, start: datetime):
+    rng = random.Random(f"{args.seed}:messages")
+    start_ms = int(start.timestamp() * 1000)
+    now_ms = int(args.now.timestamp() * 1000)
+    mean_messages = args.messages / args.conversations
+    counter = 0
+    for _ in range(args.conversations):
+        user1 = popular_user(rng, first_id, args.users)
+        user2 = first_id + rng.randrange(args.users)
+        if user1 == user2:
+            continue
+        count = pareto_count(rng, CONVERSATION_ALPHA, mean_messages, MAX_MESSAGES_PER_CONVERSATION)
+
+        # Sohbet pencerenin herhangi bir yerinde başlar; zaman ileri doğru patlamalar halinde akar
+        moment_ms = start_ms + int((now_ms - start_ms) * rng.random())
+        sender, receiver = user1, user2
+        for position in range(count):
+            if rng.random() < NEW_SESSION_PROBABILITY:
+                moment_ms += int(rng.expovariate(1 / SESSION_GAP_SECONDS) * 1000)
+            else:
+                moment_ms += int(rng.expovariate(1 / BURST_GAP_SECONDS) * 1000) + 1
+            if moment_ms >= now_ms:
+                break
+            if rng.random() < 0.4:
+                sender, receiver = receiver, sender
+
+            # Snowflake ID zamandan türetilir; alt 22 bit sayaçla tekilleştirilir
+            counter += 1
+            message_id = ((moment_ms - ID_EPOCH_MS) << TIMESTAMP_SHIFT) | (counter & ((1 << TIMESTAMP_SHIFT) - 1))
+            # Sohbetin son birkaç mesajı okunmamış olabilir
+            is_read = position < count - 3 or rng.random() < 0.5
+            yield (message_id, sender, receiver, rng.choice(PHRASES), id_to_datetime(message_id), is_read)
+
+
+async def copy_batches(conn, table: str, columns, rows, batch_size: int) -> int:
+    """
+    Satırları batch_size'lık COPY işlemleriyle yükler.
+    """
+    total = 0
+    batch = []
+    started = time.perf_counter()
+
+    async def flush():
+        nonlocal total, batch
+        await conn.copy_records_to_table(table, records=batch, columns=columns)
+        total += len(batch)
+        batch = []
+        print(f"  {table}: {total} satır ({total / (time.perf_counter() - started):.0f}/sn)")
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return total
+
+
+async def async_main(args):
+    db = Database()
+    await db.init_db()
+    # Snowflake ID'ler ID_EPOCH'tan önceki zamanları ifade edemez
+    start = max(args.now - timedelta(days=args.days), id_to_datetime(0))
+    async with db.engine.begin() as conn:
+        await ensure_message_partitions(conn, since=start)
+    await db.engine.dispose()
+
+    url = make_url(db.database_url).set(drivername="postgresql")
+    conn = await asyncpg.connect(url.render_as_string(hide_password=False))
+    try:
+        if args.truncate:
+            await conn.execute("TRUNCATE users, friends, messages, validation_email_log, message_dedup RESTART IDENTITY CASCADE")
+        first_id = (await conn.fetchval("SELECT coalesce(max(id), 0) FROM users")) + 1
+
+        print("Kullanıcılar yükleniyor...")
+        hashed_password = password_hash(args.password, args.seed)
+        await copy_batches(
+            conn, "users",
+            ("id", "username", "user_tag", "email", "password", "is_email_validation", "role_id", "created_date", "updated_date"),
+            user_rows(args, first_id, hashed_password, start), args.batch
+        )
+        await conn.execute("SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT max(id) FROM users))")
+
+        print("Arkadaşlıklar yükleniyor...")
+        await copy_batches(conn, "friends", ("requestor_id", "addressee_id"), friend_rows(args, first_id), args.batch)
+
+        print("Mesajlar yükleniyor...")
+        await copy_batches(
+            conn, "messages",
+            ("id", "sender_id", "receiver_id", "content", "sent_date", "is_read"),
+            message_rows(args, first_id, start), args.batch
+        )
+
+        print("İstatistikler güncelleniyor...")
+        await conn.execute("ANALYZE users, friends, messages")
+    finally:
+        await conn.close()
+    print("Veri üretimi tamamlandı. Redis'teki arkadaş listeleri için: python friend_graph.py rebuild")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sentetik kullanıcı, arkadaşlık ve mesaj verisi üretir.")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--friends-per-user", type=float, default=20, help="Ortalama arkadaş sayısı")
+    parser.add_argument("--conversations", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=200000, help="Yaklaşık toplam mesaj sayısı")
+    parser.add_argument("--days", type=int, default=365, help="Mesajların yayıldığı gün sayısı")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch", type=int, default=100000, help="COPY başına satır sayısı")
+    parser.add_argument("--password", default="password123", help="Tüm kullanıcıların şifresi")
+    parser.add_argument("--now", type=datetime.fromisoformat, default=datetime(2025, 1, 1, tzinfo=timezone.utc),
+                        help="Veri setinin bitiş zamanı (ISO 8601, UTC); sabit tutulursa veri seti tekrarlanabilir")
+    parser.add_argument("--truncate", action="store_true", help="Yüklemeden önce tabloları boşalt")
+    args = parser.parse_args()
+    if args.now.tzinfo is None:
+        args.now = args.now.replace(tzinfo=timezone.utc)
+    return args
+
 
 if __name__ == '__main__':
-    asyncio.run(async_main())
\ No newline at end of file
+    asyncio.run(async_main(parse_args()))
@@ -0,0 +1,119 @@
+"""
+chat_server için kademeli kapanma (drain) modu.
+
+SIGTERM alındığında:
+    1. Yeni bağlantı kabul edilmez, el sıkışmalar 503 ile reddedilir.
+    2. Her istemciye, kapatılacağı dalganın zamanına rastgele bir gecikme eklenmiş
+       reconnect_after_ms ipucu içeren bir "reconnect" olayı gönderilir.
+    3. Yeni action'lar reddedilir; işlenmekte olan action'ların (mesaj kaydı ve onayı)
+       bitmesi beklenir ve birleştirilmiş frame kuyrukları boşaltılır.
+    4. Bağlantılar DRAIN_WINDOW_SECONDS boyunca DRAIN_WAVES dalgada kapatılır.
+
+İstemciye onay yalnızca mesaj commit edildikten sonra gönderildiği ve drain sırasında
+yeni action alınmadığı için onaylanmış hiçbir mesaj kaybolmaz; onay alamayan istemci
+mesajı yeni sunucuya tekrar gönderir.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+DRAIN_WINDOW_SECONDS = float(os.getenv("DRAIN_WINDOW_SECONDS", 30))
+DRAIN_WAVES = int(os.getenv("DRAIN_WAVES", 10))
+# İşlenmekte olan action'ların bitmesi için beklenecek en uzun süre
+DRAIN_FLUSH_TIMEOUT_SECONDS = float(os.getenv("DRAIN_FLUSH_TIMEOUT_SECONDS", 10))
+# Kapanma kodu 1012: service restart
+DRAIN_CLOSE_CODE = 1012
+
+WS_DRAINING = metrics.gauge("ws_draining", "Sunucu drain modundaysa 1.")
+WS_DRAIN_CLOSED_TOTAL = metrics.counter("ws_drain_closed_connections_total", "Drain sırasında kapatılan bağlantı sayısı.")
+
+logger = logging.getLogger(__name__)
+
+
+class DrainController:
+    def __init__(self, window_seconds: float = DRAIN_WINDOW_SECONDS, waves: int = DRAIN_WAVES,
+                 flush_timeout: float = DRAIN_FLUSH_TIMEOUT_SECONDS):
+        self.window_seconds = window_seconds
+        self.waves = max(1, waves)
+        self.flush_timeout = flush_timeout
+        self.draining = False
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        WS_DRAINING.set(0)
+
+    @contextmanager
+    def track(self):
+        """
+        Bir action işlenirken kullanılır; drain işlenmekte olan action'ların bitmesini bekler.
+        """
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
+    def plan_waves(self, user_ids):
+        """
+        Kullanıcıları rastgele dalgalara böler: [(kapanma_saniyesi, [user_id, ...]), ...]
+        """
+        user_ids = list(user_ids)
+        random.shuffle(user_ids)
+        interval = self.window_seconds / self.waves
+        size = -(-len(user_ids) // self.waves) if user_ids else 0
+        return [
+            (index * interval, user_ids[index * size:(index + 1) * size])
+            for index in range(self.waves)
+            if user_ids[index * size:(index + 1) * size]
+        ]
+
+    async def run(self, connections: Dict[int, object], send_event: Callable[[int, str], Awaitable[None]],
+                  flush: Callable[[], Awaitable[None]]):
+        """
+        connections: {user_id: websocket}
+        send_event: kullanıcıya JSON olay gönderir
+        flush: bekleyen giden olayları gönderir
+        """
+        self.draining = True
+        WS_DRAINING.set(1)
+        waves = self.plan_waves(connections.keys())
+        interval = self.window_seconds / self.waves
+        logger.info("Drain başladı.", extra={"connections": len(connections), "waves": len(waves), "window_seconds": self.window_seconds})
+
+        for offset, user_ids in waves:
+            for user_id in user_ids:
+                # Yeni sunucuya bağlanma zamanı, bu bağlantının kapanacağı dalgaya göre dağıtılır
+                delay_ms = int((offset + random.uniform(0, interval)) * 1000)
+                await send_event(user_id, json.dumps({"type": "reconnect", "reconnect_after_ms": delay_ms}))
+
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=self.flush_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("İşlenmekte olan action'lar drain süresinde bitmedi.", extra={"in_flight": self._in_flight})
+        await flush()
+
+        start = asyncio.get_running_loop().time()
+        for offset, user_ids in waves:
+            delay = start + offset - asyncio.get_running_loop().time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            closing = [connections[user_id] for user_id in user_ids if user_id in connections]
+            await asyncio.gather(
+                *(websocket.close(DRAIN_CLOSE_CODE, "server restarting") for websocket in closing),
+                return_exceptions=True
+            )
+            WS_DRAIN_CLOSED_TOTAL.inc(amount=len(closing))
+        logger.info("Drain tamamlandı.")
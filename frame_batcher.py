@@ -0,0 +1,142 @@
+"""
+Yoğun room'lar için giden olayları tek WebSocket frame'inde birleştirme.
+
+Bağlantı kurulurken "batch": true gönderen istemcilere giden olaylar hemen gönderilmez;
+kısa bir süre (BATCH_FLUSH_MS) ya da boyut sınırına ulaşana kadar biriktirilir ve
+tek bir JSON dizisi frame'i olarak gönderilir: [olay1, olay2, ...]
+Bu seçeneği kullanmayan istemciler her olay için ayrı frame almaya devam eder.
+
+Gönderilmeyi bekleyen olaylar BATCH_MAX_PENDING_BYTES'ı aşarsa (istemci okumuyor veya
+bağlantı yavaş) olaylar atılır ve bağlantı 1013 koduyla kapatılır; istemci yeniden
+bağlandığında kaçırdıklarını geçmişten alır.
+"""
+import asyncio
+import logging
+import os
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+BATCH_FLUSH_MS = float(os.getenv("BATCH_FLUSH_MS", 5))
+BATCH_MAX_EVENTS = int(os.getenv("BATCH_MAX_EVENTS", 64))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", 64 * 1024))
+BATCH_MAX_PENDING_BYTES = int(os.getenv("BATCH_MAX_PENDING_BYTES", 1024 * 1024))
+
+BATCH_FRAME_EVENTS = metrics.histogram(
+    "ws_batch_frame_events",
+    "Birleştirilmiş tek frame'deki olay sayısı.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+BATCH_OVERFLOW_TOTAL = metrics.counter(
+    "ws_batch_overflow_total",
+    "Bekleyen olayları BATCH_MAX_PENDING_BYTES'ı aştığı için kapatılan bağlantı sayısı."
+)
+
+logger = logging.getLogger(__name__)
+
+
+class FrameBatcher:
+    """
+    Tek bir bağlantıya giden, önceden JSON'a çevrilmiş olayları biriktirir.
+    """
+
+    def __init__(self, websocket, flush_interval: float = BATCH_FLUSH_MS / 1000,
+                 max_events: int = BATCH_MAX_EVENTS, max_bytes: int = BATCH_MAX_BYTES,
+                 max_pending_bytes: int = BATCH_MAX_PENDING_BYTES):
+        self.websocket = websocket
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.max_pending_bytes = max_pending_bytes
+        self.overflowed = False
+        self._pending = []
+        self._pending_bytes = 0
+        self._timer = None
+        # Başlatılan flush/kapatma görevleri; referans tutulmazsa görev ve hatası kaybolabilir
+        self._tasks = set()
+        # Frame'lerin sırası korunsun diye flush'lar sırayla çalışır
+        self._flush_lock = asyncio.Lock()
+
+    def add(self, message_json: str) -> bool:
+        """
+        Olayı kuyruğa ekler. Boyut sınırı aşılırsa hemen, aksi halde
+        flush penceresi sonunda gönderilir. Bekleyen olaylar sınırı aştıysa olay
+        eklenmez, bağlantı kapatılır ve False döner.
+        """
+        if self.overflowed:
+            return False
+        if self._pending_bytes + len(message_json) > self.max_pending_bytes:
+            self._overflow()
+            return False
+
+        self._pending.append(message_json)
+        self._pending_bytes += len(message_json)
+
+        if len(self._pending) >= self.max_events or self._pending_bytes >= self.max_bytes:
+            self._cancel_timer()
+            self._spawn(self.flush())
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.flush_interval, self._on_timer)
+        return True
+
+    def _on_timer(self):
+        self._timer = None
+        self._spawn(self.flush())
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Birleştirici görevi hata verdi.", exc_info=task.exception())
+
+    def _overflow(self):
+        """
+        İstemci olayları tüketemiyor; bekleyenler atılır ve bağlantı kapatılır.
+        """
+        self.overflowed = True
+        self._cancel_timer()
+        BATCH_OVERFLOW_TOTAL.inc()
+        logger.warning("Bekleyen olaylar sınırı aştı; bağlantı kapatılıyor.", extra={
+            "events": len(self._pending), "bytes": self._pending_bytes
+        })
+        self._pending.clear()
+        self._pending_bytes = 0
+        self._spawn(self.websocket.close(1013, "try again later"))
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def flush(self):
+        """
+        Biriken olayları tek frame olarak gönderir.
+        """
+        async with self._flush_lock:
+            while self._pending:
+                events = self._pending[:self.max_events]
+                del self._pending[:self.max_events]
+                self._pending_bytes -= sum(len(event) for event in events)
+                BATCH_FRAME_EVENTS.observe(len(events))
+                try:
+                    await self.websocket.send("[" + ",".join(events) + "]")
+                except Exception as e:
+                    logger.warning("Birleştirilmiş frame gönderilemedi.", extra={"events": len(events), "error": str(e)})
+                    return
+
+    async def close(self):
+        """
+        Zamanlayıcıyı iptal eder, kalan olayları gönderir ve başlatılan görevleri bekler.
+        """
+        self._cancel_timer()
+        await self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,172 @@
+"""
+Arkadaşlık grafiğinin Redis önbelleği.
+
+Her kullanıcının arkadaş ID'leri friends:{user_id} anahtarında bir Redis set'i olarak
+tutulur. Set veritabanından yüklendiğinde içine LOADED_MARKER eklenir; marker'ı olmayan
+set (veya hiç olmayan anahtar) henüz yüklenmemiş sayılır ve ilk okumada veritabanından
+doldurulur. Yazmalar hem veritabanına hem de iki kullanıcının set'ine uygulanır; yüklenmemiş
+bir set'e eklenen ID, yükleme sırasında zaten veritabanından geleceği için sorun çıkarmaz.
+
+Kullanım:
+    python friend_graph.py rebuild    # Tüm set'leri silip veritabanından yeniden oluşturur
+"""
+import asyncio
+import os
+import sys
+from typing import Dict, Iterable, Set
+
+from dotenv import load_dotenv
+from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from metrics import REDIS_ROUNDTRIP_SECONDS
+from models import Friends
+
+load_dotenv()
+
+# Yüklenmiş set'lerin ömrü; erişilmeyen kullanıcıların set'leri zamanla Redis'ten düşer
+FRIEND_GRAPH_TTL_SECONDS = int(os.getenv("FRIEND_GRAPH_TTL_SECONDS", 60 * 60 * 24))
+
+# Kullanıcı ID'leri 1'den başladığı için 0 hiçbir arkadaşla karışmaz
+LOADED_MARKER = "0"
+
+
+def friends_key(user_id: int) -> str:
+    return f"friends:{user_id}"
+
+
+async def load_friend_ids(session: AsyncSession, user_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    """
+    Verilen kullanıcıların arkadaş ID'lerini tek sorguda veritabanından okur.
+    """
+    user_ids = list(user_ids)
+    friends = {user_id: set() for user_id in user_ids}
+    result = await session.execute(
+        select(Friends.requestor_id, Friends.addressee_id).where(
+            or_(Friends.requestor_id.in_(user_ids), Friends.addressee_id.in_(user_ids))
+        )
+    )
+    for requestor_id, addressee_id in result.all():
+        if requestor_id in friends:
+            friends[requestor_id].add(addressee_id)
+        if addressee_id in friends:
+            friends[addressee_id].add(requestor_id)
+    return friends
+
+
+class FriendGraph:
+    def __init__(self, redis_handler):
+        self.redis = redis_handler.redis
+
+    async def _store(self, friends: Dict[int, Set[int]]):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id, friend_ids in friends.items():
+                pipe.sadd(friends_key(user_id), LOADED_MARKER, *friend_ids)
+                pipe.expire(friends_key(user_id), FRIEND_GRAPH_TTL_SECONDS)
+            with REDIS_ROUNDTRIP_SECONDS.time("friend_graph_store"):
+                await pipe.execute()
+
+    async def ensure_loaded(self, session: AsyncSession, user_ids: Iterable[int]):
+        """
+        Set'i yüklenmemiş kullanıcıları veritabanından tek sorguda yükler.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.sismember(friends_key(user_id), LOADED_MARKER)
+            with REDIS_ROUNDTRIP_SECONDS.time("friend_graph_check"):
+                loaded = await pipe.execute()
+
+        missing = [user_id for user_id, is_loaded in zip(user_ids, loaded) if not is_loaded]
+        if missing:
+            await self._store(await load_friend_ids(session, missing))
+
+    async def friends_of(self, session: AsyncSession, user_id: int) -> Set[int]:
+        await self.ensure_loaded(session, [user_id])
+        with REDIS_ROUNDTRIP_SECONDS.time("smembers"):
+            members = await self.redis.smembers(friends_key(user_id))
+        return {int(member) for member in members} - {int(LOADED_MARKER)}
+
+    async def mutual_friends(self, session: AsyncSession, user1_id: int, user2_id: int) -> Set[int]:
+        """
+        İki kullanıcının ortak arkadaşları; Redis'te SINTER ile hesaplanır.
+        """
+        await self.ensure_loaded(session, [user1_id, user2_id])
+        with REDIS_ROUNDTRIP_SECONDS.time("sinter"):
+            members = await self.redis.sinter(friends_key(user1_id), friends_key(user2_id))
+        return {int(member) for member in members} - {int(LOADED_MARKER)}
+
+    async def are_friends(self, session: AsyncSession, user_id: int, other_ids: Iterable[int]) -> Dict[int, bool]:
+        """
+        user_id'nin other_ids içindeki her kullanıcıyla arkadaş olup olmadığını tek
+        SMISMEMBER çağrısıyla döndürür. Çevrimiçi durum ve fan-out filtrelemesi için.
+        """
+        other_ids = list(other_ids)
+        if not other_ids:
+            return {}
+        await self.ensure_loaded(session, [user_id])
+        with REDIS_ROUNDTRIP_SECONDS.time("smismember"):
+            flags = await self.redis.smismember(friends_key(user_id), other_ids)
+        return {other_id: bool(flag) for other_id, flag in zip(other_ids, flags)}
+
+    async def add(self, user1_id: int, user2_id: int):
+        """
+        Veritabanına yazılan arkadaşlığı iki kullanıcının set'ine ekler.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.sadd(friends_key(user1_id), user2_id)
+            pipe.sadd(friends_key(user2_id), user1_id)
+            with REDIS_ROUNDTRIP_SECONDS.time("friend_graph_add"):
+                await pipe.execute()
+
+    async def remove(self, user1_id: int, user2_id: int):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.srem(friends_key(user1_id), user2_id)
+            pipe.srem(friends_key(user2_id), user1_id)
+            with REDIS_ROUNDTRIP_SECONDS.time("friend_graph_remove"):
+                await pipe.execute()
+
+    async def rebuild(self, db, batch_size: int = 1000) -> int:
+        """
+        Tüm friends:* anahtarlarını siler ve arkadaşlık tablosunu akış halinde okuyarak
+        set'leri yeniden oluşturur. Yüklenen kullanıcı sayısını döndürür.
+        """
+        async for key in self.redis.scan_iter(match="friends:*", count=batch_size):
+            await self.redis.delete(key)
+
+        friends: Dict[int, Set[int]] = {}
+        async with db.engine.connect() as conn:
+            result = await conn.stream(select(Friends.requestor_id, Friends.addressee_id))
+            async for requestor_id, addressee_id in result:
+                friends.setdefault(requestor_id, set()).add(addressee_id)
+                friends.setdefault(addressee_id, set()).add(requestor_id)
+
+        users = list(friends.items())
+        for start in range(0, len(users), batch_size):
+            await self._store(dict(users[start:start + batch_size]))
+        return len(users)
+
+
+async def async_main(command: str):
+    from database import Database
+    from redis_handler import RedisHandler
+
+    db = Database()
+    redis_handler = RedisHandler()
+    try:
+        if command == "rebuild":
+            users = await FriendGraph(redis_handler).rebuild(db)
+            print(f"{users} kullanıcının arkadaş listesi yeniden oluşturuldu.")
+        else:
+            print(__doc__)
+    finally:
+        await redis_handler.close()
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    from log_handler import setup_logging
+
+    setup_logging()
+    asyncio.run(async_main(sys.argv[1] if len(sys.argv) > 1 else ""))
@@ -0,0 +1,219 @@
+"""
+Zamana göre sıralanan 64 bitlik (snowflake tarzı) mesaj ID üretici.
+
+Bit düzeni (en anlamlıdan başlayarak):
+    1  bit  işaret (her zaman 0, ID'ler pozitif kalır)
+    41 bit  ID_EPOCH'tan bu yana geçen milisaniye (~69 yıl)
+    5  bit  NODE_ID    (sunucu/makine)
+    5  bit  WORKER_ID  (aynı makinedeki süreç)
+    12 bit  aynı milisaniye içindeki sıra numarası
+
+ID'ler üretim sırasında koordinasyon gerektirmez, oluşturulma zamanına göre sıralanır ve
+sayfalama imleci (cursor) olarak kullanılabilir.
+
+Aynı NODE_ID altındaki her süreç farklı bir WORKER_ID kullanmalıdır; aksi halde aynı
+milisaniyede aynı ID üretilebilir. WORKER_ID ortam değişkeni tanımlıysa o kullanılır,
+değilse süreç açılırken Redis'ten boş bir worker ID kiralanır (WorkerIdLease). Worker ID
+atanmadan next_id çağrılırsa hata fırlatılır.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+NODE_ID = int(os.getenv("NODE_ID", 0))
+# Kiralanan worker ID'nin Redis'teki ömrü; süreç bunun üçte birinde bir yeniler
+WORKER_ID_LEASE_SECONDS = int(os.getenv("WORKER_ID_LEASE_SECONDS", 30))
+
+# 2024-01-01T00:00:00Z, milisaniye
+ID_EPOCH_MS = 1704067200000
+
+NODE_ID_BITS = 5
+WORKER_ID_BITS = 5
+SEQUENCE_BITS = 12
+
+MAX_NODE_ID = (1 << NODE_ID_BITS) - 1
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+WORKER_ID_SHIFT = SEQUENCE_BITS
+NODE_ID_SHIFT = SEQUENCE_BITS + WORKER_ID_BITS
+TIMESTAMP_SHIFT = SEQUENCE_BITS + WORKER_ID_BITS + NODE_ID_BITS
+
+logger = logging.getLogger(__name__)
+
+
+class SnowflakeGenerator:
+    """
+    Süreç başına tek örnek kullanılmalıdır. Saat geriye giderse veya bir milisaniyede
+    4096'dan fazla ID istenirse, beklemek yerine son zaman damgası ileri kaydırılarak
+    ID'lerin artan kalması sağlanır.
+    """
+    __slots__ = ("node_id", "worker_id", "_prefix", "_last_timestamp", "_sequence", "_lock")
+
+    def __init__(self, node_id: int, worker_id: int):
+        if not 0 <= node_id <= MAX_NODE_ID:
+            raise ValueError(f"node_id 0-{MAX_NODE_ID} aralığında olmalı.")
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id 0-{MAX_WORKER_ID} aralığında olmalı.")
+        self.node_id = node_id
+        self.worker_id = worker_id
+        self._prefix = (node_id << NODE_ID_SHIFT) | (worker_id << WORKER_ID_SHIFT)
+        self._last_timestamp = -1
+        self._sequence = 0
+        # Olay döngüsü dışındaki thread'lerden (ör. run_sync) çağrılmaya karşı
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            timestamp = int(time.time() * 1000) - ID_EPOCH_MS
+            if timestamp <= self._last_timestamp:
+                timestamp = self._last_timestamp
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Bu milisaniyedeki sıra numaraları bitti, bir sonraki milisaniyeden devam et
+                    timestamp += 1
+            else:
+                self._sequence = 0
+            self._last_timestamp = timestamp
+            return (timestamp << TIMESTAMP_SHIFT) | self._prefix | self._sequence
+
+
+def id_to_datetime(snowflake_id: int) -> datetime:
+    """
+    ID'nin üretildiği zamanı (UTC) döndürür.
+    """
+    timestamp_ms = (snowflake_id >> TIMESTAMP_SHIFT) + ID_EPOCH_MS
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+
+
+def is_snowflake(message_id: int) -> bool:
+    """
+    ID'nin bu üretici tarafından mı, yoksa eski serial sekans tarafından mı üretildiğini söyler.
+    Eski ID'ler zaman bilgisi taşımaz.
+    """
+    return message_id >= (1 << TIMESTAMP_SHIFT)
+
+
+def min_id_for(moment: datetime) -> int:
+    """
+    Verilen andan önce üretilmiş tüm ID'lerden büyük olan en küçük ID.
+    Zaman aralığını ID aralığına çevirmek için kullanılır.
+    """
+    timestamp_ms = int(moment.timestamp() * 1000) - ID_EPOCH_MS
+    return max(timestamp_ms, 0) << TIMESTAMP_SHIFT
+
+
+class WorkerIdLease:
+    """
+    Redis'te snowflake_worker:{node_id}:{worker_id} anahtarını SET NX ile alarak boş bir
+    worker ID kiralar ve kira süresi dolmadan yeniler. Kira kaybedilirse (Redis'e
+    ulaşılamadı veya anahtar başka sürece geçti) ID üretimi durdurulur ve yeni bir ID
+    kiralanmaya çalışılır; böylece iki süreç aynı worker ID ile ID üretmez.
+    """
+    _RENEW = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+    _RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+    def __init__(self, redis_client, node_id: int = NODE_ID, lease_seconds: int = WORKER_ID_LEASE_SECONDS):
+        self.redis = redis_client
+        self.node_id = node_id
+        self.lease_seconds = lease_seconds
+        self.token = uuid.uuid4().hex
+        self.worker_id: Optional[int] = None
+        self.renewed_at = 0.0
+
+    def _key(self, worker_id: int) -> str:
+        return f"snowflake_worker:{self.node_id}:{worker_id}"
+
+    async def acquire(self) -> int:
+        for worker_id in range(MAX_WORKER_ID + 1):
+            if await self.redis.set(self._key(worker_id), self.token, nx=True, ex=self.lease_seconds):
+                self.worker_id = worker_id
+                self.renewed_at = time.monotonic()
+                configure(worker_id, self.node_id)
+                logger.info("Worker ID kiralandı.", extra={"node_id": self.node_id, "worker_id": worker_id})
+                return worker_id
+        raise RuntimeError(f"NODE_ID={self.node_id} için boş worker ID yok ({MAX_WORKER_ID + 1} sürecin hepsi kullanımda).")
+
+    async def renew(self) -> bool:
+        renewed = await self.redis.eval(self._RENEW, 1, self._key(self.worker_id), self.token, self.lease_seconds)
+        if renewed:
+            self.renewed_at = time.monotonic()
+        return bool(renewed)
+
+    async def run_renewal(self):
+        interval = self.lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await self.renew():
+                    continue
+                logger.error("Worker ID kirası kaybedildi.", extra={"worker_id": self.worker_id})
+            except Exception as e:
+                # Kira, süresi dolmadan bir sonraki denemede yenilenebilir
+                if time.monotonic() - self.renewed_at < self.lease_seconds - interval:
+                    logger.warning("Worker ID kirası yenilenemedi.", extra={"worker_id": self.worker_id, "error": str(e)})
+                    continue
+                logger.error("Worker ID kirası süresi doluyor; ID üretimi durduruldu.", extra={"worker_id": self.worker_id})
+
+            configure(None)
+            while True:
+                try:
+                    await self.acquire()
+                    break
+                except Exception as e:
+                    logger.error("Worker ID kiralanamadı.", extra={"error": str(e)})
+                    await asyncio.sleep(interval)
+
+    async def release(self):
+        if self.worker_id is not None:
+            await self.redis.eval(self._RELEASE, 1, self._key(self.worker_id), self.token)
+
+
+async def acquire_worker_id(redis_client) -> Optional[WorkerIdLease]:
+    """
+    WORKER_ID tanımlı değilse Redis'ten worker ID kiralar; kiranın yenilenmesi için
+    dönen nesnenin run_renewal görevi çalıştırılmalı, kapanışta release çağrılmalıdır.
+    """
+    if generator is not None:
+        return None
+    lease = WorkerIdLease(redis_client)
+    await lease.acquire()
+    return lease
+
+
+def configure(worker_id: Optional[int], node_id: int = NODE_ID):
+    """
+    Süreç genelindeki üreticiyi kurar; None verilirse ID üretimi durdurulur.
+    """
+    global generator
+    generator = None if worker_id is None else SnowflakeGenerator(node_id, worker_id)
+
+
+def next_id() -> int:
+    if generator is None:
+        raise RuntimeError("Worker ID atanmadı: WORKER_ID tanımlanmalı veya acquire_worker_id çağrılmalı.")
+    return generator.next_id()
+
+
+generator: Optional[SnowflakeGenerator] = None
+if os.getenv("WORKER_ID") is not None:
+    configure(int(os.getenv("WORKER_ID")))
@@ -0,0 +1,128 @@
+"""
+Yapılandırılmış (JSON) ve bloklamayan loglama.
+
+Log kayıtları olay döngüsünde sadece sınırlı bir kuyruğa atılır; JSON'a çevirme ve
+stdout'a yazma işi arka plandaki QueueListener thread'inde yapılır. Kuyruk dolarsa
+kayıt bekletilmeden düşürülür ve düşürülen kayıt sayısı metriklere yansır.
+
+Ortam değişkenleri:
+    LOG_LEVEL              Varsayılan INFO
+    LOG_QUEUE_SIZE         Kuyruk kapasitesi, varsayılan 10000
+    LOG_DEBUG_SAMPLE_RATE  Mesaj başına DEBUG olaylarının yazılma oranı (0-1), varsayılan 0.01
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 0.01))
+
+LOG_RECORDS_DROPPED = metrics.counter("log_records_dropped_total", "Kuyruk dolu olduğu için düşürülen log kaydı sayısı.")
+
+_listener = None
+
+# LogRecord'un kendi alanları; bunların dışındaki extra alanlar JSON'a eklenir
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Kaydı tek satırlık JSON'a çevirir. logger.info("...", extra={...}) ile verilen alanlar
+    üst seviye anahtar olarak eklenir.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Çağıran thread'de sadece mesajı birleştirir ve kuyruğa atar; JSON'a çevirmez.
+    Kuyruk doluysa beklemek yerine kaydı düşürür.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Traceback nesneleri thread'ler arasında taşınmasın diye burada metne çevrilir
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """
+    Durdurma işareti kuyruk doluyken de eklenir; yazıcı thread yer açana kadar beklenir.
+    """
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def setup_logging():
+    """
+    Kök logger'ı kuyruk handler'ına bağlar ve yazıcı thread'ini başlatır.
+    Birden fazla çağrılması güvenlidir.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [NonBlockingQueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = DrainingQueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """
+    Kuyrukta kalan kayıtları yazar ve thread'i durdurur.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def debug_sampled(logger: logging.Logger, message: str, **fields):
+    """
+    Mesaj başına üretilen DEBUG olaylarını LOG_DEBUG_SAMPLE_RATE oranında yazar.
+    DEBUG kapalıysa kayıt nesnesi hiç oluşturulmaz.
+    """
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_DEBUG_SAMPLE_RATE:
+        logger.debug(message, extra=fields)
@@ -1,13 +1,13 @@
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks, Body
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks, Body, Request, WebSocket
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, FileResponse, RedirectResponse
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from models import User, ValidationEmailLog, Message, Friends
-from database import Database
+from models import User, ValidationEmailLog, Message, Friends, Attachment
+from database import Database, primary_sticky_key, READ_YOUR_WRITES_SECONDS
 from redis_handler import RedisHandler
 from email_handler import send_email_smtp
-from middleware import AuthMiddleware
+from middleware import AuthMiddleware, MetricsMiddleware, ProfilingMiddleware
 import random
 from datetime import datetime, timedelta
 from sqlalchemy import or_, func, and_
@@ -17,12 +17,37 @@ from dotenv import load_dotenv
 import os
 import security
 import string
+import uuid
+from typing import Optional
+import json
+import metrics
+from storage import LocalStorage, OffsetMismatch, UploadNotFound, attachment_access_key
+from id_generator import id_to_datetime, is_snowflake, acquire_worker_id
+from partitions import oldest_partition_start, run_partition_maintenance, CHAT_LIST_WINDOW_DAYS
+from archive import read_archived_messages
+import statements
+import asyncio
+import signal
+from log_handler import setup_logging
+from warmup import Readiness
+from friend_graph import FriendGraph
+from user_search import search_users, USER_SEARCH_DEFAULT_LIMIT
+from sqlalchemy.exc import IntegrityError
+from profiling import profiler, PROFILING_ADMIN_TOKEN
+from connection_policy import uvicorn_ws_options
+import hmac
+import logging
 
 from schemas.s_auth import UserCreate, ValidateEmailBase, ResendEmailModel, LoginModel, ForgotPasswordModel
-from schemas.s_chat import ChatItem, AddFriendItem
+from schemas.s_chat import AddFriendItem
+from schemas.s_media import CreateUploadItem
 
 load_dotenv()
 
+setup_logging()
+
+logger = logging.getLogger("main")
+
 istanbul_tz = pytz.timezone('Europe/Istanbul')
 
 app = FastAPI()
@@ -33,16 +58,60 @@ EXEMPT_PATHS = [
     "/users/validate-email",
     "/users/resend-email",
     "/users/refresh",
-    "/users/forgot-password"
+    "/users/forgot-password",
+    "/metrics",
+    "/ready"
 ]
 
 # Middleware ekle
+# Profil middleware'i en içte olmalı ki endpoint ile aynı task'ta çalışsın
+app.add_middleware(ProfilingMiddleware)
 app.add_middleware(AuthMiddleware, exempt_paths=EXEMPT_PATHS)
+# Metrik middleware'i en dışta olmalı ki 401 dönen istekler de sayılsın
+app.add_middleware(MetricsMiddleware)
 
 db = Database()
 
 redis_handler = RedisHandler()
 
+storage = LocalStorage()
+
+readiness = Readiness()
+
+# Sohbet protokolünün çalıştığı yer:
+#   standalone: chat_server.py ayrı süreçte, 8001 portunda
+#   fastapi:    bu uygulamada /ws route'u; engine, Redis havuzu ve önbellekler REST API ile paylaşılır
+CHAT_WS = os.getenv("CHAT_WS", "standalone")
+
+friend_graph = FriendGraph(redis_handler)
+
+MEDIA_MAX_BYTES = int(os.getenv("MEDIA_MAX_BYTES", 100 * 1024 * 1024))
+MEDIA_UPLOAD_TTL_SECONDS = int(os.getenv("MEDIA_UPLOAD_TTL_SECONDS", 60 * 60 * 24))
+# Tanımlıysa dosyalar nginx X-Accel-Redirect ile (sendfile) sunulur, örn: /protected-media/
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX")
+
+# Mesaj geçmişi sayfalanırken taranan ilk zaman penceresi; mesaj bulunamazsa pencere büyütülür
+HISTORY_WINDOW_DAYS = int(os.getenv("HISTORY_WINDOW_DAYS", 30))
+
+# En eski messages partition'ının başlangıcı, ilk kullanımda okunur
+oldest_message_partition = None
+
+async def get_read_session(request: Request):
+    """
+    GET route'ları için okuma oturumu. Kullanıcı son READ_YOUR_WRITES_SECONDS içinde
+    yazma yaptıysa kendi yazdıklarını görebilmesi için primary'ye yönlendirilir.
+    """
+    prefer_primary = False
+    user = getattr(request.state, "user", None)
+    if db.has_replicas and user:
+        prefer_primary = await redis_handler.get(key=primary_sticky_key(user["user_id"])) is not None
+    async for session in db.get_read_session(prefer_primary=prefer_primary):
+        yield session
+
+async def mark_primary_sticky(user_id: int):
+    if db.has_replicas:
+        await redis_handler.set(key=primary_sticky_key(user_id), value="1", expire_seconds=READ_YOUR_WRITES_SECONDS)
+
 def generate_code(x:bool=True):
     if x == True:
         return ''.join(random.choices('0123456789', k=6))
@@ -51,14 +120,136 @@ def generate_code(x:bool=True):
 
 # Kullanım
 
+async def prime_caches():
+    global oldest_message_partition
+    async with db.engine.connect() as conn:
+        oldest_message_partition = await oldest_partition_start(conn)
+
 @app.on_event("startup")
 async def on_startup():
-    await redis_handler.connect()
+    # Isınma arka planda çalışır; bitene kadar /ready 503 döner
+    app.state.warmup_task = asyncio.create_task(readiness.run(db, redis_handler, prime=prime_caches))
+    app.state.partition_task = asyncio.create_task(run_partition_maintenance(db))
+    if db.has_replicas:
+        app.state.replica_lag_task = asyncio.create_task(db.run_replica_lag_monitor())
+    # kill -USR1 <pid> ile profil toplama açılıp kapatılır
+    profiler.install_signal_handler()
+    app.state.loop_lag_task = asyncio.create_task(profiler.run_loop_lag_monitor())
+    if CHAT_WS == "fastapi":
+        # Mesaj ID'leri için bu sürece ait worker ID; alınamazsa süreç başlamaz
+        app.state.id_lease = await acquire_worker_id(redis_handler.redis)
+        chat_server.init_services(db, redis_handler, ready=readiness)
+        app.state.chat_tasks = chat_server.start_background_tasks(db)
+        if app.state.id_lease is not None:
+            app.state.chat_tasks.append(asyncio.create_task(app.state.id_lease.run_renewal()))
+        app.state.drain_task = None
+        install_drain_on_sigterm()
+
+def install_drain_on_sigterm():
+    """
+    uvicorn, SIGTERM aldığında lifespan shutdown'dan önce açık WebSocket'leri 1012 ile kapatır;
+    drain shutdown_event içinde çalışsaydı bağlantılar çoktan kopmuş olurdu. Bu yüzden SIGTERM
+    önce drain'i başlatır, drain bitince uvicorn'un kendi işleyicisi çağrılır ve kapanma
+    normal şekilde sürer. İkinci SIGTERM drain'i beklemeden uvicorn'a iletilir.
+    Kapanma süresi sınırı (ör. Kubernetes terminationGracePeriodSeconds) DRAIN_WINDOW_SECONDS'tan uzun olmalıdır.
+    """
+    loop = asyncio.get_running_loop()
+    # uvicorn.Server.capture_signals tarafından kurulan işleyici
+    uvicorn_handler = signal.getsignal(signal.SIGTERM)
+
+    def exit_via_uvicorn():
+        signal.signal(signal.SIGTERM, uvicorn_handler)
+        if callable(uvicorn_handler):
+            uvicorn_handler(signal.SIGTERM, None)
+        else:
+            signal.raise_signal(signal.SIGTERM)
+
+    async def drain_then_exit():
+        try:
+            await chat_server.drain()
+        except Exception:
+            logger.exception("Drain hatası.")
+        finally:
+            exit_via_uvicorn()
+
+    def start_drain():
+        if app.state.drain_task is None:
+            app.state.drain_task = asyncio.create_task(drain_then_exit())
+
+    def on_sigterm(signum, frame):
+        if app.state.drain_task is not None:
+            exit_via_uvicorn()
+            return
+        loop.call_soon_threadsafe(start_drain)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if CHAT_WS == "fastapi":
+        if app.state.drain_task is None:
+            # SIGINT gibi drain'siz kapanma: bağlantıları uvicorn kapattı, yalnızca room işleri bitirilir
+            await chat_server.room_actors.close(chat_server.DRAIN_FLUSH_TIMEOUT_SECONDS)
+        for task in app.state.chat_tasks:
+            task.cancel()
+        if app.state.id_lease is not None:
+            await app.state.id_lease.release()
     await redis_handler.close()
 
+if CHAT_WS == "fastapi":
+    import chat_server
+    from ws_adapter import StarletteWebSocketAdapter
+
+    @app.websocket("/ws")
+    async def chat_websocket(websocket: WebSocket):
+        """
+        chat_server ile aynı protokol; kimlik doğrulama ilk mesajdaki user_id ile yapılır.
+        """
+        rejection = chat_server.handshake_rejection()
+        if rejection is not None:
+            # Kabulden önce kapatmak el sıkışmayı HTTP 403 ile reddeder
+            await websocket.close(code=1013, reason=rejection[0])
+            return
+        await websocket.accept()
+        await chat_server.handler(StarletteWebSocketAdapter(websocket), db)
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/ready")
+async def get_ready():
+    # Drain başladıysa yük dengeleyici bu sürece yeni istemci göndermesin
+    if not readiness.ready or (CHAT_WS == "fastapi" and chat_server.drain_controller.draining):
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
+
+def is_profiling_admin(request: Request) -> bool:
+    token = request.headers.get("X-Admin-Token")
+    return bool(PROFILING_ADMIN_TOKEN and token and hmac.compare_digest(token, PROFILING_ADMIN_TOKEN))
+
+@app.get("/admin/profiling")
+async def get_profiling(request: Request):
+    if not is_profiling_admin(request):
+        return JSONResponse(status_code=403, content={"detail": "Yetkiniz yok."})
+    return profiler.status()
+
+@app.post("/admin/profiling")
+async def set_profiling(
+    request: Request,
+    enabled: bool = Body(..., embed=True),
+    sample_rate: Optional[float] = Body(None, embed=True),
+    slow_seconds: Optional[float] = Body(None, embed=True)
+):
+    """
+    Profil toplamayı açar/kapatır. Aynı süreçte çalışan sohbet sunucusunun (CHAT_WS=fastapi)
+    action'ları da etkilenir; bağımsız sohbet sunucusu için SIGUSR1 kullanılır.
+    """
+    if not is_profiling_admin(request):
+        return JSONResponse(status_code=403, content={"detail": "Yetkiniz yok."})
+    profiler.set(enabled, sample_rate=sample_rate, slow_seconds=slow_seconds)
+    return profiler.status()
+
 
 
 @app.post("/users/register")
@@ -66,7 +257,7 @@ async def register(data: UserCreate, background_tasks: BackgroundTasks, session:
     try:
         now = get_current_utc_time()
         print(now)
-        query = await session.execute(select(User).where(User.email == data.email))
+        query = await session.execute(statements.user_by_email(data.email))
         current_user = query.scalars().first()
         if current_user:
             return JSONResponse(
@@ -217,8 +408,7 @@ async def login_for_access_token(
     """
     try:
         # Kullanıcıyı email ile bul
-        query = select(User).where(User.email == form_data.email)
-        result = await session.execute(query)
+        result = await session.execute(statements.user_by_email(form_data.email))
         user = result.scalars().first()
 
         print("here")
@@ -268,8 +458,7 @@ async def refresh_access_token(
             )
 
         # Kullanıcı var mı kontrol et
-        query = select(User).where(User.id == decoded["user_id"])
-        result = await session.execute(query)
+        result = await session.execute(statements.user_by_id(decoded["user_id"]))
         user = result.scalars().first()
 
         if not user:
@@ -311,8 +500,7 @@ def generate_password(length=12):
 async def forgot_password(data: ForgotPasswordModel, background_tasks: BackgroundTasks, session: AsyncSession = Depends(db.get_session)):
     try:
         # 1. Kullanıcıyı email ile bul
-        query = select(User).where(User.email == data.email)
-        result = await session.execute(query)
+        result = await session.execute(statements.user_by_email(data.email))
         user = result.scalars().first()
         current_utc_time = get_current_utc_time()
 
@@ -435,7 +623,7 @@ async def forgot_password(data: ForgotPasswordModel, background_tasks: Backgroun
 #         )
 
 @app.get("/chat/chat-users/{user_id}")
-async def get_chats(user_id: int, session: AsyncSession = Depends(db.get_session)):
+async def get_chats(user_id: int, session: AsyncSession = Depends(get_read_session)):
     try:
         current_user = await is_there_this_user(user_id, session)
         if not current_user:
@@ -445,93 +633,71 @@ async def get_chats(user_id: int, session: AsyncSession = Depends(db.get_session
             )
         
         current_user_id = current_user.id
+        # Son mesaj sorgusu sadece son CHAT_LIST_WINDOW_DAYS günün partition'larını tarar
+        window_start = get_current_utc_time() - timedelta(days=CHAT_LIST_WINDOW_DAYS)
         
         # 1. Mesajlaşma geçmişi olan arkadaşları bulma sorgusu
-        latest_message_subquery = select(
-            func.max(Message.sent_date).label('max_sent_date'),
-            func.least(Message.sender_id, Message.receiver_id).label("user1"),
-            func.greatest(Message.sender_id, Message.receiver_id).label("user2")
-        ).filter(
-            or_(Message.sender_id == current_user_id, Message.receiver_id == current_user_id)
-        ).group_by(
-            func.least(Message.sender_id, Message.receiver_id),
-            func.greatest(Message.sender_id, Message.receiver_id),
-        ).subquery()
-        
-        stmt = select(Message, User).join(
-            User,
-            or_(
-                User.id == Message.sender_id,
-                User.id == Message.receiver_id
-            )
-        ).filter(
-            or_(
-                Message.sender_id == current_user_id,
-                Message.receiver_id == current_user_id
-            ),
-            Message.sent_date == latest_message_subquery.c.max_sent_date,
-            User.id != current_user_id
-        ).distinct() # Tekrar edenleri engellemek için distinct kullanın
-
-        result = await session.execute(stmt)
+        # Tekrar edenleri engellemek için distinct kullanılır; sadece listede gösterilen kolonlar seçilir
+        result = await session.execute(statements.chat_list_latest(current_user_id, window_start))
         latest_messages_with_users = result.all()
         
         # Sohbet listesi için bir set oluşturun, böylece tekrar eden kullanıcıları kolayca yönetebilirsiniz
-        chatted_user_ids = {other_user.id for message, other_user in latest_messages_with_users}
+        chatted_user_ids = {other_user_id for _, _, other_user_id, _ in latest_messages_with_users}
         
-        chats_list = []
-        for message, other_user in latest_messages_with_users:
-            # Okunmamış mesaj sayısını hesapla
-            unread_count_stmt = select(func.count()).filter(
-                Message.sender_id == other_user.id,
-                Message.receiver_id == current_user_id,
-                Message.is_read == False
+        # Arkadaş ID'leri Redis'teki arkadaşlık set'inden okunur, sadece kullanıcılar veritabanından çekilir
+        friend_ids = await friend_graph.friends_of(session, current_user_id) - chatted_user_ids
+        
+        # Pencerede mesajı olmayan arkadaşlarla daha eski bir sohbet varsa, son mesajı zaman sınırı
+        # olmadan aranır. Arkadaş olmayan kullanıcılarla pencereden eski sohbetler listelenmez.
+        if friend_ids:
+            older_result = await session.execute(statements.chat_list_older(current_user_id, sorted(friend_ids)))
+            older_chats = older_result.all()
+            if older_chats:
+                older_user_ids = {other_user_id for _, _, other_user_id, _ in older_chats}
+                chatted_user_ids |= older_user_ids
+                latest_messages_with_users += older_chats
+                friend_ids -= older_user_ids
+        
+        # Okunmamış mesaj sayıları, sohbet başına ayrı sorgu yerine tek gruplu sorguyla hesaplanır.
+        # Pencereyle sınırlanmaz: pencereden eski okunmamış mesajlar da sayılır.
+        unread_counts = {}
+        if chatted_user_ids:
+            unread_result = await session.execute(
+                statements.chat_list_unread(current_user_id, sorted(chatted_user_ids))
             )
-            unread_count_result = await session.execute(unread_count_stmt)
-            unread_count = unread_count_result.scalar_one()
-
-            chats_list.append(ChatItem(
-                name=other_user.username,
-                receiver_id=other_user.id,
-                message=message.content,
-                time=message.sent_date.strftime('%H:%M'),
-                unread=unread_count,
-                avatar=f'https://randomuser.me/api/portraits/men/{other_user.id % 10}.jpg',
-                current_user_id=other_user.id
-            ))
+            unread_counts = dict(unread_result.all())
+        
+        # ChatItem alanlarıyla aynı anahtarlar; pydantic doğrulaması yapılmadan orjson ile yazılır
+        chats_list = []
+        for content, sent_date, other_user_id, other_username in latest_messages_with_users:
+            chats_list.append({
+                "name": other_username,
+                "receiver_id": other_user_id,
+                "message": content,
+                "time": sent_date.strftime('%H:%M'),
+                "unread": unread_counts.get(other_user_id, 0),
+                "avatar": f'https://randomuser.me/api/portraits/men/{other_user_id % 10}.jpg',
+                "current_user_id": other_user_id
+            })
             
-        # 2. Hiç mesajlaşmamış ancak arkadaş olan kullanıcıları bulma sorgusu
-        # Arkadaşlık tablosundaki her iki durumu da kontrol edin
-        friend_stmt = select(User).join(
-            Friends,
-            or_(
-                Friends.requestor_id == User.id,
-                Friends.addressee_id == User.id
-            )
-        ).filter(
-            or_(
-                Friends.requestor_id == current_user_id,
-                Friends.addressee_id == current_user_id
-            ),
-            User.id != current_user_id,
-            User.id.notin_(chatted_user_ids) # Mesajlaşma geçmişi olanları dışla
-        ).distinct()
-
-        friends_without_chat = await session.execute(friend_stmt)
-        friends = friends_without_chat.scalars().all()
+        # 2. Hiç mesajlaşmamış ancak arkadaş olan kullanıcılar
+        friends = []
+        if friend_ids:
+            friends_without_chat = await session.execute(select(User.id, User.username).where(User.id.in_(friend_ids)))
+            friends = friends_without_chat.all()
         
-        for friend in friends:
-            chats_list.append(ChatItem(
-                name=friend.username,
-                receiver_id=friend.id,
-                message="Henüz mesajlaşmadınız.", # Varsayılan bir mesaj
-                time="", # Zaman bilgisi yok
-                unread=0,
-                avatar=f'https://randomuser.me/api/portraits/men/{friend.id % 10}.jpg',
-                current_user_id=friend.id
-            ))
-
-        return chats_list
+        for friend_id, friend_username in friends:
+            chats_list.append({
+                "name": friend_username,
+                "receiver_id": friend_id,
+                "message": "Henüz mesajlaşmadınız.", # Varsayılan bir mesaj
+                "time": "", # Zaman bilgisi yok
+                "unread": 0,
+                "avatar": f'https://randomuser.me/api/portraits/men/{friend_id % 10}.jpg',
+                "current_user_id": friend_id
+            })
+
+        return ORJSONResponse(content=chats_list)
 
     except Exception as e:
         print(f"Hata: {e}")
@@ -540,8 +706,78 @@ async def get_chats(user_id: int, session: AsyncSession = Depends(db.get_session
             content={"message": "Internal Server Error"}
         )
 
+async def fetch_history_page(session: AsyncSession, user1_id: int, user2_id: int, before_id: Optional[int], limit: Optional[int]):
+    """
+    Sayfayı yeniden eskiye, büyüyen zaman pencereleriyle çeker. Her sorgu sent_date
+    aralığı içerdiğinden Postgres sadece ilgili aylık partition'ları tarar.
+    Mesajlar kolon sözlükleri olarak döner.
+    """
+    global oldest_message_partition
+
+    upper = get_current_utc_time()
+    if before_id is not None and is_snowflake(before_id):
+        upper = id_to_datetime(before_id)
+
+    if limit is None:
+        result = await session.execute(statements.conversation_page(user1_id, user2_id, upper, before_id=before_id))
+        return [dict(row) for row in result.mappings()]
+
+    if oldest_message_partition is None:
+        oldest_message_partition = await oldest_partition_start(await session.connection())
+    if oldest_message_partition is None:
+        # Tablo bölümlenmemiş, pencereleme fayda sağlamaz
+        result = await session.execute(statements.conversation_page(user1_id, user2_id, upper, before_id=before_id, limit=limit))
+        return [dict(row) for row in result.mappings()]
+
+    messages = []
+    window = timedelta(days=HISTORY_WINDOW_DAYS)
+    while len(messages) < limit and upper >= oldest_message_partition:
+        lower = upper - window
+        result = await session.execute(
+            statements.conversation_page(user1_id, user2_id, upper, lower, before_id=before_id, limit=limit - len(messages))
+        )
+        messages.extend(dict(row) for row in result.mappings())
+        upper = lower
+        window *= 2
+    return messages
+
+async def read_history(session: AsyncSession, user1_id: int, user2_id: int, before_id: Optional[int], limit: Optional[int]):
+    """
+    Sıcak veriyi (messages) ve arşivi birleştirerek eskiden yeniye mesajları ve bir sonraki
+    sayfanın imlecini döndürür.
+    """
+    if before_id is None and limit is None:
+        result = await session.execute(statements.conversation_history(user1_id, user2_id))
+        # Arşivlenmiş mesajlar her zaman sıcak veriden eskidir
+        archived = await read_archived_messages(session, user1_id, user2_id)
+        return list(reversed(archived)) + [dict(row) for row in result.mappings()], None
+
+    # Snowflake ID'ler zamana göre sıralı olduğundan ID imleç olarak kullanılır
+    newest_first = await fetch_history_page(session, user1_id, user2_id, before_id, limit)
+
+    # Sayfa sıcak veride dolmadıysa kalan kısım arşivden okunur
+    if limit is None or len(newest_first) < limit:
+        archive_before_id = newest_first[-1]["id"] if newest_first else before_id
+        remaining = limit - len(newest_first) if limit is not None else None
+        newest_first += await read_archived_messages(session, user1_id, user2_id, archive_before_id, remaining)
+
+    messages = list(reversed(newest_first))
+    next_cursor = messages[0]["id"] if limit is not None and len(messages) == limit else None
+    return messages, next_cursor
+
 @app.get("/chat/messages/{user1_id}/{user2_id}")
-async def get_messages_between_users(user1_id: int, user2_id: int, session: AsyncSession = Depends(db.get_session)):
+async def get_messages_between_users(
+    user1_id: int,
+    user2_id: int,
+    before_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    """
+    İki kullanıcı arasındaki mesajları eskiden yeniye döndürür.
+    limit verilirse before_id'den (yoksa en yeniden) geriye doğru bir sayfa döner;
+    bir sonraki sayfa için yanıttaki next_cursor, before_id olarak gönderilir.
+    """
     try:
         user_1 = await is_there_this_user(user1_id, session)
         user_2 = await is_there_this_user(user2_id, session)
@@ -551,19 +787,12 @@ async def get_messages_between_users(user1_id: int, user2_id: int, session: Asyn
                 content={"message" : "User not Found"}
             )
         
-        stmt = select(Message).where(
-            or_(
-                and_(Message.sender_id == user_1.id, Message.receiver_id == user2_id),
-                and_(Message.sender_id == user2_id, Message.receiver_id == user1_id),
-            )
-        ).order_by(Message.sent_date)
+        messages, next_cursor = await read_history(session, user1_id, user2_id, before_id, limit)
 
-        result = await session.execute(stmt)
-        messages = result.scalars().all()
-
-        return JSONResponse(
+        # Satırlar sözlük olarak kalır; datetime'lar orjson tarafından doğrudan yazılır
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
-            content={"messages" : jsonable_encoder(messages)}
+            content={"messages" : messages, "next_cursor" : next_cursor}
         )
 
     except Exception as e:
@@ -577,22 +806,35 @@ async def get_messages_between_users(user1_id: int, user2_id: int, session: Asyn
 async def add_friend(data: AddFriendItem, session: AsyncSession = Depends(db.get_session)):
     try:
         current_user = await is_there_this_user(data.userId, session)
-        stmt_user = select(User).where(User.username == data.username, User.user_tag == data.userTag)
-        result = await session.execute(stmt_user)
+        result = await session.execute(statements.user_by_handle(data.username, data.userTag))
         user = result.scalars().first()
         if not user or not current_user:
             return JSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={"message" : "User not found"}
             )
+        if user.id == current_user.id:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"message" : "You cannot add yourself"}
+            )
         
         new_friends = Friends(
             requestor_id=current_user.id,
             addressee_id=user.id
         )
         session.add(new_friends)
-        await session.commit()
-        await session.refresh(new_friends)
+        try:
+            await session.commit()
+        except IntegrityError:
+            # uq_friends_pair: çift iki yönden biriyle zaten eklenmiş
+            await session.rollback()
+            return JSONResponse(
+                status_code=status.HTTP_409_CONFLICT,
+                content={"message" : "Already friends"}
+            )
+        await friend_graph.add(current_user.id, user.id)
+        await mark_primary_sticky(current_user.id)
 
         return JSONResponse(
             status_code=200,
@@ -603,4 +845,275 @@ async def add_friend(data: AddFriendItem, session: AsyncSession = Depends(db.get
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"message" : "Internal Server Error"}
-        )
\ No newline at end of file
+        )
+
+@app.get("/users/search")
+async def search(q: str, limit: int = USER_SEARCH_DEFAULT_LIMIT, session: AsyncSession = Depends(get_read_session)):
+    """
+    q "isim#etiket" ise tam eşleşme, değilse kullanıcı adı önek araması yapar.
+    """
+    try:
+        users = await search_users(session, redis_handler, q, limit)
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"users" : users}
+        )
+    except Exception as e:
+        print(e)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message" : "Internal Server Error"}
+        )
+
+@app.get("/chat/mutual-friends/{user_id}/{other_user_id}")
+async def get_mutual_friends(user_id: int, other_user_id: int, session: AsyncSession = Depends(get_read_session)):
+    try:
+        mutual_ids = await friend_graph.mutual_friends(session, user_id, other_user_id)
+        users = []
+        if mutual_ids:
+            result = await session.execute(select(User).where(User.id.in_(mutual_ids)).order_by(User.username))
+            users = result.scalars().all()
+
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"friends" : [
+                {"id" : user.id, "username" : user.username, "user_tag" : user.user_tag} for user in users
+            ]}
+        )
+    except Exception as e:
+        print(e)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message" : "Internal Server Error"}
+        )
+
+async def get_upload_state(upload_id: str, request: Request):
+    """
+    Yükleme oturumunu Redis'ten okur. Oturum yoksa veya başka kullanıcıya aitse None döner.
+    """
+    raw_state = await redis_handler.get(key=f"upload:{upload_id}")
+    if raw_state is None:
+        return None
+    state = json.loads(raw_state)
+    if state["user_id"] != request.state.user["user_id"]:
+        return None
+    return state
+
+@app.post("/media/uploads")
+async def create_upload(data: CreateUploadItem, request: Request):
+    try:
+        if data.size <= 0 or data.size > MEDIA_MAX_BYTES:
+            return JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"message" : "Invalid File Size", "max_size" : MEDIA_MAX_BYTES}
+            )
+
+        upload_id = uuid.uuid4().hex
+        state = {
+            "user_id": request.state.user["user_id"],
+            "filename": data.filename,
+            "content_type": data.content_type,
+            "size": data.size
+        }
+        await redis_handler.set(key=f"upload:{upload_id}", value=json.dumps(state), expire_seconds=MEDIA_UPLOAD_TTL_SECONDS)
+
+        return JSONResponse(
+            status_code=status.HTTP_201_CREATED,
+            content={"upload_id" : upload_id, "offset" : 0}
+        )
+    except Exception as e:
+        print(e)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message" : "Internal Server Error"}
+        )
+
+@app.get("/media/uploads/{upload_id}")
+async def get_upload_offset(upload_id: str, request: Request):
+    """
+    Yarım kalan yüklemenin kaldığı yeri döndürür; istemci bu offset'ten devam eder.
+    """
+    state = await get_upload_state(upload_id, request)
+    if state is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message" : "Upload Not Found"}
+        )
+    offset = await storage.upload_size(upload_id)
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={"upload_id" : upload_id, "offset" : offset, "size" : state["size"]}
+    )
+
+@app.put("/media/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request):
+    """
+    İstek gövdesini belleğe almadan yüklemenin sonuna ekler.
+    offset, sunucudaki mevcut boyutla eşleşmelidir.
+    """
+    try:
+        state = await get_upload_state(upload_id, request)
+        if state is None:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"message" : "Upload Not Found"}
+            )
+
+        try:
+            # Offset, yüklemenin kilidi alındıktan sonra kontrol edilir; eşzamanlı parçalar üst üste yazılmaz
+            new_offset = await storage.append_chunk(upload_id, request.stream(), max_size=state["size"], offset=offset)
+        except OffsetMismatch as e:
+            return JSONResponse(
+                status_code=status.HTTP_409_CONFLICT,
+                content={"message" : "Offset Mismatch", "offset" : e.offset}
+            )
+        except UploadNotFound:
+            # Kilit beklenirken yükleme başka bir worker'da tamamlandı veya silindi
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"message" : "Upload Not Found"}
+            )
+        except ValueError:
+            await storage.discard_upload(upload_id)
+            await redis_handler.delete(key=f"upload:{upload_id}")
+            return JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"message" : "Upload Exceeds Declared Size"}
+            )
+
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"upload_id" : upload_id, "offset" : new_offset}
+        )
+    except Exception as e:
+        print(e)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message" : "Internal Server Error"}
+        )
+
+@app.post("/media/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, request: Request, session: AsyncSession = Depends(db.get_session)):
+    try:
+        state = await get_upload_state(upload_id, request)
+        if state is None:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"message" : "Upload Not Found"}
+            )
+
+        offset = await storage.upload_size(upload_id)
+        if offset != state["size"]:
+            return JSONResponse(
+                status_code=status.HTTP_409_CONFLICT,
+                content={"message" : "Upload Incomplete", "offset" : offset}
+            )
+
+        try:
+            digest, size = await storage.finalize_upload(upload_id)
+        except (FileNotFoundError, UploadNotFound):
+            # Aynı yükleme başka bir istekte tamamlandı
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"message" : "Upload Not Found"}
+            )
+        await redis_handler.delete(key=f"upload:{upload_id}")
+
+        attachment = Attachment(
+            uploader_id=state["user_id"],
+            sha256=digest,
+            size=size,
+            content_type=state["content_type"],
+            filename=state["filename"]
+        )
+        session.add(attachment)
+        await session.commit()
+        await session.refresh(attachment)
+        await mark_primary_sticky(state["user_id"])
+
+        return JSONResponse(
+            status_code=status.HTTP_201_CREATED,
+            content={"attachment_id" : attachment.id, "sha256" : digest, "size" : size}
+        )
+    except Exception as e:
+        print(e)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message" : "Internal Server Error"}
+        )
+
+async def can_access_attachment(attachment: Attachment, user_id: int, session: AsyncSession) -> bool:
+    """
+    Eki yükleyen, eki içeren direct mesajın alıcısı veya eki içeren grup mesajının
+    dağıtıldığı room üyeleri erişebilir. Ekler yalnızca yükleyenin mesajlarına eklenebildiği
+    için mesajın göndereni yükleyendir.
+    """
+    if attachment.uploader_id == user_id:
+        return True
+    result = await session.execute(
+        select(Message.id).where(
+            Message.receiver_id == user_id,
+            Message.sender_id == attachment.uploader_id,
+            Message.attachment_id == attachment.id
+        ).limit(1)
+    )
+    if result.scalar() is not None:
+        return True
+    return bool(await redis_handler.redis.sismember(attachment_access_key(attachment.id), user_id))
+
+@app.get("/media/{attachment_id}")
+async def download_attachment(attachment_id: int, request: Request, session: AsyncSession = Depends(get_read_session)):
+    """
+    Eki sunar. Range istekleri desteklenir; MEDIA_ACCEL_REDIRECT_PREFIX tanımlıysa
+    dosya gönderimi sendfile kullanan reverse proxy'ye bırakılır.
+    """
+    try:
+        result = await session.execute(select(Attachment).where(Attachment.id == attachment_id))
+        attachment = result.scalars().first()
+        # Erişimi olmayan kullanıcıya ekin varlığı da gösterilmez
+        if not attachment or not await can_access_attachment(attachment, request.state.user["user_id"], session):
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"message" : "Attachment Not Found"}
+            )
+
+        path = storage.local_path(attachment.sha256)
+        if path is None:
+            url = storage.public_url(attachment.sha256)
+            if url is None:
+                return JSONResponse(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    content={"message" : "Attachment Not Found"}
+                )
+            return RedirectResponse(url)
+
+        if MEDIA_ACCEL_REDIRECT_PREFIX:
+            relative_path = os.path.relpath(path, storage.root)
+            return Response(
+                headers={
+                    "X-Accel-Redirect": MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative_path,
+                    "Content-Disposition": f'attachment; filename="{attachment.filename}"'
+                },
+                media_type=attachment.content_type
+            )
+
+        return FileResponse(path, media_type=attachment.content_type, filename=attachment.filename)
+    except Exception as e:
+        print(e)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message" : "Internal Server Error"}
+        )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # "uvicorn main:app" yerine bu şekilde başlatılırsa /ws route'u bağımsız sunucuyla aynı
+    # frame, kuyruk ve ping/pong sınırlarını kullanır
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", 8000)),
+        **uvicorn_ws_options()
+    )
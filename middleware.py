@@ -2,7 +2,21 @@ from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from typing import List
+import time
 import security  # senin security.py dosyan
+import metrics
+from profiling import profiler
+
+HTTP_REQUESTS_TOTAL = metrics.counter(
+    "http_requests_total",
+    "Route ve durum koduna göre REST istek sayısı.",
+    ("method", "route", "status")
+)
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds",
+    "Route bazında REST istek süresi.",
+    ("method", "route")
+)
 
 class AuthMiddleware(BaseHTTPMiddleware):
     def __init__(self, app: FastAPI, exempt_paths: List[str] = None):
@@ -36,3 +50,40 @@ class AuthMiddleware(BaseHTTPMiddleware):
         request.state.user = decoded
 
         return await call_next(request)
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            # Etiket sayısı patlamasın diye gerçek path yerine route şablonu kullanılır
+            route = request.scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            HTTP_REQUESTS_TOTAL.inc(request.method, route_path, status_code)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, request.method, route_path)
+
+
+class ProfilingMiddleware:
+    """
+    İstekleri profiling.profiler ile örnekler. Saf ASGI middleware'idir; en içe eklenirse
+    endpoint ile aynı task'ta çalışır ve yavaş istek dökümü endpoint'in await zincirini gösterir.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        def route_name():
+            route = scope.get("route")
+            return f"{scope['method']} {route.path if route is not None else 'unmatched'}"
+
+        async with profiler.profile("http", route_name):
+            await self.app(scope, receive, send)
@@ -0,0 +1,79 @@
+"""
+Sürümlü şema migration'ları.
+
+Her migration bu paket içinde vNNNN_aciklama.py isimli bir modüldür ve VERSION, DESCRIPTION
+ile async upgrade(conn) tanımlar. Uygulanan sürümler schema_migrations tablosunda tutulur.
+Her migration kendi transaction'ında ve advisory lock altında çalışır; böylece birden fazla
+süreç aynı anda başlatılsa bile bir migration yalnızca bir kez uygulanır.
+
+Migration'lar idempotent yazılır (IF NOT EXISTS, mevcut durumu kontrol etme): v0001 boş bir
+veritabanında şemanın güncel halini oluşturur, sonraki sürümler eski veritabanlarını yükseltir.
+
+Kullanım:
+    python -m migrations upgrade
+    python -m migrations status
+"""
+import importlib
+import logging
+import pkgutil
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# pg_advisory_xact_lock için sabit anahtar
+MIGRATION_LOCK_ID = 734001
+
+logger = logging.getLogger(__name__)
+
+
+def load_migrations():
+    """
+    Paket içindeki migration modüllerini sürüm sırasıyla döndürür.
+    """
+    migrations = []
+    for module_info in pkgutil.iter_modules(__path__):
+        if module_info.name.startswith("v") and module_info.name[1:5].isdigit():
+            migrations.append(importlib.import_module(f"{__name__}.{module_info.name}"))
+    migrations.sort(key=lambda module: module.VERSION)
+
+    versions = [module.VERSION for module in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Aynı sürüm numarasına sahip birden fazla migration var.")
+    return migrations
+
+
+async def _ensure_migrations_table(conn):
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR NOT NULL, "
+        "applied_date TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())"
+    ))
+
+
+async def applied_versions(conn) -> set:
+    await _ensure_migrations_table(conn)
+    result = await conn.execute(text("SELECT version FROM schema_migrations"))
+    return set(result.scalars().all())
+
+
+async def run_migrations(engine: AsyncEngine, target: int = None) -> list:
+    """
+    Uygulanmamış migration'ları sırayla uygular ve uygulanan sürümleri döndürür.
+    """
+    applied = []
+    for migration in load_migrations():
+        if target is not None and migration.VERSION > target:
+            break
+        async with engine.begin() as conn:
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+            if migration.VERSION in await applied_versions(conn):
+                continue
+            logger.info("Migration uygulanıyor.", extra={"version": migration.VERSION, "description": migration.DESCRIPTION})
+            await migration.upgrade(conn)
+            await conn.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                {"version": migration.VERSION, "description": migration.DESCRIPTION}
+            )
+            applied.append(migration.VERSION)
+    return applied
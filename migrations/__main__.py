@@ -0,0 +1,30 @@
+import asyncio
+import sys
+
+from log_handler import setup_logging
+from migrations import load_migrations, applied_versions, run_migrations
+
+
+async def async_main(command: str):
+    from database import Database
+
+    db = Database()
+    try:
+        if command == "upgrade":
+            applied = await run_migrations(db.engine)
+            print(f"Uygulanan migration'lar: {applied or 'yok'}")
+        elif command == "status":
+            async with db.engine.begin() as conn:
+                applied = await applied_versions(conn)
+            for migration in load_migrations():
+                state = "uygulandı" if migration.VERSION in applied else "bekliyor"
+                print(f"{migration.VERSION:04d} {migration.DESCRIPTION} [{state}]")
+        else:
+            print("Kullanım: python -m migrations upgrade|status")
+    finally:
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(async_main(sys.argv[1] if len(sys.argv) > 1 else ""))
@@ -0,0 +1,12 @@
+"""
+Boş veritabanında modellerdeki tabloları oluşturur. Mevcut tablolara dokunmaz.
+"""
+VERSION = 1
+DESCRIPTION = "initial schema"
+
+
+async def upgrade(conn):
+    from database import Base
+    import models  # noqa: F401  (tabloların metadata'ya kaydı için)
+
+    await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn, checkfirst=True))
@@ -0,0 +1,22 @@
+"""
+Eski messages tablosunu snowflake ID'lere (bigint, sekans yok) ve attachment_id kolonuna yükseltir.
+"""
+from sqlalchemy import text
+
+from partitions import is_messages_partitioned
+
+VERSION = 2
+DESCRIPTION = "message snowflake ids and attachments"
+
+
+async def upgrade(conn):
+    await conn.execute(text(
+        "ALTER TABLE messages ADD COLUMN IF NOT EXISTS attachment_id INTEGER "
+        "REFERENCES attachments (id) ON DELETE SET NULL"
+    ))
+    if await is_messages_partitioned(conn):
+        # Tablo güncel modelden oluşturulmuş, ID kolonu zaten uygun
+        return
+    await conn.execute(text("ALTER TABLE messages ALTER COLUMN id DROP DEFAULT"))
+    await conn.execute(text("ALTER TABLE messages ALTER COLUMN id TYPE BIGINT"))
+    await conn.execute(text("DROP SEQUENCE IF EXISTS messages_id_seq"))
@@ -0,0 +1,12 @@
+"""
+messages tablosunu sent_date üzerinden aylık partition'lara dönüştürür.
+"""
+from partitions import convert_messages_table, ensure_message_partitions
+
+VERSION = 3
+DESCRIPTION = "partition messages by month"
+
+
+async def upgrade(conn):
+    await convert_messages_table(conn)
+    await ensure_message_partitions(conn)
@@ -0,0 +1,31 @@
+"""
+main.py ve chat_server.py'deki sık çalışan sorgular için indeksler.
+messages üzerindeki indeksler ana tabloda oluşturulduğu için tüm partition'lara uygulanır.
+"""
+from sqlalchemy import text
+
+VERSION = 4
+DESCRIPTION = "hot path indexes"
+
+INDEXES = [
+    # get_messages_between_users, get_chats: iki yönlü sohbet geçmişi
+    "CREATE INDEX IF NOT EXISTS ix_messages_sender_receiver_sent ON messages (sender_id, receiver_id, sent_date)",
+    "CREATE INDEX IF NOT EXISTS ix_messages_receiver_sender_sent ON messages (receiver_id, sender_id, sent_date)",
+    # get_chats: okunmamış mesaj sayısı
+    "CREATE INDEX IF NOT EXISTS ix_messages_unread ON messages (receiver_id, sender_id) WHERE is_read = false",
+    # get_chats: arkadaş listesi
+    "CREATE INDEX IF NOT EXISTS ix_friends_requestor_id ON friends (requestor_id)",
+    "CREATE INDEX IF NOT EXISTS ix_friends_addressee_id ON friends (addressee_id)",
+    # add_friend: username#tag çözümleme
+    "CREATE INDEX IF NOT EXISTS ix_users_username_user_tag ON users (username, user_tag)",
+    # resend_email: son doğrulama maili kontrolü
+    "CREATE INDEX IF NOT EXISTS ix_validation_email_log_user_type_sent ON validation_email_log (user_id, type, sent_date)",
+    # Arşiv read-through
+    "CREATE INDEX IF NOT EXISTS ix_archive_segments_conversation ON message_archive_segments (user1_id, user2_id, max_id)",
+    "CREATE INDEX IF NOT EXISTS ix_attachments_sha256 ON attachments (sha256)",
+]
+
+
+async def upgrade(conn):
+    for statement in INDEXES:
+        await conn.execute(text(statement))
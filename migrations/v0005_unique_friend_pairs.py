@@ -0,0 +1,22 @@
+"""
+Arkadaşlık çiftlerini yönden bağımsız olarak tekil yapar.
+Önce kendisiyle arkadaşlıklar ve tekrar eden çiftler (en küçük id'li satır kalır) silinir.
+"""
+from sqlalchemy import text
+
+VERSION = 5
+DESCRIPTION = "unique normalized friend pairs"
+
+
+async def upgrade(conn):
+    await conn.execute(text("DELETE FROM friends WHERE requestor_id = addressee_id"))
+    await conn.execute(text(
+        "DELETE FROM friends f USING friends d "
+        "WHERE least(f.requestor_id, f.addressee_id) = least(d.requestor_id, d.addressee_id) "
+        "AND greatest(f.requestor_id, f.addressee_id) = greatest(d.requestor_id, d.addressee_id) "
+        "AND f.id > d.id"
+    ))
+    await conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_friends_pair "
+        "ON friends (least(requestor_id, addressee_id), greatest(requestor_id, addressee_id))"
+    ))
@@ -0,0 +1,13 @@
+"""
+Kullanıcı adı önek araması için indeks.
+"""
+from sqlalchemy import text
+
+VERSION = 6
+DESCRIPTION = "username prefix index"
+
+
+async def upgrade(conn):
+    await conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_users_username_prefix ON users ((lower(username) COLLATE "C"))'
+    ))
@@ -0,0 +1,11 @@
+"""
+client_msg_id ile gönderilen mesajların tekilliği için message_dedup tablosu.
+"""
+VERSION = 7
+DESCRIPTION = "message dedup table"
+
+
+async def upgrade(conn):
+    from models import MessageDedup
+
+    await conn.run_sync(lambda sync_conn: MessageDedup.__table__.create(sync_conn, checkfirst=True))
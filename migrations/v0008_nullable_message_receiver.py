@@ -0,0 +1,12 @@
+"""
+Grup mesajlarının alıcısı olmadığı için messages.receiver_id NULL olabilir.
+"""
+from sqlalchemy import text
+
+VERSION = 8
+DESCRIPTION = "nullable message receiver"
+
+
+async def upgrade(conn):
+    # Bölümlenmiş tablodaki değişiklik partition'lara da uygulanır; zaten NULL olabiliyorsa etkisizdir
+    await conn.execute(text("ALTER TABLE messages ALTER COLUMN receiver_id DROP NOT NULL"))
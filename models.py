@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, DateTime, Boolean, ForeignKey, Index, text, func
 from sqlalchemy.orm import relationship
 from database import Base, Database
+from id_generator import next_id
 from datetime import datetime
 import asyncio
 import pytz
@@ -19,6 +20,10 @@ class User(Base):
     Kullanıcılar için veritabanı tablosunu temsil eden model.
     """
     __tablename__ = 'users'
+    __table_args__ = (
+        # add_friend: username#tag ile kullanıcı arama
+        Index('ix_users_username_user_tag', 'username', 'user_tag'),
+    )
 
     id = Column(Integer, primary_key=True)
     username = Column(String(50), unique=True, nullable=False)
@@ -47,6 +52,10 @@ class ValidationEmailLog(Base):
     Gönderilen doğrulama e-postalarının loglarını tutar.
     """
     __tablename__ = "validation_email_log"
+    __table_args__ = (
+        # resend_email: son iki dakikadaki doğrulama maili kontrolü
+        Index('ix_validation_email_log_user_type_sent', 'user_id', 'type', 'sent_date'),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     is_success = Column(Boolean)
@@ -61,21 +70,91 @@ class Message(Base):
     Kullanıcılar arasındaki mesajları saklamak için veritabanı modeli.
     """
     __tablename__ = 'messages'
-
-    id = Column(Integer, primary_key=True)
+    # sent_date üzerinden aylık bölümlenir, partition'lar partitions.py ile yönetilir.
+    # Ana tabloda tanımlanan indeksler her partition'a otomatik uygulanır.
+    __table_args__ = (
+        Index('ix_messages_sender_receiver_sent', 'sender_id', 'receiver_id', 'sent_date'),
+        Index('ix_messages_receiver_sender_sent', 'receiver_id', 'sender_id', 'sent_date'),
+        # get_chats: okunmamış mesaj sayısı
+        Index('ix_messages_unread', 'receiver_id', 'sender_id', postgresql_where=text('is_read = false')),
+        {'postgresql_partition_by': 'RANGE (sent_date)'},
+    )
+
+    # Sunucuda üretilen, zamana göre sıralı snowflake ID (bkz. id_generator.py)
+    id = Column(BigInteger, primary_key=True, autoincrement=False, default=next_id)
     sender_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
-    receiver_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    # Grup mesajlarında alıcı yoktur (None); mesaj room üyelerine dağıtılır
+    receiver_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=True)
     content = Column(String, nullable=False)
-    sent_date = Column(DateTime(timezone=True), default=lambda: get_current_utc_time())
+    # Partition anahtarı olduğu için birincil anahtara dahildir
+    sent_date = Column(DateTime(timezone=True), primary_key=True, nullable=False, default=lambda: get_current_utc_time())
     is_read = Column(Boolean, default=False)
+    # Mesaja eklenmiş medya (yoksa None)
+    attachment_id = Column(Integer, ForeignKey('attachments.id', ondelete='SET NULL'), nullable=True)
     
     # Mesajı gönderen kullanıcıya referans
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
     # Mesajı alan kullanıcıya referans
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_messages")
 
+class MessageArchiveSegment(Base):
+    """
+    Soğuk depoya taşınmış mesaj segmentlerinin dizini.
+    Her segment, bir sohbetin (user1_id < user2_id) bir aylık mesajlarını içeren sıkıştırılmış JSONL dosyasıdır.
+    """
+    __tablename__ = 'message_archive_segments'
+    __table_args__ = (
+        Index('ix_archive_segments_conversation', 'user1_id', 'user2_id', 'max_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user1_id = Column(Integer, nullable=False)
+    user2_id = Column(Integer, nullable=False)
+    min_id = Column(BigInteger, nullable=False)
+    max_id = Column(BigInteger, nullable=False)
+    min_sent_date = Column(DateTime(timezone=True), nullable=False)
+    max_sent_date = Column(DateTime(timezone=True), nullable=False)
+    message_count = Column(Integer, nullable=False)
+    path = Column(String, nullable=False)
+    created_date = Column(DateTime(timezone=True), default=lambda: get_current_utc_time())
+
+class MessageDedup(Base):
+    """
+    İstemcinin ürettiği client_msg_id ile gönderilen mesajların kaydı. Tekrar gönderilen
+    mesajların ikinci kez kaydedilmesini veritabanı seviyesinde engeller (Redis'teki
+    kontrolün yedeği). messages bölümlenmiş olduğu için tekillik ayrı tabloda tutulur.
+    """
+    __tablename__ = 'message_dedup'
+    __table_args__ = (
+        Index('ix_message_dedup_created_date', 'created_date'),
+    )
+
+    sender_id = Column(Integer, primary_key=True)
+    client_msg_id = Column(String(64), primary_key=True)
+    message_id = Column(BigInteger, nullable=False)
+    created_date = Column(DateTime(timezone=True), nullable=False, default=lambda: get_current_utc_time())
+
+class Attachment(Base):
+    """
+    Yüklenen medya dosyaları. İçerik, sha256 özetiyle adreslenen depoda tutulur;
+    aynı içerik birden fazla kayıt tarafından paylaşılabilir.
+    """
+    __tablename__ = 'attachments'
+
+    id = Column(Integer, primary_key=True)
+    uploader_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    sha256 = Column(String(64), nullable=False, index=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(100), nullable=False)
+    filename = Column(String(255), nullable=False)
+    created_date = Column(DateTime(timezone=True), default=lambda: get_current_utc_time())
+
 class Friends(Base):
     __tablename__ = 'friends'
+    __table_args__ = (
+        Index('ix_friends_requestor_id', 'requestor_id'),
+        Index('ix_friends_addressee_id', 'addressee_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     # İstek gönderen kullanıcı
@@ -87,6 +166,18 @@ class Friends(Base):
     requestor = relationship("User", foreign_keys=[requestor_id])
     addressee = relationship("User", foreign_keys=[addressee_id])
 
+# Kullanıcı arama: büyük/küçük harf duyarsız önek aramaları için bayt sıralı (C collation) indeks.
+# LIKE yerine aralık sorgusu kullanıldığından prepared statement'ların genel planında da kullanılır.
+Index('ix_users_username_prefix', func.lower(User.username).collate('C'))
+
+# Arkadaşlık yönsüzdür: (a, b) ve (b, a) aynı çift sayılır ve yalnızca bir kez eklenebilir
+Index(
+    'uq_friends_pair',
+    func.least(Friends.requestor_id, Friends.addressee_id),
+    func.greatest(Friends.requestor_id, Friends.addressee_id),
+    unique=True
+)
+
 # db = Database()
 # async def main():
 #     await db.init_db()
@@ -0,0 +1,239 @@
+"""
+Çevrimdışı kullanıcılar için kalıcı olay kutusu (outbox).
+
+Alıcı bağlı değilse olay iki yere yazılır:
+    outbox:{user_id}          Kullanıcının kutusu. Kullanıcı bağlandığında OUTBOX_DRAIN_BATCH'lik
+                              partiler halinde gönderilir; bağlantıya yazılan olaylar silinir. En fazla OUTBOX_MAX_LEN olay
+                              tutulur (MAXLEN ~), daha eskiler düşer; istemci geçmişi yeniden yükler.
+    notifications:{shard}     Bildirim işçilerinin (push bildirimi yerine) tükettiği paylaşımlı
+                              stream'ler. Consumer group ile okunur, başarılı işlenen olay XACK
+                              ile onaylanır. NOTIFICATION_RETRY_IDLE_MS boyunca onaylanmayan olaylar
+                              başka işçi tarafından tekrar alınır; NOTIFICATION_MAX_DELIVERIES
+                              denemeden sonra notifications:dead stream'ine taşınır.
+
+Teslimat en az bir kezdir (at-least-once); istemciler olayları message_id ile tekilleştirir.
+
+Kullanım:
+    python outbox.py worker [isim]
+"""
+import asyncio
+import importlib
+import json
+import logging
+import os
+import socket
+import sys
+from typing import Awaitable, Callable, List, Optional
+
+from dotenv import load_dotenv
+from redis.exceptions import ResponseError
+
+import metrics
+from metrics import REDIS_ROUNDTRIP_SECONDS
+
+load_dotenv()
+
+OUTBOX_MAX_LEN = int(os.getenv("OUTBOX_MAX_LEN", 1000))
+OUTBOX_DRAIN_BATCH = int(os.getenv("OUTBOX_DRAIN_BATCH", 100))
+NOTIFICATION_SHARDS = int(os.getenv("NOTIFICATION_SHARDS", 4))
+NOTIFICATION_STREAM_MAX_LEN = int(os.getenv("NOTIFICATION_STREAM_MAX_LEN", 100000))
+NOTIFICATION_GROUP = os.getenv("NOTIFICATION_GROUP", "notifiers")
+NOTIFICATION_BATCH = int(os.getenv("NOTIFICATION_BATCH", 100))
+NOTIFICATION_BLOCK_MS = int(os.getenv("NOTIFICATION_BLOCK_MS", 5000))
+NOTIFICATION_RETRY_IDLE_MS = int(os.getenv("NOTIFICATION_RETRY_IDLE_MS", 60000))
+NOTIFICATION_MAX_DELIVERIES = int(os.getenv("NOTIFICATION_MAX_DELIVERIES", 5))
+# "modul:fonksiyon" biçiminde async bildirim fonksiyonu; verilmezse olaylar loglanır
+NOTIFICATION_HANDLER = os.getenv("NOTIFICATION_HANDLER")
+
+DEAD_LETTER_STREAM = "notifications:dead"
+
+OUTBOX_EVENTS_TOTAL = metrics.counter("outbox_events_total", "Çevrimdışı kullanıcılar için kutuya yazılan olay sayısı.")
+OUTBOX_DRAINED_TOTAL = metrics.counter("outbox_drained_events_total", "Bağlanan kullanıcılara kutudan gönderilen olay sayısı.")
+NOTIFICATIONS_TOTAL = metrics.counter(
+    "notifications_processed_total",
+    "Bildirim işçilerinin işlediği olay sayısı.",
+    ("result",)
+)
+
+logger = logging.getLogger(__name__)
+
+NotificationHandler = Callable[[int, dict], Awaitable[None]]
+
+
+def outbox_key(user_id: int) -> str:
+    return f"outbox:{user_id}"
+
+
+def notification_stream(user_id: int) -> str:
+    return f"notifications:{user_id % NOTIFICATION_SHARDS}"
+
+
+class Outbox:
+    def __init__(self, redis_handler):
+        self.redis = redis_handler.redis
+
+    async def append(self, user_id: int, message_json: str):
+        """
+        Olayı kullanıcının kutusuna ve bildirim stream'ine tek gidiş-dönüşte yazar.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xadd(outbox_key(user_id), {"event": message_json}, maxlen=OUTBOX_MAX_LEN, approximate=True)
+            pipe.xadd(
+                notification_stream(user_id),
+                {"user_id": user_id, "event": message_json},
+                maxlen=NOTIFICATION_STREAM_MAX_LEN,
+                approximate=True
+            )
+            with REDIS_ROUNDTRIP_SECONDS.time("outbox_append"):
+                await pipe.execute()
+        OUTBOX_EVENTS_TOTAL.inc()
+
+    async def drain(self, user_id: int, write: Callable[[List[str]], Awaitable[int]], batch: int = OUTBOX_DRAIN_BATCH) -> int:
+        """
+        Kutudaki olayları, çağrı anındaki son olaya kadar eskiden yeniye partiler halinde write
+        ile gönderir. write bağlantıya yazılan olay sayısını döndürür; yalnızca yazılanlar
+        silinir, geri kalanlar (bağlantı koptu) kutuda bırakılır. Çağrıdan sonra eklenen
+        olaylar bu çağrıda gönderilmez.
+        """
+        key = outbox_key(user_id)
+        drained = 0
+        with REDIS_ROUNDTRIP_SECONDS.time("xrevrange"):
+            last = await self.redis.xrevrange(key, count=1)
+        if not last:
+            return 0
+        end = last[0][0]
+        while True:
+            with REDIS_ROUNDTRIP_SECONDS.time("xrange"):
+                entries = await self.redis.xrange(key, max=end, count=batch)
+            if not entries:
+                return drained
+
+            written = await write([fields[b"event"].decode("utf-8") for _, fields in entries])
+            sent_ids = [entry_id for entry_id, _ in entries[:written]]
+
+            if sent_ids:
+                with REDIS_ROUNDTRIP_SECONDS.time("xdel"):
+                    await self.redis.xdel(key, *sent_ids)
+                drained += len(sent_ids)
+                OUTBOX_DRAINED_TOTAL.inc(amount=len(sent_ids))
+            if len(sent_ids) < len(entries):
+                return drained
+
+
+async def log_notification(user_id: int, event: dict):
+    """
+    Varsayılan bildirim işleyicisi; gerçek push servisi bağlanana kadar olayı loglar.
+    """
+    logger.info("Push bildirimi.", extra={"user_id": user_id, "type": event.get("type"), "message_id": event.get("message_id")})
+
+
+def load_handler(path: Optional[str] = NOTIFICATION_HANDLER) -> NotificationHandler:
+    if not path:
+        return log_notification
+    module_name, _, function_name = path.partition(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+class NotificationWorker:
+    """
+    Bildirim stream'lerini consumer group ile tüketir. Aynı gruptaki işçiler olayları paylaşır.
+    """
+
+    def __init__(self, redis_handler, handler: NotificationHandler = None, consumer: str = None):
+        self.redis = redis_handler.redis
+        self.handler = handler or load_handler()
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.streams = [f"notifications:{shard}" for shard in range(NOTIFICATION_SHARDS)]
+
+    async def ensure_groups(self):
+        for stream in self.streams:
+            try:
+                await self.redis.xgroup_create(stream, NOTIFICATION_GROUP, id="0", mkstream=True)
+            except ResponseError as e:
+                # BUSYGROUP: grup zaten var
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    async def process(self, stream: str, entries: List) -> int:
+        """
+        Olayları işler; başarılı olanları onaylar. Başarısız olanlar pending listesinde kalır ve tekrar denenir.
+        """
+        acked = []
+        for entry_id, fields in entries:
+            if not fields:
+                # Stream kırpılırken silinmiş olay
+                acked.append(entry_id)
+                continue
+            try:
+                await self.handler(int(fields[b"user_id"]), json.loads(fields[b"event"]))
+                acked.append(entry_id)
+                NOTIFICATIONS_TOTAL.inc("ok")
+            except Exception as e:
+                NOTIFICATIONS_TOTAL.inc("error")
+                logger.warning("Bildirim işlenemedi.", extra={"stream": stream, "entry_id": entry_id.decode(), "error": str(e)})
+        if acked:
+            await self.redis.xack(stream, NOTIFICATION_GROUP, *acked)
+        return len(acked)
+
+    async def retry_pending(self):
+        """
+        NOTIFICATION_RETRY_IDLE_MS'den uzun süredir onaylanmamış olayları bu işçiye alır ve yeniden işler.
+        Çok kez denenmiş olaylar dead-letter stream'ine taşınır.
+        """
+        for stream in self.streams:
+            pending = await self.redis.xpending_range(
+                stream, NOTIFICATION_GROUP, min="-", max="+", count=NOTIFICATION_BATCH, idle=NOTIFICATION_RETRY_IDLE_MS
+            )
+            if not pending:
+                continue
+
+            dead_ids = [entry["message_id"] for entry in pending if entry["times_delivered"] >= NOTIFICATION_MAX_DELIVERIES]
+            retry_ids = [entry["message_id"] for entry in pending if entry["times_delivered"] < NOTIFICATION_MAX_DELIVERIES]
+
+            if dead_ids:
+                for entry_id, fields in await self.redis.xclaim(stream, NOTIFICATION_GROUP, self.consumer, NOTIFICATION_RETRY_IDLE_MS, dead_ids):
+                    if fields:
+                        await self.redis.xadd(DEAD_LETTER_STREAM, fields, maxlen=NOTIFICATION_STREAM_MAX_LEN, approximate=True)
+                    await self.redis.xack(stream, NOTIFICATION_GROUP, entry_id)
+                    NOTIFICATIONS_TOTAL.inc("dead_letter")
+
+            if retry_ids:
+                claimed = await self.redis.xclaim(stream, NOTIFICATION_GROUP, self.consumer, NOTIFICATION_RETRY_IDLE_MS, retry_ids)
+                await self.process(stream, claimed)
+
+    async def run(self):
+        await self.ensure_groups()
+        logger.info("Bildirim işçisi başladı.", extra={"consumer": self.consumer, "streams": self.streams})
+        loop = asyncio.get_running_loop()
+        next_retry = loop.time()
+        while True:
+            if loop.time() >= next_retry:
+                await self.retry_pending()
+                next_retry = loop.time() + NOTIFICATION_RETRY_IDLE_MS / 1000
+
+            response = await self.redis.xreadgroup(
+                NOTIFICATION_GROUP, self.consumer, {stream: ">" for stream in self.streams},
+                count=NOTIFICATION_BATCH, block=NOTIFICATION_BLOCK_MS
+            )
+            for stream, entries in response or []:
+                await self.process(stream.decode(), entries)
+
+
+async def async_main(command: str, consumer: str = None):
+    from redis_handler import RedisHandler
+
+    redis_handler = RedisHandler()
+    try:
+        if command == "worker":
+            await NotificationWorker(redis_handler, consumer=consumer).run()
+        else:
+            print(__doc__)
+    finally:
+        await redis_handler.close()
+
+
+if __name__ == "__main__":
+    from log_handler import setup_logging
+
+    setup_logging()
+    asyncio.run(async_main(sys.argv[1] if len(sys.argv) > 1 else "", sys.argv[2] if len(sys.argv) > 2 else None))
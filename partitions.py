@@ -0,0 +1,161 @@
+"""
+messages tablosu için aylık range partition yönetimi.
+
+messages tablosu sent_date üzerinden aylık bölümlenir (messages_YYYY_MM). İndeksler
+ana tabloda tanımlı olduğu için Postgres her partition'a otomatik olarak uygular.
+
+Kullanım:
+    python partitions.py convert    # Mevcut bölümlenmemiş tabloyu dönüştürür (migration 0003 de bunu yapar)
+    python partitions.py ensure     # Eksik partition'ları oluşturur
+"""
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+load_dotenv()
+
+# Kaç ay ilerisi için partition hazır tutulur
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", 3))
+# Bakım görevinin çalışma aralığı
+PARTITION_MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("PARTITION_MAINTENANCE_INTERVAL_SECONDS", 60 * 60 * 6))
+# Sohbet listesinde son mesajı ve okunmamış sayısını hesaplarken bakılan süre; bu sürede
+# mesajlaşılmamış arkadaşların son mesajı ayrıca, zaman sınırı olmadan aranır
+CHAT_LIST_WINDOW_DAYS = int(os.getenv("CHAT_LIST_WINDOW_DAYS", 365))
+
+logger = logging.getLogger(__name__)
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    month_index = moment.year * 12 + (moment.month - 1) + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(start: datetime) -> str:
+    return f"messages_{start.year:04d}_{start.month:02d}"
+
+
+async def create_month_partition(conn: AsyncConnection, start: datetime):
+    """
+    start ayı için partition yoksa oluşturur.
+    """
+    end = add_months(start, 1)
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF messages "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+
+async def ensure_message_partitions(conn: AsyncConnection, since: datetime = None, months_ahead: int = PARTITION_MONTHS_AHEAD):
+    """
+    since ayından (verilmezse bu aydan) itibaren months_ahead ay sonrasına kadar
+    tüm partition'ların var olmasını sağlar.
+    """
+    now = datetime.now(timezone.utc)
+    current = month_start(since or now)
+    last = add_months(month_start(now), months_ahead)
+    while current <= last:
+        await create_month_partition(conn, current)
+        current = add_months(current, 1)
+
+
+async def oldest_partition_start(conn: AsyncConnection):
+    """
+    En eski partition'ın başlangıç ayını döndürür. Bölümlenmemiş tabloda None döner.
+    """
+    result = await conn.execute(text(
+        "SELECT min(c.relname) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'messages'"
+    ))
+    name = result.scalar()
+    if not name:
+        return None
+    _, year, month = name.split("_")
+    return datetime(int(year), int(month), 1, tzinfo=timezone.utc)
+
+
+async def run_partition_maintenance(db):
+    """
+    Uygulama açıkken gelecek ayların partition'larını periyodik olarak oluşturur. Hem REST
+    API hem bağımsız sohbet sunucusu çalıştırır; mesaj yazan her süreç ayın partition'ının
+    varlığından kendisi sorumludur.
+    Birden fazla süreç aynı anda çalıştırırsa oluşabilecek çakışma hataları yok sayılır.
+    """
+    while True:
+        try:
+            async with db.engine.begin() as conn:
+                await ensure_message_partitions(conn)
+        except Exception as e:
+            logger.warning("Partition bakımı başarısız.", extra={"error": str(e)})
+        await asyncio.sleep(PARTITION_MAINTENANCE_INTERVAL_SECONDS)
+
+
+async def is_messages_partitioned(conn: AsyncConnection) -> bool:
+    result = await conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'messages')"
+    ))
+    return bool(result.scalar())
+
+
+async def convert_messages_table(conn: AsyncConnection):
+    """
+    Bölümlenmemiş messages tablosunu, çağıranın transaction'ı içinde bölümlenmiş tabloya dönüştürür.
+    Eski satırlar kopyalanır, id kolonu bigint'e çevrilir ve eski tablo silinir.
+    """
+    from models import Message
+
+    if await is_messages_partitioned(conn):
+        logger.info("messages tablosu zaten bölümlenmiş.")
+        return
+
+    await conn.execute(text("ALTER TABLE messages RENAME TO messages_unpartitioned"))
+    await conn.execute(text("ALTER INDEX messages_pkey RENAME TO messages_unpartitioned_pkey"))
+
+    await conn.run_sync(lambda sync_conn: Message.__table__.create(sync_conn))
+
+    oldest = (await conn.execute(text("SELECT min(sent_date) FROM messages_unpartitioned"))).scalar()
+    await ensure_message_partitions(conn, since=oldest)
+
+    await conn.execute(text(
+        "INSERT INTO messages (id, sender_id, receiver_id, content, sent_date, is_read, attachment_id) "
+        "SELECT id, sender_id, receiver_id, content, COALESCE(sent_date, now()), is_read, attachment_id "
+        "FROM messages_unpartitioned"
+    ))
+    await conn.execute(text("DROP TABLE messages_unpartitioned"))
+    logger.info("messages tablosu aylık partition'lara dönüştürüldü.")
+
+
+async def async_main(command: str):
+    from database import Database
+
+    db = Database()
+    try:
+        if command == "convert":
+            async with db.engine.begin() as conn:
+                await convert_messages_table(conn)
+        elif command == "ensure":
+            async with db.engine.begin() as conn:
+                await ensure_message_partitions(conn)
+        else:
+            print(__doc__)
+    finally:
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    from log_handler import setup_logging
+
+    setup_logging()
+    asyncio.run(async_main(sys.argv[1] if len(sys.argv) > 1 else ""))
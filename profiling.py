@@ -0,0 +1,251 @@
+"""
+Çalışma anında açılıp kapatılabilen profil toplama.
+
+Açıkken:
+    - REST isteklerinin ve WebSocket action'larının PROFILING_SAMPLE_RATE oranı cProfile ile
+      profillenir ve PROFILING_DIR altına pstats dosyası olarak yazılır
+      (python -m pstats <dosya> veya snakeviz ile açılabilir). cProfile iş parçacığı
+      bazında çalıştığı için aynı anda tek bir çağrı profillenir; dosya, çağrı beklerken
+      olay döngüsünde çalışan diğer işleri de içerir.
+    - PROFILING_SLOW_SECONDS'ı aşan çağrıların o anki await zinciri slow_calls.jsonl
+      dosyasına yazılır. Room actor'lerinde çalışan işler (room_actors.py) ayrıca "actor"
+      kaynağıyla izlenir; action'ın dökümü actor'e gönderilen işi beklediği yerde durur.
+    - Olay döngüsü PROFILING_LOOP_BLOCK_SECONDS'tan uzun bloklanırsa bir izleyici thread
+      ana thread'in yığınını aynı dosyaya yazar.
+
+Olay döngüsü gecikmesi profil kapalıyken de event_loop_lag_seconds metriğine yazılır.
+
+Açma/kapama:
+    - SIGUSR1 sinyali durumu tersine çevirir: kill -USR1 <pid>
+    - REST API: POST /admin/profiling (X-Admin-Token: PROFILING_ADMIN_TOKEN)
+"""
+import asyncio
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+import traceback
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Union
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0.01))
+PROFILING_SLOW_SECONDS = float(os.getenv("PROFILING_SLOW_SECONDS", 1))
+PROFILING_LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("PROFILING_LOOP_LAG_INTERVAL_SECONDS", 0.5))
+PROFILING_LOOP_BLOCK_SECONDS = float(os.getenv("PROFILING_LOOP_BLOCK_SECONDS", 0.25))
+# Tanımlı değilse /admin/profiling kapalıdır
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")
+
+SLOW_CALLS_FILE = "slow_calls.jsonl"
+
+EVENT_LOOP_LAG_SECONDS = metrics.histogram(
+    "event_loop_lag_seconds",
+    "Olay döngüsünde zamanlanmış bir işin gecikme süresi.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+PROFILES_WRITTEN_TOTAL = metrics.counter(
+    "profiles_written_total",
+    "Diske yazılan profil ve yığın dökümü sayısı.",
+    ("kind",)
+)
+
+logger = logging.getLogger(__name__)
+
+Name = Union[str, Callable[[], str]]
+
+
+def _file_safe(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_")[:80] or "unknown"
+
+
+def await_chain(task: asyncio.Task) -> List[str]:
+    """
+    Askıdaki task'ın await zinciri. Task.get_stack askıdaki coroutine için yalnızca en dış
+    frame'i döndürdüğü için zincir cr_await üzerinden izlenir.
+    """
+    frames = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append((frame, frame.f_lineno))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return traceback.StackSummary.extract(frames).format()
+
+
+class Profiler:
+    def __init__(self, enabled: bool = PROFILING_ENABLED, sample_rate: float = PROFILING_SAMPLE_RATE,
+                 slow_seconds: float = PROFILING_SLOW_SECONDS, directory: str = PROFILING_DIR):
+        self.enabled = False
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.directory = directory
+        # Aynı anda tek cProfile çalışabilir
+        self._profiling = False
+        self._heartbeat = time.monotonic()
+        self._monitoring = False
+        self._lag_interval = PROFILING_LOOP_LAG_INTERVAL_SECONDS
+        self._watchdog = None
+        self._main_thread_id = threading.main_thread().ident
+        if enabled:
+            self.set(True)
+
+        metrics.gauge("profiling_enabled", "Profil toplama açıksa 1.").set_function(lambda: int(self.enabled))
+
+    def set(self, enabled: bool, sample_rate: Optional[float] = None, slow_seconds: Optional[float] = None):
+        if sample_rate is not None:
+            self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        if slow_seconds is not None:
+            self.slow_seconds = slow_seconds
+        self.enabled = enabled
+        if enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            self._start_watchdog()
+        logger.info("Profil toplama durumu değişti.", extra=self.status())
+
+    def toggle(self):
+        self.set(not self.enabled)
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "slow_seconds": self.slow_seconds,
+            "directory": os.path.abspath(self.directory),
+        }
+
+    def install_signal_handler(self):
+        """
+        SIGUSR1 ile açma/kapama. Çalışan olay döngüsü içinden çağrılmalıdır.
+        """
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, self.toggle)
+        except (NotImplementedError, AttributeError, RuntimeError):
+            # Windows'ta veya ana thread dışında sinyal işleyici kurulamaz
+            logger.warning("SIGUSR1 işleyicisi kurulamadı; profil yalnızca REST API ile açılabilir.")
+
+    @asynccontextmanager
+    async def profile(self, kind: str, name: Name):
+        """
+        kind: "http", "ws" veya "actor"; name route şablonu, action adı veya room/iş adı. Çağrı sonunda
+        çözülebilmesi için fonksiyon da verilebilir.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        slow_handle = loop.call_later(self.slow_seconds, self._dump_slow_call, kind, name, asyncio.current_task(), start)
+
+        profile = None
+        if not self._profiling and random.random() < self.sample_rate:
+            self._profiling = True
+            profile = cProfile.Profile()
+            profile.enable()
+        try:
+            yield
+        finally:
+            slow_handle.cancel()
+            if profile is not None:
+                profile.disable()
+                self._profiling = False
+                elapsed_ms = int((time.perf_counter() - start) * 1000)
+                path = os.path.join(
+                    self.directory,
+                    f"{kind}-{_file_safe(self._resolve(name))}-{int(time.time() * 1000)}-{elapsed_ms}ms.pstats"
+                )
+                try:
+                    await asyncio.to_thread(profile.dump_stats, path)
+                    PROFILES_WRITTEN_TOTAL.inc("pstats")
+                except OSError as e:
+                    logger.warning("Profil dosyası yazılamadı.", extra={"path": path, "error": str(e)})
+
+    def _resolve(self, name: Name) -> str:
+        return name() if callable(name) else name
+
+    def _write_stack(self, record: dict):
+        record["ts"] = datetime.now(timezone.utc).isoformat()
+        try:
+            with open(os.path.join(self.directory, SLOW_CALLS_FILE), "a", encoding="utf-8") as file:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            PROFILES_WRITTEN_TOTAL.inc(record["kind"])
+        except OSError as e:
+            logger.warning("Yığın dökümü yazılamadı.", extra={"error": str(e)})
+
+    def _dump_slow_call(self, kind: str, name: Name, task: Optional[asyncio.Task], start: float):
+        """
+        Eşiği aşan çağrının beklediği yeri (await zinciri) yazar.
+        """
+        stack = []
+        if task is not None and not task.done():
+            stack = await_chain(task)
+        self._write_stack({
+            "kind": "slow_call",
+            "source": kind,
+            "name": self._resolve(name),
+            "elapsed_seconds": round(time.perf_counter() - start, 3),
+            "stack": stack,
+        })
+
+    async def run_loop_lag_monitor(self, interval: float = PROFILING_LOOP_LAG_INTERVAL_SECONDS):
+        """
+        Periyodik olarak uyuyup uyanma gecikmesini ölçer; izleyici thread için nabız da günceller.
+        """
+        loop = asyncio.get_running_loop()
+        self._lag_interval = interval
+        self._monitoring = True
+        while True:
+            self._heartbeat = time.monotonic()
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            EVENT_LOOP_LAG_SECONDS.observe(max(loop.time() - expected, 0))
+
+    def _start_watchdog(self):
+        if self._watchdog is not None and self._watchdog.is_alive():
+            return
+        self._watchdog = threading.Thread(target=self._watch_loop, name="loop-block-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def _watch_loop(self):
+        """
+        Olay döngüsü nabzı PROFILING_LOOP_BLOCK_SECONDS'tan uzun süre güncellenmezse ana
+        thread'in yığınını yazar. Her bloklanma için bir döküm alınır.
+        """
+        dumped_heartbeat = None
+        while self.enabled:
+            time.sleep(PROFILING_LOOP_BLOCK_SECONDS / 2)
+            if not self._monitoring:
+                # Nabzı güncelleyen görev henüz başlamadı
+                continue
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self._lag_interval
+            if blocked < PROFILING_LOOP_BLOCK_SECONDS or heartbeat == dumped_heartbeat:
+                continue
+            frame = sys._current_frames().get(self._main_thread_id)
+            if frame is None:
+                continue
+            dumped_heartbeat = heartbeat
+            self._write_stack({
+                "kind": "loop_block",
+                "blocked_seconds": round(blocked, 3),
+                "stack": traceback.format_stack(frame),
+            })
+
+
+profiler = Profiler()
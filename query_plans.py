@@ -0,0 +1,125 @@
+"""
+Sık çalışan sorguların plan regresyon kontrolü.
+
+Her sorgu için EXPLAIN (FORMAT JSON) çalıştırılır; plan, satır sayısı LARGE_TABLE_ROWS'tan
+büyük bir tabloda (veya partition'da) Seq Scan içeriyorsa kontrol başarısız olur ve
+süreç 1 koduyla çıkar. Önce veritabanı migration'larla güncellenmeli ve deneme.py ile
+yeterli büyüklükte veriyle doldurulmalıdır.
+
+Kullanım:
+    python query_plans.py [--analyze]
+"""
+import asyncio
+import json
+import os
+import sys
+from datetime import timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import or_, text
+from sqlalchemy.future import select
+
+import statements
+from user_search import prefix_bounds
+from partitions import CHAT_LIST_WINDOW_DAYS
+from models import Friends, MessageArchiveSegment, User, ValidationEmailLog
+from utils import get_current_utc_time
+
+load_dotenv()
+
+LARGE_TABLE_ROWS = int(os.getenv("LARGE_TABLE_ROWS", 10000))
+
+
+def hot_queries(user_id: int, other_id: int, username: str, user_tag: str, email: str):
+    """
+    main.py ve chat_server.py'deki sık sorguların örnek parametrelerle kurulmuş halleri.
+    """
+    now = get_current_utc_time()
+    window_start = now - timedelta(days=CHAT_LIST_WINDOW_DAYS)
+
+    return {
+        "user_by_id": statements.user_by_id(user_id),
+        "user_by_email": statements.user_by_email(email),
+        "user_by_handle": statements.user_by_handle(username, user_tag),
+        "user_search_prefix": statements.users_by_prefix(*prefix_bounds(username[:2].lower()), 10),
+        "recent_validation_email": select(ValidationEmailLog).where(
+            ValidationEmailLog.user_id == user_id,
+            ValidationEmailLog.sent_date >= now - timedelta(minutes=2),
+            ValidationEmailLog.type == "Validation"
+        ),
+        "history_page": statements.conversation_page(user_id, other_id, now, now - timedelta(days=30), limit=50),
+        "chat_list_latest": statements.chat_list_latest(user_id, window_start),
+        "chat_list_unread": statements.chat_list_unread(user_id, [other_id]),
+        "chat_list_older": statements.chat_list_older(user_id, [other_id]),
+        "friend_graph_load": select(Friends.requestor_id, Friends.addressee_id).where(
+            or_(Friends.requestor_id.in_([user_id]), Friends.addressee_id.in_([user_id]))
+        ),
+        "archive_segments": select(MessageArchiveSegment.path).where(
+            MessageArchiveSegment.user1_id == min(user_id, other_id),
+            MessageArchiveSegment.user2_id == max(user_id, other_id)
+        ).order_by(MessageArchiveSegment.max_id.desc()),
+    }
+
+
+def find_seq_scans(plan: dict):
+    """
+    Plan ağacındaki Seq Scan düğümlerinin tablo isimlerini döndürür.
+    """
+    relations = []
+    if plan.get("Node Type") == "Seq Scan":
+        relations.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        relations.extend(find_seq_scans(child))
+    return relations
+
+
+async def explain(conn, stmt) -> dict:
+    # IN listeleri (expanding parametreler) ayrı parametrelere açılır
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + compiled.string, params)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+async def check_plans(db, analyze: bool = False) -> list:
+    """
+    Her sorgunun planını kontrol eder, büyük tablolarda Seq Scan yapan sorguları döndürür.
+    """
+    failures = []
+    async with db.engine.connect() as conn:
+        if analyze:
+            await conn.execute(text("ANALYZE"))
+
+        sample = (await conn.execute(select(User.id, User.username, User.user_tag, User.email).order_by(User.id).limit(2))).all()
+        if len(sample) < 2:
+            raise RuntimeError("Plan kontrolü için en az iki kullanıcı gerekli; önce veritabanını doldurun.")
+        (user_id, username, user_tag, email), (other_id, *_) = sample
+
+        row_counts = dict((await conn.execute(text("SELECT relname, reltuples FROM pg_class WHERE relkind IN ('r', 'p')"))).all())
+
+        for name, stmt in hot_queries(user_id, other_id, username, user_tag, email).items():
+            plan = await explain(conn, stmt)
+            large_scans = [relation for relation in find_seq_scans(plan) if row_counts.get(relation, 0) > LARGE_TABLE_ROWS]
+            status = "FAIL" if large_scans else "ok"
+            print(f"[{status}] {name}" + (f" -> Seq Scan: {', '.join(large_scans)}" if large_scans else ""))
+            if large_scans:
+                failures.append((name, large_scans))
+    return failures
+
+
+async def async_main(analyze: bool) -> int:
+    from database import Database
+
+    db = Database()
+    try:
+        failures = await check_plans(db, analyze=analyze)
+    finally:
+        await db.engine.dispose()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(async_main("--analyze" in sys.argv)))
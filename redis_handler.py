@@ -1,8 +1,11 @@
+import asyncio
 import redis.asyncio as redis
 from typing import Optional
 from dotenv import load_dotenv
 import os
 
+from metrics import REDIS_ROUNDTRIP_SECONDS
+
 load_dotenv()
 
 class RedisHandler:
@@ -10,9 +13,16 @@ class RedisHandler:
         self.redis_url = os.getenv("REDIS_URL")
         self.redis = redis.from_url(self.redis_url)
 
-    async def connect(self):
-        # redis-py async client otomatik bağlanıyor, genelde gerekmez
-        pass
+    async def connect(self, connections: int = 1):
+        """
+        Havuzda connections adet bağlantıyı önceden açar; eşzamanlı PING'lerin her biri
+        ayrı bir bağlantı kullanır. Böylece bağlantı kurulum maliyeti ilk isteklere kalmaz.
+        """
+        await asyncio.gather(*(self.ping() for _ in range(connections)))
+
+    async def ping(self) -> bool:
+        with REDIS_ROUNDTRIP_SECONDS.time("ping"):
+            return await self.redis.ping()
 
     async def close(self):
         await self.redis.close()
@@ -24,7 +34,8 @@ class RedisHandler:
         :param value: Değer (string olarak)
         :param expire_seconds: Kaç saniye sonra silineceği (TTL). None ise süresiz.
         """
-        await self.redis.set(key, value, ex=expire_seconds)
+        with REDIS_ROUNDTRIP_SECONDS.time("set"):
+            await self.redis.set(key, value, ex=expire_seconds)
 
     async def get(self, key: str) -> Optional[str]:
         """
@@ -32,7 +43,8 @@ class RedisHandler:
         :param key: Anahtar
         :return: Değer veya None
         """
-        value = await self.redis.get(key)
+        with REDIS_ROUNDTRIP_SECONDS.time("get"):
+            value = await self.redis.get(key)
         if value is not None:
             return value.decode('utf-8')
         return None
@@ -43,5 +55,6 @@ class RedisHandler:
         :param key: Silinecek anahtar
         :return: Silinen anahtar sayısı (0 veya 1)
         """
-        result = await self.redis.delete(key)
+        with REDIS_ROUNDTRIP_SECONDS.time("delete"):
+            result = await self.redis.delete(key)
         return result
@@ -0,0 +1,142 @@
+"""
+Room bazlı sıralı yürütücüler (actor).
+
+Aynı room'a farklı bağlantılardan gelen mesajların kaydı ve dağıtımı araya girerse
+alıcılar mesajları farklı sırada görebilir. Her aktif room için bir görev (actor) ve
+ROOM_INBOX_SIZE uzunluğunda bir gelen kutusu tutulur; room'daki kayıt ve dağıtım işleri
+bu görevde sırayla çalışır. Farklı room'ların actor'leri birbirini beklemez.
+
+    - Gelen kutusu doluysa gönderen ROOM_INBOX_TIMEOUT_SECONDS kadar bekler, yer açılmazsa
+      RoomBusy fırlatılır ve istemciye retry ile hata döner.
+    - ROOM_ACTOR_IDLE_SECONDS boyunca iş almayan actor kendini kapatır; room'a yeni iş
+      geldiğinde yeniden oluşturulur.
+    - İşler actor görevinde profiler.profile("actor", ...) içinde çalışır; yavaş çağrı dökümü
+      submit'i bekleyen bağlantının değil, işi yürüten actor'ün await zincirini gösterir.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict
+
+from dotenv import load_dotenv
+
+import metrics
+from profiling import profiler
+
+load_dotenv()
+
+ROOM_INBOX_SIZE = int(os.getenv("ROOM_INBOX_SIZE", 256))
+ROOM_INBOX_TIMEOUT_SECONDS = float(os.getenv("ROOM_INBOX_TIMEOUT_SECONDS", 2))
+ROOM_ACTOR_IDLE_SECONDS = float(os.getenv("ROOM_ACTOR_IDLE_SECONDS", 60))
+
+ROOM_ACTOR_REJECTED_TOTAL = metrics.counter("room_actor_rejected_total", "Gelen kutusu dolu olduğu için reddedilen iş sayısı.")
+ROOM_ACTOR_REAPED_TOTAL = metrics.counter("room_actor_reaped_total", "Boşta kaldığı için kapatılan room actor sayısı.")
+ROOM_ACTOR_QUEUE_SECONDS = metrics.histogram(
+    "room_actor_queue_wait_seconds",
+    "Bir işin room actor'ünün gelen kutusunda bekleme süresi."
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RoomBusy(Exception):
+    def __init__(self, room_id: str):
+        super().__init__(f"Room gelen kutusu dolu: {room_id}")
+        self.room_id = room_id
+
+
+class RoomActor:
+    __slots__ = ("room_id", "inbox", "task")
+
+    def __init__(self, room_id: str, inbox_size: int):
+        self.room_id = room_id
+        self.inbox = asyncio.Queue(maxsize=inbox_size)
+        self.task = None
+
+
+class RoomActors:
+    def __init__(self, inbox_size: int = ROOM_INBOX_SIZE, inbox_timeout: float = ROOM_INBOX_TIMEOUT_SECONDS,
+                 idle_seconds: float = ROOM_ACTOR_IDLE_SECONDS):
+        self.inbox_size = inbox_size
+        self.inbox_timeout = inbox_timeout
+        self.idle_seconds = idle_seconds
+        self.actors: Dict[str, RoomActor] = {}
+
+        metrics.gauge("room_actors_active", "Çalışan room actor sayısı.").set_function(lambda: len(self.actors))
+        metrics.gauge(
+            "room_actor_inbox_depth",
+            "Tüm room actor gelen kutularında bekleyen iş sayısı."
+        ).set_function(lambda: sum(actor.inbox.qsize() for actor in self.actors.values()))
+
+    def _actor(self, room_id: str) -> RoomActor:
+        actor = self.actors.get(room_id)
+        if actor is None:
+            actor = RoomActor(room_id, self.inbox_size)
+            actor.task = asyncio.create_task(self._run(actor))
+            self.actors[room_id] = actor
+        return actor
+
+    async def submit(self, room_id: str, job: Callable[..., Awaitable], *args):
+        """
+        job(*args)'ı room'un actor'ünde, room'a daha önce gönderilen işlerden sonra çalıştırır
+        ve sonucunu döndürür. Gelen kutusunda yer açılmazsa RoomBusy fırlatır.
+        """
+        actor = self._actor(room_id)
+        future = asyncio.get_running_loop().create_future()
+        item = (job, args, future, time.perf_counter())
+        try:
+            actor.inbox.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(actor.inbox.put(item), timeout=self.inbox_timeout)
+            except asyncio.TimeoutError:
+                ROOM_ACTOR_REJECTED_TOTAL.inc()
+                raise RoomBusy(room_id)
+        return await future
+
+    async def _run(self, actor: RoomActor):
+        while True:
+            try:
+                job, args, future, queued_at = await asyncio.wait_for(actor.inbox.get(), timeout=self.idle_seconds)
+            except asyncio.TimeoutError:
+                # Zaman aşımı ile kontrol arasında await yok; bu arada yeni iş eklenemez
+                if actor.inbox.empty():
+                    if self.actors.get(actor.room_id) is actor:
+                        del self.actors[actor.room_id]
+                    ROOM_ACTOR_REAPED_TOTAL.inc()
+                    return
+                continue
+
+            ROOM_ACTOR_QUEUE_SECONDS.observe(time.perf_counter() - queued_at)
+            try:
+                if future.cancelled():
+                    # Bekleyen bağlantı kapandı; yanıtı alamayan istemci mesajı client_msg_id ile yeniden gönderir
+                    continue
+                # Bekleyen bağlantının dökümü submit'te durur; işin kendisi burada profillenir
+                async with profiler.profile("actor", f"{actor.room_id}/{job.__qualname__}"):
+                    result = await job(*args)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                actor.inbox.task_done()
+
+    async def close(self, timeout: float):
+        """
+        Gelen kutularındaki işlerin bitmesini en fazla timeout saniye bekler ve actor'leri durdurur.
+        """
+        actors = list(self.actors.values())
+        pending = [asyncio.create_task(actor.inbox.join()) for actor in actors]
+        if pending:
+            _, not_done = await asyncio.wait(pending, timeout=timeout)
+            for task in not_done:
+                task.cancel()
+            if not_done:
+                logger.warning("Room actor işleri kapanma süresinde bitmedi.", extra={"rooms": len(not_done)})
+        for actor in actors:
+            actor.task.cancel()
+        self.actors.clear()
@@ -0,0 +1,269 @@
+"""
+Bellekteki room kaydı.
+
+Room'lar anahtarı interned room ID olan, erişim sırasına göre tutulan bir sözlükte
+__slots__'lu kayıtlar olarak saklanır. Kullanıcı -> room dizini aynı string nesnelerini
+paylaşır. Direct room üyeleri sabit olduğu için set yerine (küçük_id, büyük_id) tuple'ı tutulur.
+
+Tahliye:
+    - ROOM_IDLE_SECONDS boyunca mesaj gönderilmeyen room'lar periyodik olarak silinir.
+    - Room sayısı ROOM_REGISTRY_MAX_ROOMS'u aşınca en uzun süredir kullanılmayanlar silinir.
+    - Direct room'lar ID'lerinden yeniden kurulabildiği için her zaman silinebilir; ilk
+      erişimde yeniden oluşturulur. Grup room'ları yalnızca bağlı üyesi kalmadığında silinir.
+
+Kullanım:
+    python room_registry.py bench [room_sayısı]    # Direct sohbetler için bellek karşılaştırması
+"""
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+ROOM_REGISTRY_MAX_ROOMS = int(os.getenv("ROOM_REGISTRY_MAX_ROOMS", 200000))
+# 0 ise boşta kalan room'lar süreye göre silinmez
+ROOM_IDLE_SECONDS = float(os.getenv("ROOM_IDLE_SECONDS", 60 * 30))
+ROOM_EVICTION_INTERVAL_SECONDS = float(os.getenv("ROOM_EVICTION_INTERVAL_SECONDS", 60))
+
+ROOM_EVICTED_TOTAL = metrics.counter(
+    "ws_room_evicted_total",
+    "Bellekteki kayıttan silinen room sayısı.",
+    ("reason",)
+)
+
+logger = logging.getLogger(__name__)
+
+DIRECT = "direct"
+GROUP = "group"
+
+
+class Room:
+    __slots__ = ("type", "members", "last_active")
+
+    def __init__(self, room_type: str, members, last_active: float):
+        self.type = room_type
+        # Direct: (küçük_id, büyük_id) tuple'ı, grup: set
+        self.members = members
+        self.last_active = last_active
+
+
+def direct_members(room_id: str) -> Optional[tuple]:
+    """
+    direct_{küçük_id}_{büyük_id} biçimindeki ID'den üyeleri çıkarır; geçersizse None döner.
+    """
+    prefix, _, rest = room_id.partition("_")
+    first, _, second = rest.partition("_")
+    if prefix != DIRECT or not first.isdigit() or not second.isdigit():
+        return None
+    return int(first), int(second)
+
+
+class RoomRegistry:
+    def __init__(self, connections: Dict[int, object], max_rooms: int = ROOM_REGISTRY_MAX_ROOMS,
+                 idle_seconds: float = ROOM_IDLE_SECONDS):
+        """
+        connections: {user_id: websocket}; bağlı üyesi olan grup room'ları silinmez
+        """
+        self.connections = connections
+        self.max_rooms = max_rooms
+        self.idle_seconds = idle_seconds
+        # Eskiden yeniye erişim sırası
+        self.rooms: "OrderedDict[str, Room]" = OrderedDict()
+        # {user_id: set(room_id)}
+        self.user_index: Dict[int, Set[str]] = {}
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def __contains__(self, room_id):
+        return room_id in self.rooms
+
+    def create(self, room_id: str, user_ids: Iterable[int], room_type: str) -> str:
+        # Dizindeki set'ler ve kayıt aynı string nesnesini paylaşır
+        room_id = sys.intern(room_id)
+        if room_id in self.rooms:
+            self.touch(room_id)
+            return room_id
+        members = tuple(sorted(user_ids)) if room_type == DIRECT else set(user_ids)
+        self.rooms[room_id] = Room(room_type, members, time.monotonic())
+        if len(self.rooms) > self.max_rooms:
+            self.evict_over_capacity()
+        return room_id
+
+    def get(self, room_id: str) -> Optional[Room]:
+        """
+        Room'u döndürür ve kullanıldı olarak işaretler. Silinmiş direct room'lar yeniden kurulur.
+        """
+        room = self.rooms.get(room_id)
+        if room is not None:
+            self.touch(room_id)
+            return room
+        members = direct_members(room_id)
+        if members is None:
+            return None
+        room_id = self.create(room_id, members, DIRECT)
+        for user_id in members:
+            self.user_index.setdefault(user_id, set()).add(room_id)
+        return self.rooms[room_id]
+
+    def touch(self, room_id: str):
+        self.rooms.move_to_end(room_id)
+        self.rooms[room_id].last_active = time.monotonic()
+
+    def add_member(self, user_id: int, room_id: str) -> bool:
+        """
+        Kullanıcıyı room'a ve dizine ekler. Direct room'a üyesi olmayan kullanıcı eklenemez.
+        """
+        room = self.rooms.get(room_id)
+        if room is None:
+            return False
+        if room.type == DIRECT:
+            if user_id not in room.members:
+                return False
+        else:
+            room.members.add(user_id)
+        self.user_index.setdefault(user_id, set()).add(room_id)
+        return True
+
+    def remove_member(self, user_id: int, room_id: str):
+        room = self.rooms.get(room_id)
+        if room is not None and room.type == GROUP:
+            room.members.discard(user_id)
+            # Grup boşsa sil
+            if not room.members:
+                del self.rooms[room_id]
+        self._unindex(user_id, room_id)
+
+    def rooms_of(self, user_id: int) -> Set[str]:
+        return self.user_index.get(user_id, set())
+
+    def _unindex(self, user_id: int, room_id: str):
+        room_ids = self.user_index.get(user_id)
+        if room_ids is not None:
+            room_ids.discard(room_id)
+            if not room_ids:
+                del self.user_index[user_id]
+
+    def _pinned(self, room: Room) -> bool:
+        return room.type == GROUP and any(user_id in self.connections for user_id in room.members)
+
+    def _evict(self, room_id: str, reason: str):
+        room = self.rooms.pop(room_id)
+        for user_id in room.members:
+            self._unindex(user_id, room_id)
+        ROOM_EVICTED_TOTAL.inc(reason)
+
+    def evict_over_capacity(self) -> int:
+        """
+        ROOM_REGISTRY_MAX_ROOMS'a inene kadar en uzun süredir kullanılmayan room'ları siler.
+        """
+        evicted = 0
+        scanned = 0
+        while len(self.rooms) > self.max_rooms and scanned < len(self.rooms):
+            room_id, room = next(iter(self.rooms.items()))
+            scanned += 1
+            if self._pinned(room):
+                # Bağlı üyesi olan grup; kuyruğun sonuna alınır
+                self.touch(room_id)
+                continue
+            self._evict(room_id, "capacity")
+            evicted += 1
+        return evicted
+
+    def evict_idle(self) -> int:
+        if not self.idle_seconds:
+            return 0
+        cutoff = time.monotonic() - self.idle_seconds
+        evicted = 0
+        while self.rooms:
+            room_id, room = next(iter(self.rooms.items()))
+            if room.last_active >= cutoff:
+                break
+            if self._pinned(room):
+                self.touch(room_id)
+                continue
+            self._evict(room_id, "idle")
+            evicted += 1
+        return evicted
+
+    async def run_eviction(self, interval: float = ROOM_EVICTION_INTERVAL_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            evicted = self.evict_idle()
+            if evicted:
+                logger.info("Boştaki room'lar silindi.", extra={"rooms": evicted, "remaining": len(self.rooms)})
+
+
+def legacy_registry(pairs):
+    """
+    Önceki yapı: {room_id: {'user_ids': set, 'type': str}} ve {user_id: set(room_id)}
+    """
+    active_rooms = {}
+    user_rooms = {}
+    for user1, user2 in pairs:
+        room_id = f"direct_{min(user1, user2)}_{max(user1, user2)}"
+        if room_id not in active_rooms:
+            active_rooms[room_id] = {'user_ids': {user1, user2}, 'type': DIRECT}
+        for user_id in (user1, user2):
+            user_rooms.setdefault(user_id, set()).add(room_id)
+    return active_rooms, user_rooms
+
+
+def compact_registry(pairs, max_rooms):
+    registry = RoomRegistry({}, max_rooms=max_rooms)
+    for user1, user2 in pairs:
+        room_id = registry.create(f"direct_{min(user1, user2)}_{max(user1, user2)}", (user1, user2), DIRECT)
+        registry.add_member(user1, room_id)
+        registry.add_member(user2, room_id)
+    return registry
+
+
+def measure(build, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    structure = build(*args)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del structure
+    return size, elapsed
+
+
+def bench(conversations: int):
+    """
+    Rastgele kullanıcı çiftleri arasında conversations adet direct sohbet açar ve
+    eski yapı ile bu kaydın bellek kullanımını karşılaştırır.
+    """
+    rng = random.Random(42)
+    users = max(conversations // 5, 2)
+    pairs = []
+    for _ in range(conversations):
+        user1, user2 = rng.randint(1, users), rng.randint(1, users)
+        if user1 != user2:
+            pairs.append((user1, user2))
+
+    results = [
+        ("eski yapı (dict + set)", measure(legacy_registry, pairs)),
+        ("RoomRegistry, sınırsız", measure(compact_registry, pairs, len(pairs) + 1)),
+        (f"RoomRegistry, en fazla {ROOM_REGISTRY_MAX_ROOMS}", measure(compact_registry, pairs, ROOM_REGISTRY_MAX_ROOMS)),
+    ]
+    print(f"{len(pairs)} direct sohbet, {users} kullanıcı")
+    for name, (size, elapsed) in results:
+        print(f"  {name:<32} {size / 1024 / 1024:8.1f} MB  {size / len(pairs):6.0f} B/sohbet  {elapsed:6.2f} sn")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        bench(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
+    else:
+        print(__doc__)
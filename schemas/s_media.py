@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+class CreateUploadItem(BaseModel):
+    filename: str
+    content_type: str
+    size: int
@@ -0,0 +1,139 @@
+"""
+Sık çalışan sorguların önbelleğe alınan ifadeleri.
+
+Sorgular lambda_stmt ile kurulur: SQLAlchemy lambda'nın kod konumuna göre derlenmiş
+ifadeyi ve cache key'i bir kez üretir, sonraki çağrılarda sadece parametre değerlerini
+yeniler. Koşullu eklenen parçalar (stmt += lambda ...) de ayrı ayrı önbelleğe alınır.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, func, lambda_stmt, or_
+from sqlalchemy.future import select
+
+from models import Message, User
+
+
+def user_by_id(user_id: int):
+    return lambda_stmt(lambda: select(User).where(User.id == user_id))
+
+
+def user_by_email(email: str):
+    return lambda_stmt(lambda: select(User).where(User.email == email))
+
+
+def user_by_handle(username: str, user_tag: str):
+    """
+    username#tag ile tek kullanıcı; (username, user_tag) indeksini kullanır.
+    """
+    return lambda_stmt(lambda: select(User).where(User.username == username, User.user_tag == user_tag))
+
+
+def users_by_prefix(lower_bound: str, upper_bound: str, limit: int):
+    """
+    Küçük harfli kullanıcı adı [lower_bound, upper_bound) aralığında olan kullanıcılar;
+    ix_users_username_prefix indeksini kullanır.
+    """
+    return lambda_stmt(lambda: select(User.id, User.username, User.user_tag).where(
+        func.lower(User.username).collate("C") >= lower_bound,
+        func.lower(User.username).collate("C") < upper_bound
+    ).order_by(func.lower(User.username).collate("C")).limit(limit))
+
+
+def conversation_messages(user1_id: int, user2_id: int):
+    """
+    İki kullanıcı arasındaki, iki yöndeki tüm mesajlar. Listeleme için sadece kolonlar
+    seçilir (ORM nesnesi ve identity map oluşturulmaz); satırlar .mappings() ile
+    doğrudan sözlüğe çevrilebilir.
+    """
+    return lambda_stmt(lambda: select(
+        Message.id, Message.sender_id, Message.receiver_id, Message.content,
+        Message.sent_date, Message.is_read, Message.attachment_id
+    ).where(
+        or_(
+            and_(Message.sender_id == user1_id, Message.receiver_id == user2_id),
+            and_(Message.sender_id == user2_id, Message.receiver_id == user1_id),
+        )
+    ))
+
+
+def conversation_history(user1_id: int, user2_id: int):
+    """
+    Sohbetin tüm geçmişi, eskiden yeniye.
+    """
+    return conversation_messages(user1_id, user2_id) + (lambda s: s.order_by(Message.sent_date))
+
+
+def conversation_page(user1_id: int, user2_id: int, upper: datetime, lower: Optional[datetime] = None,
+                      before_id: Optional[int] = None, limit: Optional[int] = None):
+    """
+    (lower, upper] zaman aralığındaki, before_id'den eski mesajlar; yeniden eskiye.
+    Zaman aralığı partition budaması için her zaman verilir.
+    """
+    stmt = conversation_messages(user1_id, user2_id)
+    stmt += lambda s: s.where(Message.sent_date <= upper)
+    if lower is not None:
+        stmt += lambda s: s.where(Message.sent_date > lower)
+    if before_id is not None:
+        stmt += lambda s: s.where(Message.id < before_id)
+    stmt += lambda s: s.order_by(Message.id.desc())
+    if limit is not None:
+        stmt += lambda s: s.limit(limit)
+    return stmt
+
+
+def chat_list_latest(user_id: int, window_start: datetime):
+    """
+    Kullanıcının window_start'tan sonra mesajlaştığı her sohbetin son mesajı ve karşıdaki
+    kullanıcı. Zaman sınırı partition budaması içindir. Sadece listede gösterilen kolonlar seçilir.
+    """
+    return lambda_stmt(lambda: select(Message.content, Message.sent_date, User.id, User.username).join(
+        User, or_(User.id == Message.sender_id, User.id == Message.receiver_id)
+    ).filter(
+        or_(Message.sender_id == user_id, Message.receiver_id == user_id),
+        Message.sent_date == select(
+            func.max(Message.sent_date).label("max_sent_date"),
+            func.least(Message.sender_id, Message.receiver_id).label("user1"),
+            func.greatest(Message.sender_id, Message.receiver_id).label("user2")
+        ).filter(
+            or_(Message.sender_id == user_id, Message.receiver_id == user_id),
+            # Grup mesajları (receiver_id None) sohbet listesinde yer almaz
+            Message.receiver_id.isnot(None),
+            Message.sent_date >= window_start
+        ).group_by(
+            func.least(Message.sender_id, Message.receiver_id),
+            func.greatest(Message.sender_id, Message.receiver_id),
+        ).subquery().c.max_sent_date,
+        Message.sent_date >= window_start,
+        User.id != user_id
+    ).distinct())
+
+
+def chat_list_older(user_id: int, other_ids):
+    """
+    Kullanıcının other_ids ile her sohbetindeki son mesaj, zaman sınırı olmadan. Son
+    CHAT_LIST_WINDOW_DAYS içinde mesajlaşılmamış sohbetler için kullanılır; her partition'da
+    (sender_id, receiver_id, sent_date) indeksleri taranır.
+    """
+    return lambda_stmt(lambda: select(Message.content, Message.sent_date, User.id, User.username).join(
+        User, or_(User.id == Message.sender_id, User.id == Message.receiver_id)
+    ).filter(
+        or_(
+            and_(Message.sender_id == user_id, Message.receiver_id.in_(other_ids)),
+            and_(Message.receiver_id == user_id, Message.sender_id.in_(other_ids)),
+        ),
+        User.id != user_id
+    ).distinct(User.id).order_by(User.id, Message.sent_date.desc()))
+
+
+def chat_list_unread(user_id: int, sender_ids):
+    """
+    sender_ids'den kullanıcıya gelen okunmamış mesaj sayıları, gönderen başına tek satır.
+    Zaman sınırı yoktur; sohbet listesi penceresinden eski okunmamış mesajlar da sayılır.
+    Her partition'da yalnızca okunmamış satırları içeren ix_messages_unread kısmi indeksi taranır.
+    """
+    return lambda_stmt(lambda: select(Message.sender_id, func.count()).filter(
+        Message.sender_id.in_(sender_ids),
+        Message.receiver_id == user_id,
+        Message.is_read == False
+    ).group_by(Message.sender_id))
@@ -0,0 +1,221 @@
+"""
+Medya ekleri için depolama katmanı.
+
+Yüklemeler parça parça geçici bir dosyaya eklenir; tamamlandığında içerik SHA-256 ile
+adreslenen kalıcı konuma taşınır. Aynı içerik ikinci kez yüklenirse tekrar saklanmaz.
+StorageBackend arayüzü korunarak yerel disk yerine bir object store kullanılabilir.
+"""
+import asyncio
+import fcntl
+import hashlib
+import os
+import shutil
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "media")
+
+# Dosyaları belleğe almadan okumak için kullanılan blok boyutu
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+def attachment_access_key(attachment_id: int) -> str:
+    """
+    Grup mesajıyla paylaşılan eki indirebilecek kullanıcıların Redis set'i. Grup üyelikleri
+    veritabanında tutulmadığı için mesaj dağıtılırken room üyeleri buraya yazılır.
+    """
+    return f"attachment_access:{attachment_id}"
+
+
+class OffsetMismatch(Exception):
+    """
+    Parçanın offset'i yüklemenin sunucudaki boyutuyla eşleşmiyor.
+    """
+    def __init__(self, offset: int):
+        super().__init__(f"Yükleme offset'i {offset}.")
+        self.offset = offset
+
+
+class UploadNotFound(Exception):
+    """
+    Yükleme, kilit beklenirken başka bir istek veya worker tarafından tamamlandı ya da silindi.
+    """
+
+
+class StorageBackend(ABC):
+    """
+    Depolama arka ucu arayüzü.
+    """
+
+    @abstractmethod
+    async def upload_size(self, upload_id: str) -> int:
+        """
+        Yarım kalan yüklemenin şu ana kadar alınan boyutunu döndürür.
+        """
+
+    @abstractmethod
+    async def append_chunk(self, upload_id: str, chunks: AsyncIterator[bytes], max_size: int, offset: int) -> int:
+        """
+        Gelen veriyi yüklemenin sonuna ekler ve yeni boyutu döndürür. Aynı yüklemeye
+        eşzamanlı eklemeler sırayla yapılır; offset, kilit alındıktan sonraki boyutla
+        eşleşmezse OffsetMismatch, boyut max_size'ı aşarsa ValueError, yükleme bu arada
+        tamamlandıysa veya silindiyse UploadNotFound fırlatır.
+        """
+
+    @abstractmethod
+    async def finalize_upload(self, upload_id: str) -> Tuple[str, int]:
+        """
+        Yüklemeyi içerik adresli depoya taşır. (sha256, boyut) döndürür. Devam eden bir
+        ekleme varsa bitmesini bekler.
+        """
+
+    @abstractmethod
+    async def discard_upload(self, upload_id: str):
+        pass
+
+    def local_path(self, digest: str) -> Optional[str]:
+        """
+        İçerik yerel diskteyse dosya yolunu döndürür (sendfile ile sunmak için).
+        Yerel olmayan arka uçlar None döndürür.
+        """
+        return None
+
+    def public_url(self, digest: str) -> Optional[str]:
+        """
+        Yerel olmayan arka uçlar için istemcinin yönlendirileceği adres.
+        """
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """
+    Yerel diskte içerik adresli depolama.
+    Dosyalar {root}/blobs/ab/cd/abcd... şeklinde, yarım yüklemeler {root}/uploads altında tutulur.
+    """
+
+    def __init__(self, root: str = MEDIA_ROOT):
+        self.root = root
+        self.uploads_dir = os.path.join(root, "uploads")
+        self.blobs_dir = os.path.join(root, "blobs")
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        # {upload_id: [kilit, kullanan istek sayısı]}; son kullanan bırakınca silinir
+        self._locks: Dict[str, list] = {}
+
+    @asynccontextmanager
+    async def _upload_lock(self, upload_id: str):
+        """
+        Süreç içinde yükleme bazlı kilit. Birden fazla worker süreci için dosya ayrıca flock ile
+        kilitlenir (_open_locked); ekleme, tamamlama ve silme aynı dosya kilidini alır.
+        """
+        entry = self._locks.setdefault(upload_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[upload_id]
+
+    def _open_locked(self, path: str, mode: str):
+        """
+        Yarım yüklemeyi açar ve flock ile kilitler. Kilit beklenirken dosya başka bir worker
+        tarafından taşındıysa veya silindiyse açılan dosya artık bu yola ait değildir;
+        UploadNotFound fırlatılır. Kapatmak kilidi bırakır.
+        """
+        file = open(path, mode)
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                raise UploadNotFound()
+            if current.st_ino != os.fstat(file.fileno()).st_ino:
+                raise UploadNotFound()
+        except BaseException:
+            file.close()
+            raise
+        return file
+
+    def _upload_path(self, upload_id: str) -> str:
+        return os.path.join(self.uploads_dir, f"{upload_id}.part")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blobs_dir, digest[:2], digest[2:4], digest)
+
+    async def upload_size(self, upload_id: str) -> int:
+        try:
+            return os.path.getsize(self._upload_path(upload_id))
+        except FileNotFoundError:
+            return 0
+
+    async def append_chunk(self, upload_id: str, chunks: AsyncIterator[bytes], max_size: int, offset: int) -> int:
+        path = self._upload_path(upload_id)
+        async with self._upload_lock(upload_id):
+            file = await asyncio.to_thread(self._open_locked, path, "ab")
+            try:
+                size = file.seek(0, os.SEEK_END)
+                if size != offset:
+                    raise OffsetMismatch(size)
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if size > max_size:
+                        raise ValueError("Dosya boyutu sınırı aşıldı.")
+                    await asyncio.to_thread(file.write, chunk)
+                await asyncio.to_thread(file.flush)
+                return size
+            finally:
+                # Kapatmak flock'u da bırakır
+                await asyncio.to_thread(file.close)
+
+    async def finalize_upload(self, upload_id: str) -> Tuple[str, int]:
+        async with self._upload_lock(upload_id):
+            return await asyncio.to_thread(self._finalize_sync, upload_id)
+
+    def _finalize_sync(self, upload_id: str) -> Tuple[str, int]:
+        path = self._upload_path(upload_id)
+        sha256 = hashlib.sha256()
+        size = 0
+        # Dosya kilitliyken okunur ve taşınır; başka bir worker'ın eklemesi araya giremez
+        with self._open_locked(path, "rb") as file:
+            while True:
+                block = file.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                sha256.update(block)
+                size += len(block)
+            digest = sha256.hexdigest()
+
+            blob_path = self._blob_path(digest)
+            if os.path.exists(blob_path):
+                # Aynı içerik zaten var, tekrar saklamaya gerek yok
+                os.remove(path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                shutil.move(path, blob_path)
+        return digest, size
+
+    async def discard_upload(self, upload_id: str):
+        async with self._upload_lock(upload_id):
+            await asyncio.to_thread(self._discard_sync, upload_id)
+
+    def _discard_sync(self, upload_id: str):
+        path = self._upload_path(upload_id)
+        try:
+            file = self._open_locked(path, "rb")
+        except (FileNotFoundError, UploadNotFound):
+            return
+        with file:
+            os.remove(path)
+
+    def local_path(self, digest: str) -> Optional[str]:
+        path = self._blob_path(digest)
+        return path if os.path.exists(path) else None
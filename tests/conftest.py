@@ -0,0 +1,8 @@
+"""
+Testler kök dizindeki modülleri doğrudan import eder. Postgres ve Redis gerektirmeyen
+parçalar (bellekteki yapılar, Redis'in küçük bir taklidi ile çalışanlar) burada test edilir.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+import admission
+from admission import AdmissionController, AdmissionRejected
+
+
+def test_rejected_clients_are_spread_at_the_admission_rate(monkeypatch):
+    monkeypatch.setattr(admission.random, "uniform", lambda low, high: 0.0)
+    controller = AdmissionController(max_concurrent=10, queue_size=100, timeout=1)
+
+    hints = [controller.reject_full().retry_after for _ in range(300)]
+
+    # Ölçüm yokken saniyede queue_size / timeout = 100 istemci geri çağrılır
+    assert hints[0] == pytest.approx(admission.ADMISSION_RETRY_AFTER_SECONDS, abs=0.05)
+    assert hints[-1] - hints[0] == pytest.approx(2.99, abs=0.05)
+    assert hints == sorted(hints)
+
+
+def test_retry_hint_is_capped(monkeypatch):
+    monkeypatch.setattr(admission.random, "uniform", lambda low, high: 0.0)
+    controller = AdmissionController(max_concurrent=1, queue_size=1, timeout=1)
+
+    hints = [controller.retry_after() for _ in range(500)]
+
+    assert max(hints) <= admission.ADMISSION_RETRY_AFTER_MAX_SECONDS + 0.05
+
+
+def test_queue_timeout_rejects_with_retry_hint():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, queue_size=10, timeout=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit():
+                pass
+        release.set()
+        await holder
+        return rejected.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.reason == "timeout"
+    assert rejected.retry_after >= admission.ADMISSION_RETRY_AFTER_SECONDS
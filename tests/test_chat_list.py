@@ -0,0 +1,70 @@
+import asyncio
+from datetime import timedelta
+
+import orjson
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+
+import main
+from database import Base
+from models import Message, User
+from partitions import CHAT_LIST_WINDOW_DAYS
+from utils import get_current_utc_time
+
+
+class AsyncSessionAdapter:
+    def __init__(self, session):
+        self.session = session
+
+    async def execute(self, statement):
+        return self.session.execute(statement)
+
+
+class FakeFriendGraph:
+    def __init__(self, friends):
+        self.friends = friends
+
+    async def friends_of(self, session, user_id):
+        return set(self.friends.get(user_id, ()))
+
+
+def create_database():
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def configure(dbapi_connection, _):
+        # users.username önek indeksi Postgres'in "C" collation'ını kullanır
+        dbapi_connection.create_collation("C", lambda a, b: (a > b) - (a < b))
+        # Postgres'teki gibi NULL değerler yok sayılır
+        dbapi_connection.create_function("least", -1, lambda *values: min(v for v in values if v is not None))
+        dbapi_connection.create_function("greatest", -1, lambda *values: max(v for v in values if v is not None))
+
+    Base.metadata.create_all(engine, tables=[User.__table__, Message.__table__])
+    return engine
+
+
+def test_unread_count_includes_messages_older_than_the_window(monkeypatch):
+    engine = create_database()
+    now = get_current_utc_time()
+    old = now - timedelta(days=CHAT_LIST_WINDOW_DAYS + 30)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": user_id, "username": f"user{user_id}", "user_tag": f"{user_id:04d}",
+             "email": f"user{user_id}@example.com", "password": "x"}
+            for user_id in (1, 2)
+        ])
+        conn.execute(insert(Message), [
+            {"id": 1, "sender_id": 2, "receiver_id": 1, "content": "eski", "sent_date": old, "is_read": False},
+            {"id": 2, "sender_id": 2, "receiver_id": 1, "content": "okundu", "sent_date": old, "is_read": True},
+            {"id": 3, "sender_id": 2, "receiver_id": 1, "content": "yeni", "sent_date": now, "is_read": False},
+        ])
+    monkeypatch.setattr(main, "friend_graph", FakeFriendGraph({1: {2}}))
+
+    async def scenario():
+        with Session(engine) as session:
+            return await main.get_chats(1, AsyncSessionAdapter(session))
+
+    [chat] = orjson.loads(asyncio.run(scenario()).body)
+    assert chat["receiver_id"] == 2
+    assert chat["message"] == "yeni"
+    assert chat["unread"] == 2
@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+from connection_policy import WS_MAX_SIZE, ConnectionPolicy
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.close_code = None
+
+    async def close(self, code=1000, reason=""):
+        self.close_code = code
+
+
+def test_default_frame_limit_matches_websockets():
+    assert WS_MAX_SIZE == 2 ** 20
+
+
+def test_only_inactive_connections_are_closed():
+    connections = {1: FakeWebSocket(), 2: FakeWebSocket(), 3: FakeWebSocket()}
+    policy = ConnectionPolicy(connections, idle_timeout=60)
+    for user_id in connections:
+        policy.touch(user_id)
+    # 1 ve 2 bir saat önce görüldü; 2'ye az önce olay iletildi
+    policy.last_seen[1] = policy.last_seen[2] = time.monotonic() - 3600
+    policy.touch(2)
+
+    assert asyncio.run(policy.close_idle()) == 1
+    assert connections[1].close_code == 1001
+    assert connections[2].close_code is None
+    assert connections[3].close_code is None
+
+
+def test_idle_reaper_is_disabled_without_timeout():
+    policy = ConnectionPolicy({}, idle_timeout=0)
+    # Süre tanımlı değilse görev hemen biter
+    asyncio.run(asyncio.wait_for(policy.run_idle_reaper(interval=0), timeout=1))
@@ -0,0 +1,43 @@
+import asyncio
+
+import chat_server
+
+
+class FailingFriendGraph:
+    async def are_friends(self, session, user_id, other_ids):
+        raise AssertionError("Grup oluşturma arkadaşlık kontrolü yapmaz")
+
+
+def create_group(participant_ids):
+    saved = chat_server.friend_graph
+    chat_server.friend_graph = FailingFriendGraph()
+
+    async def scenario():
+        try:
+            return await chat_server.handle_create_group(1, {"participant_ids": participant_ids}, None)
+        finally:
+            await chat_server.room_actors.close(1)
+
+    try:
+        return asyncio.run(scenario())
+    finally:
+        chat_server.friend_graph = saved
+
+
+def test_all_participants_are_added():
+    # Katılımcıların oluşturucunun arkadaşı olması gerekmez
+    response = create_group([2, 3, 4])
+    assert response["status"] == "success"
+    room = chat_server.room_registry.get(response["room_id"])
+    assert room.members == {1, 2, 3, 4}
+
+
+def test_creator_is_added_once():
+    response = create_group([1, 2])
+    assert response["status"] == "success"
+    assert chat_server.room_registry.get(response["room_id"]).members == {1, 2}
+
+
+def test_missing_participants():
+    assert create_group([])["status"] == "error"
+    assert create_group("2")["status"] == "error"
@@ -0,0 +1,164 @@
+import asyncio
+import random
+from collections import Counter
+
+import pytest
+
+import chat_server
+from dedup import DUPLICATE_SENDS_TOTAL, MessageDeduplicator, is_valid_client_msg_id
+
+
+class SlowRedis:
+    """
+    MessageDeduplicator'ın kullandığı SET NX/GET/DELETE komutlarının taklidi. Her komut
+    olay döngüsüne bir kez döner, böylece eşzamanlı denemeler araya girer.
+    """
+    def __init__(self):
+        self.values = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        await asyncio.sleep(0)
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    async def get(self, key):
+        await asyncio.sleep(0)
+        return self.values.get(key)
+
+    async def delete(self, key):
+        await asyncio.sleep(0)
+        return int(self.values.pop(key, None) is not None)
+
+
+class Store:
+    """
+    message_dedup birincil anahtarı gibi davranan kayıt; aynı client_msg_id ikinci kez
+    yazılmaz, ilk mesajın ID'si döner.
+    """
+    def __init__(self, failure_rate):
+        self.messages = {}
+        self.fanouts = Counter()
+        # Aynı mesajın eşzamanlı işlenme sayısı; Redis ayırması bunu önlemeli
+        self.in_flight = Counter()
+        self.overlaps = 0
+        self.failure_rate = failure_rate
+        self.next_id = 0
+
+    async def process(self, user_id, client_msg_id):
+        key = (user_id, client_msg_id)
+        self.overlaps += self.in_flight[key] > 0
+        self.in_flight[key] += 1
+        try:
+            await asyncio.sleep(random.uniform(0, 0.003))
+        finally:
+            self.in_flight[key] -= 1
+        if random.random() < self.failure_rate:
+            # Geçici kayıt hatası; istemci tekrar dener
+            return {"status": "error", "client_msg_id": client_msg_id, "retry": True}
+        if key not in self.messages:
+            self.next_id += 1
+            self.messages[key] = self.next_id
+            self.fanouts[key] += 1
+        return {"status": "success", "client_msg_id": client_msg_id, "message_id": self.messages[key]}
+
+
+def run_storm(redis, store, senders=5, messages=20, retries=8, flush_redis=False):
+    saved = chat_server.deduplicator
+    chat_server.deduplicator = MessageDeduplicator(type("Handler", (), {"redis": redis})())
+    responses = {}
+
+    async def send(user_id, client_msg_id):
+        # Aynı mesaj yanıt beklenmeden birden çok kez gönderilir, sonra başarıya kadar tekrarlanır
+        while True:
+            response = await chat_server.send_idempotent(
+                user_id, {"client_msg_id": client_msg_id},
+                lambda msg_id: store.process(user_id, msg_id)
+            )
+            if response["status"] == "success":
+                responses.setdefault((user_id, client_msg_id), set()).add(response["message_id"])
+                return
+            await asyncio.sleep(random.uniform(0, 0.002))
+
+    async def flusher():
+        # Redis anahtarları kaybolsa da veritabanı tekrarları yakalar
+        for _ in range(5):
+            await asyncio.sleep(0.005)
+            redis.values.clear()
+
+    async def scenario():
+        tasks = [
+            send(user_id, f"msg-{index}")
+            for user_id in range(senders)
+            for index in range(messages)
+            for _ in range(retries)
+        ]
+        random.shuffle(tasks)
+        if flush_redis:
+            tasks.append(flusher())
+        await asyncio.gather(*tasks)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        chat_server.deduplicator = saved
+    return responses
+
+
+@pytest.mark.parametrize("flush_redis", [False, True])
+def test_retry_storm_persists_and_fans_out_each_message_once(flush_redis):
+    random.seed(11)
+    store = Store(failure_rate=0.2)
+    responses = run_storm(SlowRedis(), store, flush_redis=flush_redis)
+
+    assert len(store.messages) == 5 * 20
+    assert set(store.fanouts.values()) == {1}
+    if not flush_redis:
+        assert store.overlaps == 0
+    # Her tekrar ilk gönderimle aynı message_id'yi aldı
+    for key, message_ids in responses.items():
+        assert message_ids == {store.messages[key]}
+
+
+def test_duplicates_are_answered_from_redis():
+    random.seed(3)
+    before = DUPLICATE_SENDS_TOTAL.value("redis")
+    store = Store(failure_rate=0)
+    run_storm(SlowRedis(), store, senders=1, messages=5, retries=10)
+    assert len(store.messages) == 5
+    assert DUPLICATE_SENDS_TOTAL.value("redis") > before
+
+
+def test_client_msg_id_validation():
+    assert is_valid_client_msg_id("a" * 64)
+    assert not is_valid_client_msg_id("a" * 65)
+    assert not is_valid_client_msg_id("")
+    assert not is_valid_client_msg_id(123)
+
+
+def test_cancelled_send_releases_the_claim():
+    redis = SlowRedis()
+    saved = chat_server.deduplicator
+    chat_server.deduplicator = MessageDeduplicator(type("Handler", (), {"redis": redis})())
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def process(client_msg_id):
+            started.set()
+            await asyncio.Event().wait()
+
+        task = asyncio.create_task(chat_server.send_idempotent(1, {"client_msg_id": "msg-1"}, process))
+        await started.wait()
+        assert redis.values
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Tekrar deneme beklemeden yeniden ayırabilir
+        assert await chat_server.deduplicator.claim(1, "msg-1") is None
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        chat_server.deduplicator = saved
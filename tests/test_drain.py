@@ -0,0 +1,175 @@
+import asyncio
+import json
+import random
+
+import chat_server
+import id_generator
+from drain import DRAIN_CLOSE_CODE, DrainController
+from id_generator import SnowflakeGenerator
+from models import Message
+
+
+class ClientWebSocket:
+    """
+    chat_server.handler'ın kullandığı recv/send/close arayüzü. Kapandıktan sonra send
+    ConnectionError fırlatır; bekleyen recv bağlantı kapandı hatası alır.
+    """
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.frames = []
+        self.close_code = None
+
+    async def recv(self):
+        message = await self.incoming.get()
+        if message is None:
+            raise ConnectionError("bağlantı kapandı")
+        return message
+
+    async def send(self, frame):
+        # Soket yazması olay döngüsüne döner; drain bu sırada bağlantıyı kapatabilir
+        await asyncio.sleep(random.uniform(0.001, 0.005))
+        if self.close_code is not None:
+            raise ConnectionError("bağlantı kapalı")
+        self.frames.append(frame)
+
+    async def close(self, code=1000, reason=""):
+        if self.close_code is None:
+            self.close_code = code
+            self.incoming.put_nowait(None)
+
+    def events(self):
+        for frame in self.frames:
+            data = json.loads(frame)
+            yield from data if isinstance(data, list) else [data]
+
+
+class UserResult:
+    def scalars(self):
+        return self
+
+    def first(self):
+        return object()
+
+
+class FakeSession:
+    """
+    Doğrulama sorgusu her kullanıcıyı bulur; commit, kaydedilen mesajları rastgele bir
+    gecikmeden sonra committed'a ekler.
+    """
+    def __init__(self, committed):
+        self.committed = committed
+        self.added = []
+
+    async def execute(self, statement):
+        return UserResult()
+
+    def add(self, instance):
+        self.added.append(instance)
+
+    async def commit(self):
+        await asyncio.sleep(random.uniform(0.02, 0.1))
+        self.committed.update(instance.id for instance in self.added if isinstance(instance, Message))
+        self.added = []
+
+    async def rollback(self):
+        self.added = []
+
+    def in_transaction(self):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.committed = set()
+
+    def async_session(self):
+        return FakeSession(self.committed)
+
+    async def get_session(self):
+        async with self.async_session() as session:
+            yield session
+
+
+class EmptyOutbox:
+    async def drain(self, user_id, write):
+        return 0
+
+    async def append(self, user_id, message_json):
+        pass
+
+
+def test_no_acked_message_is_lost_during_drain(monkeypatch):
+    """
+    İstemciler chat_server.handler'a sürekli mesaj gönderirken drain başlar. Onaylanan her
+    mesaj kaydedilmiş olmalı ve alıcıya giden olayı bağlantı kapanmadan gönderilmelidir.
+    handler onayı drain'in izlediği bölümün dışında gönderirse onay kapalı bağlantıya
+    denk gelir ve kaybolur.
+    """
+    random.seed(7)
+    database = FakeDatabase()
+    monkeypatch.setattr(chat_server, "db", database)
+    monkeypatch.setattr(chat_server, "outbox", EmptyOutbox())
+    monkeypatch.setattr(chat_server, "drain_controller", DrainController(window_seconds=0.05, waves=1, flush_timeout=2))
+    monkeypatch.setattr(id_generator, "generator", SnowflakeGenerator(0, 0))
+    clients = {user_id: ClientWebSocket() for user_id in range(1, 21)}
+    sent = {}
+
+    async def client(user_id):
+        websocket = clients[user_id]
+        websocket.incoming.put_nowait(json.dumps({"user_id": user_id}))
+        sent[user_id] = 0
+        for index in range(30):
+            if websocket.close_code is not None:
+                # Bağlantı kapandı; kalan mesajlar yeni sunucuya gönderilir
+                break
+            recipient = user_id % len(clients) + 1
+            websocket.incoming.put_nowait(json.dumps({
+                "action": "send_direct_message", "receiver_id": recipient, "content": f"{user_id}-{index}"
+            }))
+            sent[user_id] += 1
+            await asyncio.sleep(random.uniform(0, 0.01))
+
+    async def scenario():
+        handlers = [asyncio.create_task(chat_server.handler(websocket, database)) for websocket in clients.values()]
+        clients_done = asyncio.gather(*(client(user_id) for user_id in clients))
+        await asyncio.sleep(0.05)
+        await chat_server.drain()
+        await clients_done
+        await asyncio.gather(*handlers)
+
+    asyncio.run(scenario())
+
+    acked = set()
+    rejected = 0
+    delivered = set()
+    for user_id, websocket in clients.items():
+        assert websocket.close_code == DRAIN_CLOSE_CODE
+        responses = [event for event in websocket.events() if "status" in event and event["status"] != "connected"]
+        assert len(responses) <= sent[user_id]
+        for event in responses:
+            if event["status"] == "success":
+                acked.add(event["message_id"])
+            else:
+                assert event.get("retry") is True
+                rejected += 1
+        delivered.update(event["message_id"] for event in websocket.events() if event.get("type") == "direct_message")
+
+    # Kaydedilen her mesaj onaylandı ve alıcısına gönderildi; yanıtsız kalanlar kaydedilmedi
+    assert acked
+    assert acked == database.committed
+    assert delivered == database.committed
+    # Drain sırasında gelen action'lar reddedildi
+    assert rejected
+
+
+def test_reconnect_hints_follow_close_waves():
+    controller = DrainController(window_seconds=10, waves=5)
+    waves = controller.plan_waves(range(23))
+    assert sorted(user_id for _, user_ids in waves for user_id in user_ids) == list(range(23))
+    assert [offset for offset, _ in waves] == [0, 2, 4, 6, 8]
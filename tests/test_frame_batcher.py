@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+from frame_batcher import FrameBatcher
+
+
+class FakeWebSocket:
+    def __init__(self, blocked: asyncio.Event = None):
+        self.frames = []
+        self.closed = None
+        self.blocked = blocked
+
+    async def send(self, data):
+        if self.blocked is not None:
+            await self.blocked.wait()
+        self.frames.append(data)
+
+    async def close(self, code=1000, reason=""):
+        self.closed = code
+
+
+def test_events_within_window_share_one_frame():
+    async def scenario():
+        websocket = FakeWebSocket()
+        batcher = FrameBatcher(websocket, flush_interval=0.01)
+        for index in range(3):
+            assert batcher.add(json.dumps({"index": index}))
+        await asyncio.sleep(0.05)
+        await batcher.close()
+        return websocket.frames
+
+    frames = asyncio.run(scenario())
+    assert [json.loads(frame) for frame in frames] == [[{"index": 0}, {"index": 1}, {"index": 2}]]
+
+
+def test_slow_consumer_is_closed_instead_of_buffering_without_limit():
+    async def scenario():
+        release = asyncio.Event()
+        websocket = FakeWebSocket(release)
+        batcher = FrameBatcher(websocket, flush_interval=0.001, max_events=2, max_pending_bytes=100)
+        event = json.dumps({"content": "x" * 20})
+        accepted = [batcher.add(event) for _ in range(10)]
+        # İlk flush send'de takılı; sınır aşılınca bağlantı kapatılır
+        await asyncio.sleep(0.01)
+        closed = websocket.closed
+        release.set()
+        await batcher.close()
+        return accepted, closed, batcher
+
+    accepted, closed, batcher = asyncio.run(scenario())
+    assert accepted.count(False) > 0
+    assert closed == 1013
+    assert not batcher.add("{}")
+    assert not batcher._tasks
+
+
+def test_flush_task_errors_are_logged(caplog):
+    class BrokenBatcher(FrameBatcher):
+        async def flush(self):
+            raise RuntimeError("boom")
+
+    async def scenario():
+        batcher = BrokenBatcher(FakeWebSocket(), max_events=1)
+        batcher.add("{}")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert "Birleştirici görevi hata verdi." in caplog.text
+    assert "RuntimeError: boom" in caplog.text
@@ -0,0 +1,63 @@
+import asyncio
+
+from friend_graph import LOADED_MARKER, FriendGraph, friends_key
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.calls.append((name, args))
+        return queue
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.sets = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(str(member) for member in members)
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def sismember(self, key, member):
+        return str(member) in self.sets.get(key, set())
+
+    async def smismember(self, key, members):
+        return [int(str(member) in self.sets.get(key, set())) for member in members]
+
+
+class FakeRedisHandler:
+    def __init__(self):
+        self.redis = FakeRedis()
+
+
+def test_are_friends_checks_all_ids_against_the_cached_set():
+    handler = FakeRedisHandler()
+    handler.redis.sets[friends_key(1)] = {LOADED_MARKER, "2", "3"}
+    graph = FriendGraph(handler)
+
+    # Set yüklenmiş olduğu için veritabanı oturumu kullanılmaz
+    result = asyncio.run(graph.are_friends(None, 1, [2, 3, 4]))
+
+    assert result == {2: True, 3: True, 4: False}
+
+
+def test_are_friends_without_ids():
+    assert asyncio.run(FriendGraph(FakeRedisHandler()).are_friends(None, 1, [])) == {}
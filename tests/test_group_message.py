@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+import chat_server
+import id_generator
+from database import Base
+from id_generator import SnowflakeGenerator
+from models import Attachment, Message, MessageDedup, User
+
+
+class AsyncSessionAdapter:
+    """
+    save_message_to_db'nin kullandığı AsyncSession metotlarını senkron bir oturuma yönlendirir.
+    """
+    def __init__(self, session):
+        self.session = session
+
+    def add(self, instance):
+        self.session.add(instance)
+
+    async def commit(self):
+        self.session.commit()
+
+    async def rollback(self):
+        self.session.rollback()
+
+    async def execute(self, statement):
+        return self.session.execute(statement)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.session.close()
+
+
+class SQLiteDatabase:
+    """
+    Yabancı anahtarları ve NOT NULL kısıtlarını uygulayan bellek veritabanı.
+    """
+    def __init__(self, user_ids):
+        self.engine = create_engine("sqlite://")
+
+        @event.listens_for(self.engine, "connect")
+        def configure(dbapi_connection, _):
+            dbapi_connection.execute("PRAGMA foreign_keys = ON")
+            # users.username önek indeksi Postgres'in "C" collation'ını kullanır
+            dbapi_connection.create_collation("C", lambda a, b: (a > b) - (a < b))
+
+        Base.metadata.create_all(self.engine, tables=[
+            User.__table__, Attachment.__table__, Message.__table__, MessageDedup.__table__
+        ])
+        with Session(self.engine) as session:
+            session.add_all([
+                User(id=user_id, username=f"user{user_id}", user_tag=f"{user_id:04d}",
+                     email=f"user{user_id}@example.com", password="x")
+                for user_id in user_ids
+            ])
+            session.commit()
+
+    def async_session(self):
+        return AsyncSessionAdapter(Session(self.engine))
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+def test_group_message_is_saved_and_delivered_to_members(monkeypatch):
+    database = SQLiteDatabase([1, 2, 3])
+    monkeypatch.setattr(chat_server, "db", database)
+    monkeypatch.setattr(id_generator, "generator", SnowflakeGenerator(0, 0))
+    room_id = chat_server.room_registry.create("group_test_delivery", [1, 2, 3], "group")
+    for user_id in (1, 2, 3):
+        chat_server.add_user_to_room(user_id, room_id)
+    websockets = {user_id: FakeWebSocket() for user_id in (1, 2, 3)}
+    chat_server.active_connections.update(websockets)
+
+    async def scenario():
+        try:
+            return await chat_server.handle_group_message(1, {"room_id": room_id, "content": "merhaba"}, None)
+        finally:
+            await chat_server.room_actors.close(1)
+
+    try:
+        response = asyncio.run(scenario())
+    finally:
+        for user_id in websockets:
+            chat_server.active_connections.pop(user_id, None)
+            chat_server.remove_user_from_room(user_id, room_id)
+
+    assert response["status"] == "success"
+    with Session(database.engine) as session:
+        message = session.execute(select(Message)).scalar_one()
+    assert message.id == response["message_id"]
+    assert message.sender_id == 1
+    assert message.receiver_id is None
+    assert message.content == f"[{room_id}] merhaba"
+
+    # Gönderen hariç tüm üyelere ulaşır
+    assert websockets[1].sent == []
+    for user_id in (2, 3):
+        [event_data] = websockets[user_id].sent
+        assert event_data["type"] == "group_message"
+        assert event_data["message_id"] == response["message_id"]
+        assert event_data["content"] == "merhaba"
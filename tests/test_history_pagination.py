@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+import main
+from archive import write_segment
+
+
+class SegmentResult:
+    def __init__(self, paths):
+        self.paths = paths
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.paths
+
+
+class ArchiveSession:
+    """
+    read_archived_messages'in segment dizini sorgusu için; segmentleri max_id'ye göre
+    yeniden eskiye döndürür. Satır filtrelemesini read_archived_messages kendisi yapar.
+    """
+    def __init__(self, segments):
+        self.segments = sorted(segments, key=lambda segment: segment[0], reverse=True)
+
+    async def execute(self, stmt):
+        return SegmentResult([path for _, path in self.segments])
+
+
+def message(message_id):
+    return {"id": message_id, "sender_id": 1, "receiver_id": 2, "content": f"m{message_id}"}
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    """
+    1-100 arası mesajlar iki arşiv segmentinde, 101-130 arası sıcak veride.
+    """
+    segments = []
+    for month, ids in enumerate((range(1, 41), range(41, 101))):
+        path = str(tmp_path / f"segment_{month}.jsonl.zst")
+        write_segment(path, [message(message_id) for message_id in ids])
+        segments.append((max(ids), path))
+    hot = [message(message_id) for message_id in range(101, 131)]
+
+    async def fetch_hot(session, user1_id, user2_id, before_id, limit):
+        newest_first = [row for row in reversed(hot) if before_id is None or row["id"] < before_id]
+        return newest_first[:limit] if limit is not None else newest_first
+
+    monkeypatch.setattr(main, "fetch_history_page", fetch_hot)
+    return ArchiveSession(segments)
+
+
+def read_all_pages(session, limit):
+    async def scenario():
+        pages = []
+        cursor = None
+        while True:
+            messages, cursor = await main.read_history(session, 1, 2, cursor, limit)
+            pages.append([row["id"] for row in messages])
+            if cursor is None:
+                return pages
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("limit", [1, 7, 10, 30, 31, 200])
+def test_pages_cross_archive_boundary_without_gaps(history, limit):
+    pages = read_all_pages(history, limit)
+    # Sayfalar yeniden eskiye gelir, her sayfa kendi içinde eskiden yeniye sıralıdır
+    ids = [message_id for page in reversed(pages) for message_id in page]
+    assert ids == list(range(1, 131))
+    assert all(len(page) <= limit for page in pages)
+
+
+def test_page_spanning_hot_and_cold(history):
+    messages, cursor = asyncio.run(main.read_history(history, 1, 2, 106, 10))
+    assert [row["id"] for row in messages] == list(range(96, 106))
+    assert cursor == 96
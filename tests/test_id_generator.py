@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+import pytest
+
+import id_generator
+from id_generator import (MAX_SEQUENCE, MAX_WORKER_ID, SnowflakeGenerator, WorkerIdLease, configure,
+                          id_to_datetime, min_id_for)
+
+
+class LeaseRedis:
+    """
+    WorkerIdLease'in kullandığı SET NX ve yenileme/bırakma script'lerinin taklidi.
+    """
+    def __init__(self):
+        self.values = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def eval(self, script, numkeys, key, token, *args):
+        if self.values.get(key) != token:
+            return 0
+        if script == WorkerIdLease._RELEASE:
+            del self.values[key]
+        return 1
+
+
+@pytest.fixture(autouse=True)
+def restore_generator():
+    saved = id_generator.generator
+    yield
+    id_generator.generator = saved
+
+
+def test_ids_are_unique_and_increasing():
+    generator = SnowflakeGenerator(1, 2)
+    ids = [generator.next_id() for _ in range(MAX_SEQUENCE * 3)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_ids_are_unique_across_threads():
+    generator = SnowflakeGenerator(0, 0)
+    results = [[] for _ in range(4)]
+
+    def produce(out):
+        for _ in range(20000):
+            out.append(generator.next_id())
+
+    threads = [threading.Thread(target=produce, args=(out,)) for out in results]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ids = [snowflake_id for out in results for snowflake_id in out]
+    assert len(set(ids)) == len(ids)
+
+
+def test_different_workers_never_collide():
+    first, second = SnowflakeGenerator(0, 1), SnowflakeGenerator(0, 2)
+    assert not {first.next_id() for _ in range(5000)} & {second.next_id() for _ in range(5000)}
+
+
+def test_id_encodes_creation_time():
+    generator = SnowflakeGenerator(0, 0)
+    snowflake_id = generator.next_id()
+    moment = id_to_datetime(snowflake_id)
+    assert min_id_for(moment) <= snowflake_id
+
+
+def test_next_id_fails_without_worker_id():
+    configure(None)
+    with pytest.raises(RuntimeError):
+        id_generator.next_id()
+
+
+def test_lease_gives_each_process_its_own_worker_id():
+    async def scenario():
+        redis = LeaseRedis()
+        leases = [WorkerIdLease(redis, node_id=3) for _ in range(MAX_WORKER_ID + 1)]
+        worker_ids = [await lease.acquire() for lease in leases]
+        assert sorted(worker_ids) == list(range(MAX_WORKER_ID + 1))
+
+        # Tüm worker ID'ler kullanımda
+        with pytest.raises(RuntimeError):
+            await WorkerIdLease(redis, node_id=3).acquire()
+
+        # Bırakılan ID başka sürece verilir, kirası olmayan süreç yenileyemez
+        await leases[5].release()
+        newcomer = WorkerIdLease(redis, node_id=3)
+        assert await newcomer.acquire() == 5
+        assert not await leases[5].renew()
+        assert await newcomer.renew()
+        assert id_generator.generator.worker_id == 5
+
+    asyncio.run(scenario())
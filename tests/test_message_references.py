@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from asyncpg.exceptions import ForeignKeyViolationError
+from sqlalchemy.exc import IntegrityError
+
+import chat_server
+import id_generator
+from id_generator import SnowflakeGenerator
+
+
+def foreign_key_violation(constraint):
+    """
+    SQLAlchemy'nin asyncpg hatasını sardığı biçimde foreign key ihlali.
+    """
+    cause = ForeignKeyViolationError(f'insert or update on table "messages" violates foreign key constraint "{constraint}"')
+    cause.constraint_name = constraint
+    orig = Exception(str(cause))
+    orig.sqlstate = cause.sqlstate
+    orig.__cause__ = cause
+    return IntegrityError("INSERT INTO messages", {}, orig)
+
+
+class ViolatingSession:
+    """
+    Commit'te verilen kısıtı ihlal eden oturum.
+    """
+    def __init__(self, constraint):
+        self.constraint = constraint
+
+    def add(self, instance):
+        pass
+
+    async def commit(self):
+        raise foreign_key_violation(self.constraint)
+
+    async def rollback(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class ViolatingDatabase:
+    def __init__(self, constraint):
+        self.constraint = constraint
+
+    def async_session(self):
+        return ViolatingSession(self.constraint)
+
+
+class UploaderResult:
+    def __init__(self, uploader_id):
+        self.uploader_id = uploader_id
+
+    def scalar(self):
+        return self.uploader_id
+
+
+class AttachmentSession:
+    """
+    check_attachment için: ek, gönderen tarafından yüklenmiş görünür.
+    """
+    def __init__(self, uploader_id):
+        self.uploader_id = uploader_id
+
+    async def execute(self, statement):
+        return UploaderResult(self.uploader_id)
+
+    async def rollback(self):
+        pass
+
+
+def send(handle, constraint, message_data, monkeypatch):
+    monkeypatch.setattr(chat_server, "db", ViolatingDatabase(constraint))
+    monkeypatch.setattr(id_generator, "generator", SnowflakeGenerator(0, 0))
+
+    async def scenario():
+        try:
+            return await handle(1, {**message_data, "attachment_id": 7}, AttachmentSession(1))
+        finally:
+            await chat_server.room_actors.close(1)
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("constraint, message", [
+    ("messages_attachment_id_fkey", "Ek bulunamadı."),
+    ("messages_receiver_id_fkey", "Alıcı bulunamadı."),
+    ("messages_sender_id_fkey", "Gönderen bulunamadı."),
+    (None, "Mesajın referans verdiği kayıt bulunamadı."),
+])
+def test_direct_message_reports_the_violated_reference(constraint, message, monkeypatch):
+    response = send(chat_server.handle_direct_message, constraint, {"receiver_id": 2, "content": "merhaba"}, monkeypatch)
+    assert response["status"] == "error"
+    assert response["message"] == message
+    assert "retry" not in response
+
+
+@pytest.mark.parametrize("constraint, message", [
+    ("messages_attachment_id_fkey", "Ek bulunamadı."),
+    ("messages_sender_id_fkey", "Gönderen bulunamadı."),
+])
+def test_group_message_reports_the_violated_reference(constraint, message, monkeypatch):
+    room_id = chat_server.room_registry.create("group_test_references", [1, 2], "group")
+    for user_id in (1, 2):
+        chat_server.add_user_to_room(user_id, room_id)
+    try:
+        response = send(chat_server.handle_group_message, constraint, {"room_id": room_id, "content": "merhaba"}, monkeypatch)
+    finally:
+        for user_id in (1, 2):
+            chat_server.remove_user_from_room(user_id, room_id)
+    assert response["status"] == "error"
+    assert response["message"] == message
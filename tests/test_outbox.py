@@ -0,0 +1,132 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import chat_server
+from outbox import Outbox, outbox_key
+
+
+class StreamRedis:
+    """
+    Outbox.drain'in kullandığı stream komutlarının (XRANGE, XREVRANGE, XDEL) taklidi.
+    """
+    def __init__(self):
+        self.streams = {}
+        self.sequence = 0
+
+    def add(self, key, event):
+        self.sequence += 1
+        entry_id = f"1-{self.sequence}".encode()
+        self.streams.setdefault(key, []).append((entry_id, {b"event": event.encode()}))
+        return entry_id
+
+    @staticmethod
+    def _order(entry_id):
+        return tuple(int(part) for part in entry_id.split(b"-"))
+
+    async def xrange(self, key, min="-", max="+", count=None):
+        entries = [
+            entry for entry in self.streams.get(key, [])
+            if max == "+" or self._order(entry[0]) <= self._order(max)
+        ]
+        return entries[:count]
+
+    async def xrevrange(self, key, max="+", min="-", count=None):
+        return list(reversed(self.streams.get(key, [])))[:count]
+
+    async def xdel(self, key, *entry_ids):
+        self.streams[key] = [entry for entry in self.streams.get(key, []) if entry[0] not in entry_ids]
+        return len(entry_ids)
+
+
+class RecordingWebSocket:
+    def __init__(self, fail_after=None):
+        self.frames = []
+        self.fail_after = fail_after
+
+    async def send(self, frame):
+        if self.fail_after is not None and len(self.frames) >= self.fail_after:
+            raise ConnectionError("bağlantı koptu")
+        self.frames.append(frame)
+
+
+def make_outbox():
+    redis = StreamRedis()
+    return Outbox(SimpleNamespace(redis=redis)), redis
+
+
+def test_only_written_events_are_deleted():
+    outbox, redis = make_outbox()
+    for index in range(5):
+        redis.add(outbox_key(1), f"e{index}")
+
+    async def write(events):
+        # Bağlantı üçüncü olaydan sonra koptu
+        return 3
+
+    assert asyncio.run(outbox.drain(1, write, batch=10)) == 3
+    assert [fields[b"event"] for _, fields in redis.streams[outbox_key(1)]] == [b"e3", b"e4"]
+
+
+def test_drain_stops_at_last_event_present_at_start():
+    outbox, redis = make_outbox()
+    redis.add(outbox_key(1), "old")
+    written = []
+
+    async def write(events):
+        written.extend(events)
+        # Drain sürerken eklenen olay bu çağrıda gönderilmez
+        redis.add(outbox_key(1), "new")
+        return len(events)
+
+    assert asyncio.run(outbox.drain(1, write, batch=1)) == 1
+    assert written == ["old"]
+    assert [fields[b"event"] for _, fields in redis.streams[outbox_key(1)]] == [b"new"]
+
+
+def deliver(websocket, batch, live_events=()):
+    outbox, redis = make_outbox()
+    for index in range(3):
+        redis.add(outbox_key(7), json.dumps({"n": index}))
+    chat_server.outbox = outbox
+
+    async def scenario():
+        await chat_server.register_connection(7, websocket, batch=batch)
+        original_drain = outbox.drain
+
+        async def drain_with_live_events(user_id, write):
+            # Kutu teslim edilirken gelen canlı olaylar kutudan sonra gönderilmeli
+            for event in live_events:
+                await chat_server.send_to_user(7, event)
+            return await original_drain(user_id, write)
+
+        outbox.drain = drain_with_live_events
+        try:
+            drained = await chat_server.deliver_outbox(7, websocket, batch)
+            await chat_server.flush_batchers()
+            return drained
+        finally:
+            await chat_server.unregister_connection(7, websocket)
+
+    return asyncio.run(scenario()), redis.streams[outbox_key(7)]
+
+
+def test_outbox_events_precede_live_events():
+    websocket = RecordingWebSocket()
+    drained, remaining = deliver(websocket, batch=False, live_events=['{"live":1}'])
+    assert drained == 3 and remaining == []
+    assert websocket.frames == ['{"n": 0}', '{"n": 1}', '{"n": 2}', '{"live":1}']
+
+
+def test_batched_outbox_is_written_before_delete():
+    websocket = RecordingWebSocket()
+    drained, remaining = deliver(websocket, batch=True, live_events=['{"live":1}'])
+    assert drained == 3 and remaining == []
+    assert [json.loads(frame) for frame in websocket.frames] == [[{"n": 0}, {"n": 1}, {"n": 2}], [{"live": 1}]]
+
+
+def test_unwritten_events_stay_in_outbox():
+    websocket = RecordingWebSocket(fail_after=2)
+    drained, remaining = deliver(websocket, batch=False)
+    assert drained == 2
+    assert [fields[b"event"] for _, fields in remaining] == [b'{"n": 2}']
@@ -0,0 +1,30 @@
+"""
+Plan regresyon kontrolü; DATABASE_URL'deki Postgres'e ulaşılamazsa atlanır.
+Veritabanı migration'larla güncellenmiş ve deneme.py ile doldurulmuş olmalıdır.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+import query_plans
+from database import Database
+
+
+def test_hot_queries_do_not_seq_scan_large_tables():
+    async def scenario():
+        db = Database()
+        try:
+            try:
+                async with db.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            except Exception as e:
+                return e, None
+            return None, await query_plans.check_plans(db)
+        finally:
+            await db.engine.dispose()
+
+    error, failures = asyncio.run(scenario())
+    if error is not None:
+        pytest.skip(f"Postgres'e ulaşılamadı: {error}")
+    assert failures == []
@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+import pytest
+
+import chat_server
+from profiling import SLOW_CALLS_FILE, profiler
+from room_actors import RoomActors, RoomBusy
+
+
+def test_jobs_in_a_room_run_in_submission_order():
+    async def scenario():
+        actors = RoomActors()
+        order = []
+
+        async def job(index):
+            # Önce gönderilen iş daha uzun sürse de sıra korunur
+            await asyncio.sleep(0.01 * (5 - index))
+            order.append(index)
+            return index
+
+        results = await asyncio.gather(*(actors.submit("room", job, index) for index in range(5)))
+        await actors.close(1)
+        return order, results
+
+    order, results = asyncio.run(scenario())
+    assert order == results == list(range(5))
+
+
+def test_rooms_do_not_wait_for_each_other():
+    async def scenario():
+        actors = RoomActors()
+        slow_started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow():
+            slow_started.set()
+            await release.wait()
+
+        async def fast():
+            return "done"
+
+        slow_task = asyncio.create_task(actors.submit("a", slow))
+        await slow_started.wait()
+        result = await asyncio.wait_for(actors.submit("b", fast), timeout=1)
+        release.set()
+        await slow_task
+        await actors.close(1)
+        return result
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_full_inbox_raises_room_busy():
+    async def scenario():
+        actors = RoomActors(inbox_size=1, inbox_timeout=0.05)
+        release = asyncio.Event()
+
+        async def blocked():
+            await release.wait()
+
+        first = asyncio.create_task(actors.submit("room", blocked))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(actors.submit("room", blocked))
+        await asyncio.sleep(0)
+        with pytest.raises(RoomBusy):
+            await actors.submit("room", blocked)
+        release.set()
+        await asyncio.gather(first, second)
+        await actors.close(1)
+
+    asyncio.run(scenario())
+
+
+def test_job_errors_reach_the_caller():
+    async def scenario():
+        actors = RoomActors()
+
+        async def failing():
+            raise ValueError("hata")
+
+        with pytest.raises(ValueError):
+            await actors.submit("room", failing)
+        await actors.close(1)
+
+    asyncio.run(scenario())
+
+
+def test_idle_actor_is_reaped():
+    async def scenario():
+        actors = RoomActors(idle_seconds=0.01)
+
+        async def job():
+            return None
+
+        await actors.submit("room", job)
+        await asyncio.sleep(0.05)
+        return len(actors.actors)
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_leaving_a_room_requires_membership():
+    async def scenario():
+        response = await chat_server.handle_leave_room(1, {"room_id": "group_does_not_exist"}, None)
+        return response, dict(chat_server.room_actors.actors)
+
+    response, actors = asyncio.run(scenario())
+    assert response["status"] == "error"
+    assert not actors
+
+
+def test_slow_call_dump_shows_the_actor_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "directory", str(tmp_path))
+    monkeypatch.setattr(profiler, "sample_rate", profiler.sample_rate)
+    monkeypatch.setattr(profiler, "slow_seconds", profiler.slow_seconds)
+
+    async def scenario():
+        actors = RoomActors()
+
+        async def slow_job():
+            await asyncio.sleep(0.1)
+
+        await actors.submit("group_1", slow_job)
+        await actors.close(1)
+
+    profiler.set(True, sample_rate=0.0, slow_seconds=0.02)
+    try:
+        asyncio.run(scenario())
+    finally:
+        profiler.set(False)
+
+    records = [json.loads(line) for line in (tmp_path / SLOW_CALLS_FILE).read_text().splitlines()]
+    actor_records = [record for record in records if record["source"] == "actor"]
+    assert actor_records[0]["name"].startswith("group_1/")
+    # Döküm, işi bekleyen yeri değil actor'de çalışan işi gösterir
+    assert any("slow_job" in frame for frame in actor_records[0]["stack"])
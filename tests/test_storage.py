@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from storage import LocalStorage, OffsetMismatch, StorageBackend, UploadNotFound
+
+
+async def body(*chunks, delay=0):
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+
+def test_append_checks_offset(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+
+    async def scenario():
+        assert await storage.append_chunk("u1", body(b"abc"), max_size=10, offset=0) == 3
+        with pytest.raises(OffsetMismatch) as error:
+            await storage.append_chunk("u1", body(b"def"), max_size=10, offset=0)
+        assert error.value.offset == 3
+        assert await storage.append_chunk("u1", body(b"def"), max_size=10, offset=3) == 6
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_chunks_with_same_offset_do_not_interleave(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+
+    async def scenario():
+        results = await asyncio.gather(
+            storage.append_chunk("u1", body(b"aa", b"aa", delay=0.01), max_size=100, offset=0),
+            storage.append_chunk("u1", body(b"bb", b"bb", delay=0.01), max_size=100, offset=0),
+            return_exceptions=True
+        )
+        # Biri yazar, diğeri kilidi aldığında offset'in değiştiğini görür
+        assert sorted(type(result).__name__ for result in results) == ["OffsetMismatch", "int"]
+        assert not storage._locks
+
+    asyncio.run(scenario())
+    content = (tmp_path / "uploads" / "u1.part").read_bytes()
+    assert content in (b"aaaa", b"bbbb")
+
+
+def test_finalize_deduplicates_content(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+
+    async def scenario():
+        digests = []
+        for upload_id in ("u1", "u2"):
+            await storage.append_chunk(upload_id, body(b"same"), max_size=10, offset=0)
+            digests.append(await storage.finalize_upload(upload_id))
+        return digests
+
+    first, second = asyncio.run(scenario())
+    assert first == second
+    assert storage.local_path(first[0]) is not None
+
+
+def test_finalize_on_another_worker_waits_for_append(tmp_path):
+    # Ayrı LocalStorage nesneleri ayrı worker süreçleri gibi yalnızca dosya kilidini paylaşır
+    appender, finalizer = LocalStorage(str(tmp_path)), LocalStorage(str(tmp_path))
+
+    async def scenario():
+        await appender.append_chunk("u1", body(b"ab"), max_size=10, offset=0)
+        append = asyncio.create_task(appender.append_chunk("u1", body(b"cd", b"ef", delay=0.05), max_size=10, offset=2))
+        await asyncio.sleep(0.02)
+        digest, size = await finalizer.finalize_upload("u1")
+        return await append, digest, size
+
+    appended, digest, size = asyncio.run(scenario())
+    assert appended == size == 6
+    assert digest == hashlib.sha256(b"abcdef").hexdigest()
+
+
+def test_append_waiting_on_a_finalized_upload_is_rejected(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+
+    async def scenario():
+        await storage.append_chunk("u1", body(b"ab"), max_size=10, offset=0)
+        path = storage._upload_path("u1")
+        # Başka bir worker tamamlama sırasında kilidi tutar ve dosyayı taşır
+        with storage._open_locked(path, "rb"):
+            append = asyncio.create_task(storage.append_chunk("u1", body(b"cd"), max_size=10, offset=2))
+            await asyncio.sleep(0.05)
+            os.rename(path, tmp_path / "moved")
+        with pytest.raises(UploadNotFound):
+            await append
+
+    asyncio.run(scenario())
+    assert (tmp_path / "moved").read_bytes() == b"ab"
+
+
+def test_discard_missing_upload(tmp_path):
+    asyncio.run(LocalStorage(str(tmp_path)).discard_upload("missing"))
@@ -0,0 +1,56 @@
+from tracing import TRACE_ACKS_TOTAL, DeliveryTracer
+
+
+def fanned_out(tracer, sender_id, members):
+    trace = tracer.start(sender_id)
+    trace.mark_persisted(1)
+    tracer.mark_fanned_out(trace, "group_test", members)
+    return trace
+
+
+def test_trace_ids_are_generated_by_server():
+    tracer = DeliveryTracer()
+    first, second = tracer.start(1), tracer.start(1)
+    assert first.trace_id != second.trace_id
+
+
+def test_each_recipient_acks_once():
+    tracer = DeliveryTracer()
+    trace = fanned_out(tracer, 1, [1, 2, 3])
+
+    assert tracer.ack(2, trace.trace_id)
+    assert not tracer.ack(2, trace.trace_id)
+    assert trace.trace_id in tracer.pending
+    assert tracer.ack(3, trace.trace_id)
+    # Tüm alıcılar onayladı; iz silinir
+    assert trace.trace_id not in tracer.pending
+
+
+def test_sender_and_outsiders_cannot_ack():
+    tracer = DeliveryTracer()
+    trace = fanned_out(tracer, 1, [1, 2])
+    rejected = TRACE_ACKS_TOTAL.value("rejected")
+
+    assert not tracer.ack(1, trace.trace_id)
+    assert not tracer.ack(99, trace.trace_id)
+    assert TRACE_ACKS_TOTAL.value("rejected") == rejected + 2
+    assert tracer.ack(2, trace.trace_id)
+
+
+def test_unknown_and_expired_traces():
+    tracer = DeliveryTracer(ack_ttl=0)
+    trace = fanned_out(tracer, 1, [1, 2])
+    assert not tracer.ack(2, "missing")
+    assert not tracer.ack(2, trace.trace_id)
+
+
+def test_messages_without_recipients_are_not_kept():
+    tracer = DeliveryTracer()
+    fanned_out(tracer, 1, [1])
+    assert not tracer.pending
+
+
+def test_pending_is_bounded():
+    tracer = DeliveryTracer(max_pending=3)
+    traces = [fanned_out(tracer, 1, [1, 2]) for _ in range(5)]
+    assert list(tracer.pending) == [trace.trace_id for trace in traces[2:]]
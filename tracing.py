@@ -0,0 +1,190 @@
+"""
+Mesaj teslimat gecikmesi izleme.
+
+Her direct ve grup mesajına sunucu bir trace_id verir ve yanıtta döndürür; istemcinin
+gönderdiği trace_id kullanılmaz, böylece bir istemci bekleyen bir izin yerine geçemez.
+Sunucu mesajı şu anlarda damgalar:
+    received    Action'ın işlenmeye başladığı an
+    persisted   Mesajın commit edildiği an
+    fanned_out  Olayın room üyelerine gönderimi bittiği an
+
+Dağıtılan olay trace_id ve server_timing (received_ms, persisted_ms; Unix ms) alanlarını
+içerir. Alıcı istemci olayı aldığında isteğe bağlı olarak şu action'ı gönderir:
+
+    {"action": "ack", "trace_id": "..."}
+
+Sunucu bu onayla gönderen -> alıcı teslimat süresini hesaplar ve room boyutu ile düğüme
+göre message_delivery_seconds metriğine yazar. Onaylar yanıtlanmaz. Yalnızca olayın
+gönderildiği room üyelerinin onayı ve her alıcıdan tek onay sayılır; gönderenin kendisinden
+veya room dışından gelen onaylar reddedilir. Onay bekleyen izler
+TRACE_ACK_TTL_SECONDS boyunca tutulur; çevrimdışı kutusundan sonradan teslim edilen
+olayların onayları sayılmaz. İzlerin TRACE_LOG_SAMPLE_RATE oranı loglanır.
+"""
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+TRACE_ACK_TTL_SECONDS = float(os.getenv("TRACE_ACK_TTL_SECONDS", 60))
+# Onay bekleyen en fazla iz sayısı; aşılırsa en eskiler düşer
+TRACE_PENDING_MAX = int(os.getenv("TRACE_PENDING_MAX", 100000))
+TRACE_LOG_SAMPLE_RATE = float(os.getenv("TRACE_LOG_SAMPLE_RATE", 0.001))
+NODE_NAME = os.getenv("NODE_NAME") or socket.gethostname()
+
+# Etiket sayısı sınırlı kalsın diye room boyutu gruplanır
+ROOM_SIZE_CLASSES = ((2, "2"), (10, "3-10"), (50, "11-50"), (250, "51-250"))
+
+DELIVERY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+MESSAGE_STAGE_SECONDS = metrics.histogram(
+    "message_stage_seconds",
+    "Mesajın sunucu içindeki aşama süreleri (persisted: alındı -> kaydedildi, fanned_out: kaydedildi -> dağıtıldı).",
+    ("stage",)
+)
+MESSAGE_DELIVERY_SECONDS = metrics.histogram(
+    "message_delivery_seconds",
+    "Mesajın sunucuya ulaşmasından alıcının onayına kadar geçen süre.",
+    ("room_size", "node"),
+    buckets=DELIVERY_BUCKETS
+)
+TRACE_ACKS_TOTAL = metrics.counter(
+    "message_trace_acks_total",
+    "Alıcı onaylarının sonucu (matched: iz bulundu, unknown: iz yok veya süresi doldu, "
+    "rejected: onaylayan alıcı değil veya daha önce onayladı).",
+    ("result",)
+)
+
+logger = logging.getLogger(__name__)
+
+
+def room_size_class(size: int) -> str:
+    for limit, label in ROOM_SIZE_CLASSES:
+        if size <= limit:
+            return label
+    return "251+"
+
+
+class Trace:
+    __slots__ = ("trace_id", "message_id", "room_id", "sender_id", "recipients", "received", "received_ms",
+                 "persisted", "persisted_ms", "fanned_out", "room_size", "sampled")
+
+    def __init__(self, trace_id: str, sender_id: int):
+        self.trace_id = trace_id
+        self.message_id = None
+        self.room_id = None
+        self.sender_id = sender_id
+        # Onayı beklenen alıcılar; onaylayan çıkarılır
+        self.recipients = set()
+        self.received = time.perf_counter()
+        self.received_ms = int(time.time() * 1000)
+        self.persisted = None
+        self.persisted_ms = None
+        self.fanned_out = None
+        self.room_size = 0
+        self.sampled = random.random() < TRACE_LOG_SAMPLE_RATE
+
+    def mark_persisted(self, message_id: int):
+        self.message_id = message_id
+        self.persisted = time.perf_counter()
+        self.persisted_ms = int(time.time() * 1000)
+        MESSAGE_STAGE_SECONDS.observe(self.persisted - self.received, "persisted")
+
+    def server_timing(self) -> dict:
+        """
+        Dağıtılan olaya eklenen sunucu zamanları.
+        """
+        return {"received_ms": self.received_ms, "persisted_ms": self.persisted_ms}
+
+    def elapsed_ms(self, moment: Optional[float]) -> Optional[float]:
+        return None if moment is None else round((moment - self.received) * 1000, 2)
+
+
+class DeliveryTracer:
+    def __init__(self, ack_ttl: float = TRACE_ACK_TTL_SECONDS, max_pending: int = TRACE_PENDING_MAX):
+        self.ack_ttl = ack_ttl
+        self.max_pending = max_pending
+        # {trace_id: Trace}, eskiden yeniye
+        self.pending: "OrderedDict[str, Trace]" = OrderedDict()
+
+        metrics.gauge("message_traces_pending", "Alıcı onayı beklenen iz sayısı.").set_function(lambda: len(self.pending))
+
+    def start(self, sender_id: int) -> Trace:
+        return Trace(uuid.uuid4().hex, sender_id)
+
+    def mark_fanned_out(self, trace: Trace, room_id: str, members: Iterable[int]):
+        """
+        Dağıtım bittiğinde çağrılır; members olayın gönderildiği room üyeleridir (gönderen dahil).
+        Alıcısı olan izler onay için saklanır.
+        """
+        trace.fanned_out = time.perf_counter()
+        trace.room_id = room_id
+        trace.recipients = set(members)
+        trace.room_size = len(trace.recipients)
+        trace.recipients.discard(trace.sender_id)
+        MESSAGE_STAGE_SECONDS.observe(trace.fanned_out - trace.persisted, "fanned_out")
+        if trace.sampled:
+            self._log(trace, "Mesaj dağıtıldı.")
+        if not trace.recipients:
+            return
+
+        self._expire()
+        self.pending[trace.trace_id] = trace
+        self.pending.move_to_end(trace.trace_id)
+        while len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+
+    def ack(self, user_id: int, trace_id) -> bool:
+        """
+        Alıcının onayı; teslimat süresini metriklere yazar. İz bulunamazsa, onaylayan izin
+        alıcılarından biri değilse veya daha önce onayladıysa False döner. Grup mesajlarında
+        her alıcının onayı ayrı ölçülür.
+        """
+        trace = self.pending.get(trace_id) if isinstance(trace_id, str) else None
+        if trace is None or time.perf_counter() - trace.received > self.ack_ttl:
+            TRACE_ACKS_TOTAL.inc("unknown")
+            return False
+        if user_id not in trace.recipients:
+            TRACE_ACKS_TOTAL.inc("rejected")
+            return False
+
+        trace.recipients.discard(user_id)
+        if not trace.recipients:
+            # Tüm alıcılar onayladı
+            del self.pending[trace_id]
+
+        delivered = time.perf_counter()
+        MESSAGE_DELIVERY_SECONDS.observe(delivered - trace.received, room_size_class(trace.room_size), NODE_NAME)
+        TRACE_ACKS_TOTAL.inc("matched")
+        if trace.sampled:
+            self._log(trace, "Mesaj alıcıya ulaştı.", user_id=user_id, delivered_ms=trace.elapsed_ms(delivered))
+        return True
+
+    def _expire(self):
+        cutoff = time.perf_counter() - self.ack_ttl
+        while self.pending:
+            trace = next(iter(self.pending.values()))
+            if trace.received >= cutoff:
+                break
+            self.pending.popitem(last=False)
+
+    def _log(self, trace: Trace, message: str, **fields):
+        logger.info(message, extra={
+            "trace_id": trace.trace_id,
+            "message_id": trace.message_id,
+            "room_id": trace.room_id,
+            "room_size": trace.room_size,
+            "node": NODE_NAME,
+            "persisted_ms": trace.elapsed_ms(trace.persisted),
+            "fanned_out_ms": trace.elapsed_ms(trace.fanned_out),
+            **fields
+        })
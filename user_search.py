@@ -0,0 +1,75 @@
+"""
+Kullanıcı arama: username#tag ile tam eşleşme ve yazarken önek tamamlama.
+
+Önek araması lower(username) üzerindeki C collation indeksinde bir aralık taramasıdır.
+Kısa önekler çok sayıda kullanıcıyla eşleşir ve en sık aranan önekler de bunlardır; bu
+yüzden USER_SEARCH_CACHE_MAX_PREFIX karakterden kısa öneklerin sonuçları Redis'te kısa
+süreli önbelleğe alınır. Daha uzun önekler seçicidir ve doğrudan indeksten okunur.
+"""
+import json
+import os
+from typing import List
+
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import statements
+
+load_dotenv()
+
+USER_SEARCH_DEFAULT_LIMIT = int(os.getenv("USER_SEARCH_DEFAULT_LIMIT", 10))
+USER_SEARCH_MAX_LIMIT = int(os.getenv("USER_SEARCH_MAX_LIMIT", 50))
+USER_SEARCH_CACHE_MAX_PREFIX = int(os.getenv("USER_SEARCH_CACHE_MAX_PREFIX", 3))
+USER_SEARCH_CACHE_TTL_SECONDS = int(os.getenv("USER_SEARCH_CACHE_TTL_SECONDS", 60))
+
+
+def prefix_bounds(prefix: str):
+    """
+    Öneki [alt, üst) aralığına çevirir: öneki taşıyan tüm dizeler bu aralıktadır.
+    C collation'da karşılaştırma kod noktası sırasıyla yapılır.
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _user_dict(row) -> dict:
+    return {"id": row.id, "username": row.username, "user_tag": row.user_tag}
+
+
+async def resolve_handle(session: AsyncSession, username: str, user_tag: str):
+    """
+    username#tag'i tek indeks okumasıyla kullanıcıya çevirir.
+    """
+    result = await session.execute(statements.user_by_handle(username, user_tag))
+    return result.scalars().first()
+
+
+async def search_users(session: AsyncSession, redis_handler, query: str, limit: int = USER_SEARCH_DEFAULT_LIMIT) -> List[dict]:
+    """
+    query "isim#etiket" biçimindeyse tam eşleşmeyi, değilse kullanıcı adı önekiyle
+    eşleşen en fazla limit kullanıcıyı döndürür.
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    if "#" in query:
+        username, _, user_tag = query.partition("#")
+        user = await resolve_handle(session, username, user_tag)
+        return [_user_dict(user)] if user else []
+
+    prefix = query.lower()
+    limit = max(1, min(limit, USER_SEARCH_MAX_LIMIT))
+    cache_key = None
+    if len(prefix) <= USER_SEARCH_CACHE_MAX_PREFIX:
+        cache_key = f"user_search:{limit}:{prefix}"
+        cached = await redis_handler.get(key=cache_key)
+        if cached is not None:
+            return json.loads(cached)
+
+    lower_bound, upper_bound = prefix_bounds(prefix)
+    result = await session.execute(statements.users_by_prefix(lower_bound, upper_bound, limit))
+    users = [_user_dict(row) for row in result.all()]
+
+    if cache_key is not None:
+        await redis_handler.set(key=cache_key, value=json.dumps(users), expire_seconds=USER_SEARCH_CACHE_TTL_SECONDS)
+    return users
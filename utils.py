@@ -2,19 +2,22 @@ from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from models import User, ValidationEmailLog
+import logging
 import pytz
+import statements
+
+logger = logging.getLogger(__name__)
 
 async def is_there_this_user(user_id: int, session: AsyncSession):
     try:
-        current_user_query = await session.execute(select(User).where(User.id == user_id))
+        current_user_query = await session.execute(statements.user_by_id(user_id))
         current_user = current_user_query.scalars().first()
         if not current_user:
             return None
         else:
-            print("HERE")
             return current_user
     except Exception as e:
-        print(e)
+        logger.error("Kullanıcı sorgulanamadı.", extra={"user_id": user_id, "error": str(e)})
         raise e
 
 def get_current_utc_time():
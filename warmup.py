@@ -0,0 +1,103 @@
+"""
+Başlangıçta ısınma (warm-up) ve hazır olma (readiness) durumu.
+
+Dağıtımdan sonraki ilk istekler Postgres/Redis bağlantı kurulumunu, mapper yapılandırmasını
+ve sorgu derlemesini ödemesin diye süreç açılırken bu işler önceden yapılır. Isınma
+bitene kadar /ready 503 döner; yük dengeleyici trafiği ancak bundan sonra yönlendirir.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+
+import metrics
+import statements
+from utils import get_current_utc_time
+
+load_dotenv()
+
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", 5))
+WARMUP_REDIS_CONNECTIONS = int(os.getenv("WARMUP_REDIS_CONNECTIONS", 5))
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", 2))
+
+WARMUP_SECONDS = metrics.gauge("warmup_duration_seconds", "Başlangıç ısınmasının süresi.")
+READY = metrics.gauge("process_ready", "Süreç ısınmayı bitirip trafik almaya hazırsa 1.")
+
+logger = logging.getLogger(__name__)
+
+
+def hot_statements():
+    """
+    Derlenip önbelleğe alınacak sorgular; parametreler hiçbir satırla eşleşmez.
+    """
+    now = get_current_utc_time()
+    return [
+        statements.user_by_id(0),
+        statements.user_by_email(""),
+        statements.user_by_handle("", ""),
+        statements.users_by_prefix("", "", 1),
+        statements.conversation_history(0, 0),
+        statements.conversation_page(0, 0, now, now - timedelta(days=30), before_id=0, limit=1),
+    ]
+
+
+async def _warm_connection(engine):
+    """
+    Bir bağlantı açar ve sık sorguları üzerinde çalıştırır; asyncpg bu sorguları
+    bağlantının prepared statement önbelleğine alır.
+    """
+    conn = await engine.connect()
+    await conn.execute(text("SELECT 1"))
+    for stmt in hot_statements():
+        await conn.execute(stmt)
+    return conn
+
+
+async def warm_up_database(db, connections: int = WARMUP_DB_CONNECTIONS):
+    configure_mappers()
+    for engine in [db.engine] + db.replica_engines:
+        count = min(connections, engine.pool.size())
+        conns = await asyncio.gather(*(_warm_connection(engine) for _ in range(count)))
+        # Bağlantılar kapatılınca havuza geri döner ve açık kalır
+        for conn in conns:
+            await conn.close()
+
+
+class Readiness:
+    """
+    Isınma durumunu tutar. run() başarılı olana kadar tekrar dener.
+    """
+
+    def __init__(self):
+        self.ready = False
+        READY.set(0)
+
+    async def run(self, db, redis_handler, prime=None):
+        """
+        prime: ısınmanın sonunda çağrılan, sürece özel önbellekleri dolduran async fonksiyon.
+        """
+        while True:
+            start = time.perf_counter()
+            try:
+                await asyncio.gather(
+                    warm_up_database(db),
+                    redis_handler.connect(WARMUP_REDIS_CONNECTIONS),
+                )
+                if prime is not None:
+                    await prime()
+            except Exception as e:
+                logger.warning("Isınma başarısız, tekrar denenecek.", extra={"error": str(e)})
+                await asyncio.sleep(WARMUP_RETRY_SECONDS)
+                continue
+
+            duration = time.perf_counter() - start
+            WARMUP_SECONDS.set(duration)
+            READY.set(1)
+            self.ready = True
+            logger.info("Isınma tamamlandı.", extra={"duration_seconds": round(duration, 3)})
+            return
@@ -0,0 +1,47 @@
+"""
+Starlette WebSocket'ini chat_server.handler'ın beklediği websockets arayüzüne uyarlar.
+
+handler, FrameBatcher, drain ve boşta bağlantı temizliği yalnızca recv(), send() ve
+close() kullanır; FastAPI modunda bu sınıf aynı kodun değiştirilmeden çalışmasını sağlar.
+
+Ping/pong ve kuyruk sınırlarını uvicorn uygular (bkz. connection_policy.uvicorn_ws_options).
+Sunucu bu parametreler olmadan başlatılmış olsa da WS_MAX_SIZE'ı aşan mesajlar burada
+1009 (message too big) ile reddedilir.
+"""
+from starlette.websockets import WebSocket, WebSocketDisconnect, WebSocketState
+
+from connection_policy import WS_MAX_SIZE
+
+
+class StarletteWebSocketAdapter:
+    __slots__ = ("websocket",)
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+
+    async def recv(self):
+        """
+        Sıradaki mesajı döndürür; istemci bağlantıyı kapattıysa WebSocketDisconnect fırlatır.
+        """
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+        data = message["text"] if message.get("text") is not None else message.get("bytes")
+        # Karakter sayısı sınırın dörtte birini aşmıyorsa UTF-8 boyutu da aşamaz
+        if data is not None and len(data) * (4 if isinstance(data, str) else 1) > WS_MAX_SIZE:
+            size = len(data.encode("utf-8")) if isinstance(data, str) else len(data)
+            if size > WS_MAX_SIZE:
+                await self.close(1009, "message too big")
+                raise WebSocketDisconnect(1009, "message too big")
+        return data
+
+    async def send(self, message):
+        if isinstance(message, bytes):
+            await self.websocket.send_bytes(message)
+        else:
+            await self.websocket.send_text(message)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        if self.websocket.application_state == WebSocketState.DISCONNECTED:
+            return
+        await self.websocket.close(code=code, reason=reason)